@@ -1,488 +1,687 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 
+from sih.cache import CacheArrow
+from sih.cid10 import NAO_MAPEADO, ROTULOS_CAPITULOS
+from sih.cubos import CubosRD
+from sih.dataset import DatasetRD, UFS
+from sih.dimensoes import DimensoesRD
+from sih.filtros import IndiceFiltros
+from sih.graficos import especificacao_vega, renderizar_png, rotular_municipios
+from sih.instrumentacao import Instrumentacao, anotar_falha, configurar_log
+from sih.indicadores import (
+    calcular_custos, calcular_percentual_obitos, calcular_proporcao_gestrisco, calcular_tempo_medio_idade,
+    calcular_valor_medio_obito, contar_capitulos_cid10, contar_faixa_etaria, contar_municipios, contar_raca,
+    contar_sexo, detalhar_cid10
+)
+from sih.hospitais import (
+    get_top_hospitais_internacoes, get_top_hospitais_mortalidade, get_top_hospitais_tempo_medio,
+    get_top_hospitais_uti, nomear_hospitais, perfil_hospitais
+)
+from sih.lotes import series_em_lotes, valores_em_lotes
+from sih.paralelo import abrir_pool, calcular_em_paralelo, tipar_em_paralelo
+from sih.preprocessamento import (
+    FAIXAS_ETARIAS, MAP_ESPEC, MAP_SEXO, montar_frame
+)
+from sih.series import (
+    DIMENSOES_SERIE, FREQUENCIAS, INDICADORES, SeriesRD, comparar, periodo_leitura, selecionar as selecionar_serie,
+    serializar, somar
+)
+
 # Configuração da página e tema
 st.set_page_config(
-    page_title="Dashboard SIH/SUS - Bahia",
+    page_title="Dashboard SIH/SUS",
     layout="wide",
     initial_sidebar_state="expanded"
 )
 
+# Tempos, linhas varridas e uso do cache de cada seção: última medição da sessão
+# (painel "Diagnóstico de desempenho") e uma linha de log por execução de seção
+configurar_log()
+instrumentacao = st.session_state.setdefault('instrumentacao', Instrumentacao())
+
 # --- 1. Funções de Carregamento e Pré-processamento (Otimizadas com Cache) ---
 
-# Usar o cache do Streamlit para evitar reprocessar dados a cada interação
-@st.cache_data
-def carregar_dados():
+# Diretório com os arquivos RD (RDBA2401.parquet, RD202401.parquet ou layout hive uf=/ano=/mes=)
+DIRETORIO_DADOS = 'datasets'
+
+# O catálogo de partições só lista nomes de arquivos; é relistado a cada 10 minutos
+@st.cache_resource(ttl=600)
+def abrir_dataset():
+    return DatasetRD(DIRETORIO_DADOS)
+
+# Cubos de agregados gerados offline por `python -m sih.cubos`
+DIRETORIO_CUBOS = 'cubos'
+
+@st.cache_resource(ttl=600)
+def abrir_cubos():
+    return CubosRD(DIRETORIO_CUBOS)
+
+# Séries diárias por dia de internação, gravadas junto com os cubos (todas as competências)
+@st.cache_resource(ttl=600)
+def abrir_series():
+    return SeriesRD(DIRETORIO_CUBOS)
+
+# Tabelas já limpas, em Arrow IPC mapeado em memória: sobrevivem a reinícios e são
+# compartilhadas pelos processos do Streamlit no mesmo host
+DIRETORIO_CACHE = 'cache'
+
+@st.cache_resource
+def abrir_cache():
+    return CacheArrow(DIRETORIO_CACHE)
+
+# Usar o cache do Streamlit para evitar reprocessar dados a cada interação.
+# cache_resource compartilha o mesmo frame entre sessões e reruns, sem copiá-lo:
+# o frame é tratado como somente leitura em todo o dashboard.
+@st.cache_resource(max_entries=4)
+def carregar_dados(ufs, competencias):
     """Carrega e pré-processa todos os dados do notebook."""
     try:
-        # Carrega a base de dados principal (AJUSTE O CAMINHO SE NECESSÁRIO)
-        df = pd.read_parquet('datasets/RD202401.parquet')
-        
-        # Recorte de colunas de interesse
-        colunas_interesse = [
-            'UF_ZI', 'ESPEC', 'MUNIC_RES', 'SEXO', 'DIAR_ACOM', 'QT_DIARIAS', 
-            'VAL_TOT', 'DT_INTER', 'DT_SAIDA', 'DIAG_PRINC', 'GESTRISCO',
-            'COD_IDADE', 'IDADE', 'DIAS_PERM', 'MORTE', 'RACA_COR', 'CNES',
-            'COMPLEX', 'MARCA_UTI', 'MUNIC_MOV', 'VAL_UTI' # Adicionei VAL_UTI
-        ]
-        df = df[colunas_interesse].copy()
-
-        # Filtrar para a Bahia (código 29)
-        df['UF_ZI'] = df['UF_ZI'].astype(str)
-        df_bahia = df[df['UF_ZI'].str.startswith('29')].copy()
-
-        # Conversões de Tipo
-        df_bahia['DIAG_PRINC'] = df_bahia['DIAG_PRINC'].astype(str)
-        df_bahia['CNES'] = df_bahia['CNES'].astype(str).str.strip()
-        df_bahia['MORTE'] = pd.to_numeric(df_bahia['MORTE'], errors='coerce')
-        df_bahia['IDADE'] = pd.to_numeric(df_bahia['IDADE'], errors='coerce')
-        df_bahia['DIAS_PERM'] = pd.to_numeric(df_bahia['DIAS_PERM'], errors='coerce')
-        df_bahia['VAL_TOT'] = pd.to_numeric(df_bahia['VAL_TOT'], errors='coerce')
-        df_bahia['ESPEC'] = pd.to_numeric(df_bahia['ESPEC'], errors='coerce')
-        df_bahia['COMPLEX'] = pd.to_numeric(df_bahia['COMPLEX'], errors='coerce')
-        df_bahia['MARCA_UTI'] = pd.to_numeric(df_bahia['MARCA_UTI'], errors='coerce')
-        df_bahia['GESTRISCO'] = pd.to_numeric(df_bahia['GESTRISCO'], errors='coerce')
-        
-        df_bahia['MUNIC_MOV'] = df_bahia['MUNIC_MOV'].astype(str).str.strip()
-
-        # Limpeza e Mapeamento
-        # Mapeamento Sexo: 1=Masc, 2=Fem (o código 3 do seu notebook é limpo para 2)
-        df_bahia.loc[df_bahia['SEXO'] == 3, 'SEXO'] = 2
-        
-        # Criação de Faixa Etária
-        bins = [0, 9, 19, 29, 39, 49, 59, 69, 79, 89, 99, 120]
-        labels = ['0–9', '10–19', '20–29', '30–39', '40–49', '50–59', '60–69', '70–79', '80–89', '90–99', '100+']
-        df_bahia['faixa_etaria'] = pd.cut(df_bahia['IDADE'].fillna(-1).astype(int), bins=bins, labels=labels, right=True, ordered=False)
-        
-        # Mapeamento do Status de Óbito
-        map_obito = {0: 'Sem Óbito', 1: 'Com Óbito'}
-        df_bahia['Status_Obito'] = df_bahia['MORTE'].map(map_obito)
-
-        # Mapeamento de Raça/Cor
-        map_raca_cor = {
-            1: 'Branca', 2: 'Preta', 3: 'Parda', 4: 'Amarela', 5: 'Indígena', 99: 'Sem informação'
-        }
-        df_bahia['Raça/Cor'] = df_bahia['RACA_COR'].map(map_raca_cor).fillna('Não Informado')
-
-        # Carrega dados de municípios (AJUSTE O CAMINHO SE NECESSÁRIO)
-        df_municipios = pd.read_csv('datasets/municipios.csv')
-        df_municipios['Codigo'] = df_municipios['Codigo'].astype(str).str[:6]
-        df_municipios = df_municipios[df_municipios['Codigo'].str.startswith('29')]
-        
-        # Tratamento de datas (Necessário para filtros, embora não usado nos gráficos atuais)
-        df_bahia['DT_INTER'] = pd.to_datetime(df_bahia['DT_INTER'], format='%Y%m%d', errors='coerce')
-        df_bahia['DT_SAIDA'] = pd.to_datetime(df_bahia['DT_SAIDA'], format='%Y%m%d', errors='coerce')
-        df_bahia.dropna(subset=['DT_INTER', 'DT_SAIDA'], inplace=True)
-        
-        return df_bahia, df_municipios
+        # Lê apenas as partições (UF x competência) selecionadas na barra lateral;
+        # projeção de colunas e filtro de UF_ZI são empurrados para o parquet,
+        # e o pré-processamento monta um frame compacto (categorias e inteiros de 8/16 bits).
+        # A limpeza só roda se o cache em disco não tem a seleção (ou a origem mudou),
+        # com cada UF x competência lida e limpa em uma thread.
+        dataset = abrir_dataset()
+        arquivos = [p.caminho for p in dataset.arquivos(ufs, competencias)]
+        tabela = abrir_cache().obter(
+            'rd', arquivos, lambda: tipar_em_paralelo(dataset, list(ufs), list(competencias)),
+            ufs=ufs, competencias=competencias,
+        )
+        anotar_falha('carregar_dados', tabela.num_rows)
+        return montar_frame(tabela)
 
     except FileNotFoundError as e:
         st.error(f"Erro ao carregar o arquivo: {e}. Verifique se os arquivos de dados estão no diretório correto.")
-        return pd.DataFrame(), pd.DataFrame()
-
-df_bahia, df_municipios = carregar_dados()
-
-if df_bahia.empty:
+        return pd.DataFrame()
+
+# Índices por dimensão para os filtros, construídos uma vez por seleção
+@st.cache_resource(max_entries=4)
+def indexar_dados(ufs, competencias):
+    df_bahia = carregar_dados(ufs, competencias)
+    anotar_falha('indexar_dados', len(df_bahia))
+    return IndiceFiltros(df_bahia, abrir_dimensoes()) if not df_bahia.empty else None
+
+# Linhas que um indicador varre na origem: registros filtrados ou linhas dos cubos
+def linhas_varridas(origem):
+    if isinstance(origem, pd.DataFrame):
+        return len(origem)
+    return len(origem.hospital) + len(origem.perfil) + len(origem.cid)
+
+# Quando há cubos para toda a seleção, os registros de AIH nem chegam a ser lidos
+@st.cache_data
+def carregar_cubos(ufs, competencias):
+    cubos = abrir_cubos().ler(list(ufs), list(competencias))
+    anotar_falha('carregar_cubos', linhas_varridas(cubos))
+    return cubos
+
+# Processos que agregam as partições da seleção em paralelo; criados uma única vez
+@st.cache_resource
+def abrir_pool_processos():
+    return abrir_pool()
+
+# Execução em lotes: seleções maiores que a memória são agregadas lote a lote nos
+# mesmos cubos (com os filtros aplicados a cada lote); só as somas ficam em memória.
+# Cada UF x competência é agregada em um processo e os cubos parciais são somados.
+@st.cache_data(max_entries=8)
+def agregar_lotes(ufs, competencias, filtros, periodo):
+    anotar_falha('agregar_lotes', abrir_dataset().linhas(ufs, competencias))
+    return calcular_em_paralelo(abrir_dataset(), list(ufs), list(competencias), dict(filtros), periodo,
+                                pool=abrir_pool_processos(), dimensoes=abrir_dimensoes())
+
+@st.cache_data(max_entries=4)
+def listar_cnes_lotes(ufs, competencias):
+    anotar_falha('listar_cnes_lotes', abrir_dataset().linhas(ufs, competencias))
+    return valores_em_lotes(abrir_dataset(), list(ufs), list(competencias), 'CNES')
+
+# Dimensões de municípios, regiões de saúde e estabelecimentos (CNES) com chaves inteiras,
+# montadas a partir dos arquivos auxiliares de DIRETORIO_DADOS e gravadas em parquet:
+# só são remontadas quando esses arquivos mudam
+DIRETORIO_DIMENSOES = 'dimensoes'
+
+@st.cache_resource(ttl=600)
+def abrir_dimensoes():
+    return DimensoesRD.abrir(DIRETORIO_DADOS, DIRETORIO_DIMENSOES)
+
+# --- Seleção de UF e Competência (Barra Lateral) ---
+try:
+    dataset = abrir_dataset()
+except FileNotFoundError as e:
+    st.error(f"Erro ao carregar o arquivo: {e}. Verifique se os arquivos de dados estão no diretório correto.")
     st.stop()
 
-# --- 2. Funções de Geração de Gráficos e Resultados (Adaptadas do notebook) ---
-
-# Requisito 1: Quais cidades tem o maior numero de internações?
-# Função plot_top_municipios (aproximadamente linha 94)
-# Requisito 1: Quais cidades tem o maior numero de internações?
-def plot_top_municipios(df_bahia, df_municipios):
-    # Cria uma cópia temporária e remove NaNs para o cálculo
-    df_temp = df_bahia.dropna(subset=['MUNIC_MOV']).copy()
-    
-    # Contagem das 10 cidades com mais internações (MUNIC_MOV já é string)
-    contagem_internacoes = df_temp['MUNIC_MOV'].value_counts().nlargest(10).reset_index()
-    contagem_internacoes.columns = ['MUNIC_MOV', 'INTER']
-    
-    # Merge com o dataframe de municípios (MUNIC_MOV e Codigo são strings)
-    top_municipios = pd.merge(contagem_internacoes, df_municipios, left_on='MUNIC_MOV', right_on='Codigo', how='left')
-
-    # Criando coluna com nome formatado
-    top_municipios['Municipios'] = top_municipios['Nome'].fillna('CNES Inválido') + ' - BA'
-    
-    # Gráfico (agora fig será definida)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.barplot(data=top_municipios, x='INTER', y='Municipios', palette='viridis', ax=ax)
-    ax.set_title('Top 10 Municípios com Maior Nº de Internações (Local)', fontsize=14)
-    ax.set_xlabel('Total de Internações', fontsize=12)
-    ax.set_ylabel('Município de Estabelecimento', fontsize=12)
-    plt.tight_layout()
-    return fig
-
-# Requisito 2: Distribuição de internações por sexo
-def plot_distribuicao_sexo(df_bahia):
-    map_sexo = {1: 'Masculino', 2: 'Feminino'}
-    sexo_counts = df_bahia['SEXO'].map(map_sexo).value_counts().reset_index()
-    sexo_counts.columns = ['Sexo', 'QTD_INTERNAÇÕES']
-    
-    fig, ax = plt.subplots(figsize=(6, 4))
-    sns.barplot(data=sexo_counts, x='Sexo', y='QTD_INTERNAÇÕES', palette='pastel', ax=ax)
-    ax.set_title('Distribuição de Internações por Sexo', fontsize=14)
-    ax.set_xlabel('Sexo do paciente', fontsize=12)
-    ax.set_ylabel('Número de Internações', fontsize=12)
-    for container in ax.containers:
-        ax.bar_label(container, fmt='%d', fontsize=10)
-    plt.tight_layout()
-    return fig
-
-# Requisito 3: Faixa etária mais frequente
-def plot_distribuicao_idade(df_bahia):
-    faixa_counts = df_bahia['faixa_etaria'].value_counts().sort_index().reset_index()
-    faixa_counts.columns = ['Faixa Etária', 'Internações']
-    
-    fig, ax = plt.subplots(figsize=(8, 5))
-    sns.barplot(data=faixa_counts, x='Faixa Etária', y='Internações', palette='crest', ax=ax)
-    ax.set_title('Distribuição de Internações por Faixa Etária', fontsize=14)
-    ax.set_xlabel('Faixa Etária', fontsize=12)
-    ax.set_ylabel('Número de Internações', fontsize=12)
-    plt.xticks(rotation=45)
-    for container in ax.containers:
-        ax.bar_label(container, fmt='%d', fontsize=10)
-    plt.tight_layout()
-    return fig
-
-# Requisito 5: Percentual de óbitos
-def calcular_percentual_obitos(df_bahia):
-    total_internacoes = len(df_bahia)
-    total_obitos = df_bahia[df_bahia['MORTE'] == 1].shape[0]
-    percentual_obitos = (total_obitos / total_internacoes) * 100 if total_internacoes > 0 else 0
-    return total_internacoes, total_obitos, percentual_obitos
-
-# Requisito 7: Distribuição de pacientes por raça/cor
-def plot_distribuicao_raca(df_bahia):
-    raca_counts = df_bahia['Raça/Cor'].value_counts().reset_index()
-    raca_counts.columns = ['Raça/Cor', 'Total_Internacoes']
-    total_internacoes_bahia = raca_counts['Total_Internacoes'].sum()
-    raca_counts['Percentual'] = (raca_counts['Total_Internacoes'] / total_internacoes_bahia) * 100
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.barplot(
-        data=raca_counts,
-        x='Percentual',
-        y='Raça/Cor',
-        palette='Set2',
-        order=raca_counts.sort_values('Total_Internacoes', ascending=False)['Raça/Cor'],
-        ax=ax
-    )
-    ax.set_title('Distribuição de Internações por Raça/Cor', fontsize=14)
-    ax.set_xlabel('Percentual de Internações (%)', fontsize=12)
-    ax.set_ylabel('Raça/Cor', fontsize=12)
-    for container in ax.containers:
-        ax.bar_label(container, fmt='%.1f%%', fontsize=10, padding=5)
-    plt.tight_layout()
-    return fig
-
-# Requisito 8: Tempo médio de permanência por faixa etária
-def plot_tempo_medio_idade(df_bahia):
-    df_temp = df_bahia.dropna(subset=['DIAS_PERM', 'faixa_etaria']).copy()
-    tempo_medio_permanencia = (
-        df_temp.groupby('faixa_etaria', observed=True)['DIAS_PERM']
-        .mean()
-        .reset_index()
-    )
-    tempo_medio_permanencia.columns = ['Faixa_Etaria', 'Tempo_Medio_Permanencia_(dias)']
-    
-    # Ordem das faixas
-    labels = ['0–9', '10–19', '20–29', '30–39', '40–49', '50–59', '60–69', '70–79', '80–89', '90–99', '100+']
-    
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.barplot(
-        data=tempo_medio_permanencia,
-        x='Tempo_Medio_Permanencia_(dias)',
-        y='Faixa_Etaria',
-        palette='magma',
-        order=labels,
-        ax=ax
-    )
-    ax.set_title('Tempo Médio de Permanência por Faixa Etária', fontsize=14)
-    ax.set_xlabel('Tempo médio de permanência (dias)', fontsize=12)
-    ax.set_ylabel('Faixa Etária', fontsize=12)
-    for container in ax.containers:
-        ax.bar_label(container, fmt='%.1f', fontsize=10, padding=5)
-    plt.tight_layout()
-    return fig
-
-# Requisito 10: Distribuição por Capítulo Principal da CID-10
-def plot_distribuicao_cid10(df_bahia):
-    map_cid_capitulo = {
-        'A': 'I. Doenças infecciosas', 'B': 'I. Doenças infecciosas',
-        'C': 'II. Neoplasias (tumores)', 'D': 'III. Doenças sangue',
-        'E': 'IV. Doenças endócrinas', 'F': 'V. Transtornos mentais',
-        'G': 'VI. Doenças do sistema nervoso',
-        'H': 'VII/VIII. Doenças do olho/ouvido',
-        'I': 'IX. Doenças do aparelho circulatório',
-        'J': 'X. Doenças do aparelho respiratório',
-        'K': 'XI. Doenças do aparelho digestivo',
-        'L': 'XII. Doenças da pele', 'M': 'XIII. Doenças osteomusculares',
-        'N': 'XIV. Doenças do aparelho geniturinário', 'O': 'XV. Gravidez parto e puerpério',
-        'P': 'XVI. Afecções perinatais', 'Q': 'XVII. Malformações congênitas',
-        'R': 'XVIII. Sintomas sinais anormais',
-        'S': 'XIX. Lesões envenenamentos', 'T': 'XIX. Lesões envenenamentos',
-        'V': 'XX. Causas externas', 'W': 'XX. Causas externas',
-        'X': 'XX. Causas externas', 'Y': 'XX. Causas externas',
-        'Z': 'XXI. Contatos com serviços de saúde', 'U': 'XXII. Códigos especiais'
-    }
-
-    df_temp = df_bahia.dropna(subset=['DIAG_PRINC']).copy()
-    df_temp = df_temp[df_temp['DIAG_PRINC'].str.len() >= 1].copy()
-    df_temp['CAPITULO_CID'] = df_temp['DIAG_PRINC'].str[0].str.upper()
-    df_temp['DESCRICAO_CAPITULO'] = df_temp['CAPITULO_CID'].map(map_cid_capitulo).fillna('Não Mapeado')
-
-    frequencia_capitulos = df_temp['DESCRICAO_CAPITULO'].value_counts().reset_index()
-    frequencia_capitulos.columns = ['Capitulo_CID', 'Frequencia']
-    total_internacoes = frequencia_capitulos['Frequencia'].sum()
-    frequencia_capitulos['Percentual'] = (frequencia_capitulos['Frequencia'] / total_internacoes) * 100
-
-    ordem = frequencia_capitulos.sort_values(by='Frequencia', ascending=False)['Capitulo_CID']
-    
-    fig, ax = plt.subplots(figsize=(10, 8))
-    sns.barplot(
-        data=frequencia_capitulos,
-        x='Percentual',
-        y='Capitulo_CID',
-        palette='Spectral',
-        order=ordem,
-        ax=ax
-    )
-    ax.set_title('Internações por Capítulo Principal da CID-10', fontsize=14)
-    ax.set_xlabel('Percentual (%)', fontsize=12)
-    ax.set_ylabel('Capítulo CID-10', fontsize=12)
-    for container in ax.containers:
-        ax.bar_label(container, fmt='%.1f%%', fontsize=10, padding=5)
-    plt.tight_layout()
-    return fig
-
-# --- 3. Estrutura do Dashboard no Streamlit ---
+st.sidebar.header("Seleção de Dados")
+ufs_disponiveis = dataset.ufs()
+ufs_selecionadas = st.sidebar.multiselect(
+    "UF",
+    options=ufs_disponiveis,
+    default=['BA'] if 'BA' in ufs_disponiveis else ufs_disponiveis[:1],
+    format_func=lambda uf: f"{uf} - {UFS[uf][1]}"
+)
+competencias_disponiveis = dataset.competencias(ufs_selecionadas)
+competencias_selecionadas = st.sidebar.multiselect(
+    "Competência (AAAA/MM)",
+    options=competencias_disponiveis,
+    default=competencias_disponiveis[-1:],
+    format_func=lambda c: f"{c // 100}/{c % 100:02d}"
+)
 
-st.title("🏥 Dashboard de Internações Hospitalares (SIH/SUS) - Bahia")
-st.markdown("Análise de dados de Autorizações de Internação Hospitalar (AIH) do SUS no estado da Bahia, baseada no arquivo `RD202401.csv`.")
-st.markdown("---")
+em_lotes = st.sidebar.toggle(
+    "Execução em lotes", help="Para seleções maiores que a memória: os registros são lidos e agregados em lotes."
+)
 
+if not ufs_selecionadas or not competencias_selecionadas:
+    st.info("Selecione ao menos uma UF e uma competência na barra lateral.")
+    st.stop()
 
-# --- METRICS (Requisitos 5, 16, 17) ---
-st.header("🎯 Principais Métricas")
-
-total_internacoes, total_obitos, percentual_obitos = calcular_percentual_obitos(df_bahia)
-valor_total_gasto = df_bahia['VAL_TOT'].sum()
-custo_medio_internacao = df_bahia['VAL_TOT'].mean()
-
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric(
-        label="Total de Internações",
-        value=f"{total_internacoes:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
-with col2:
-    st.metric(
-        label="Percentual de Óbitos",
-        value=f"{percentual_obitos:.2f}%",
-        delta=f"{total_obitos:,.0f} Óbitos".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
-with col3:
-    st.metric(
-        label="Custo Total (VAL_TOT)",
-        value=f"R$ {valor_total_gasto:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
-with col4:
-    st.metric(
-        label="Custo Médio por Internação",
-        value=f"R$ {custo_medio_internacao:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
+dimensoes = abrir_dimensoes()
+if not len(dimensoes.municipios):
+    st.error(f"Erro ao carregar o arquivo: {DIRETORIO_DADOS}/municipios.csv não encontrado. Verifique se os arquivos de dados estão no diretório correto.")
+
+with instrumentacao.secao('carregamento') as medicao, medicao.etapa('calculo'):
+    usar_cubos = abrir_cubos().cobre(ufs_selecionadas, competencias_selecionadas)
+    if usar_cubos:
+        cubos = carregar_cubos(tuple(ufs_selecionadas), tuple(competencias_selecionadas))
+        opcoes_cnes = sorted(cubos.hospital['CNES'].dropna().unique())
+    elif em_lotes:
+        opcoes_cnes = listar_cnes_lotes(tuple(ufs_selecionadas), tuple(competencias_selecionadas))
+    else:
+        indice = indexar_dados(tuple(ufs_selecionadas), tuple(competencias_selecionadas))
+        if indice is None:
+            st.stop()
+        opcoes_cnes = indice.valores('CNES')
+
+# --- Filtros (Barra Lateral) ---
+st.sidebar.header("Filtros")
+periodo = st.sidebar.date_input("Período de internação (DT_INTER)", value=[], format="DD/MM/YYYY")
+nomes_municipios = dimensoes.municipios.codigos_das_ufs(ufs_selecionadas)
+nomes_regioes = dimensoes.regioes_saude.codigos_das_ufs(ufs_selecionadas)
+filtros = {
+    'MUNIC_MOV': st.sidebar.multiselect(
+        "Município do estabelecimento", options=list(nomes_municipios),
+        format_func=lambda codigo: f"{nomes_municipios[codigo]} ({codigo})"
+    ),
+    # Só com o arquivo de regiões de saúde (datasets/regioes_saude.csv)
+    'regiao_saude': st.sidebar.multiselect(
+        "Região de saúde", options=list(nomes_regioes),
+        format_func=lambda codigo: f"{nomes_regioes[codigo]} ({codigo})"
+    ) if nomes_regioes else [],
+    'CNES': st.sidebar.multiselect("Hospital (CNES)", options=opcoes_cnes),
+    'capitulo_cid': st.sidebar.multiselect("Capítulo CID-10", options=ROTULOS_CAPITULOS),
+    'SEXO': st.sidebar.multiselect("Sexo", options=list(MAP_SEXO.values())),
+    'faixa_etaria': st.sidebar.multiselect("Faixa etária", options=FAIXAS_ETARIAS),
+    'ESPEC': st.sidebar.multiselect(
+        "Especialidade do leito (ESPEC)", options=list(MAP_ESPEC),
+        format_func=lambda espec: f"{espec:02d} - {MAP_ESPEC[espec]}"
+    ),
+}
+# O período só vale com as duas datas escolhidas
+periodo = tuple(periodo) if len(periodo) == 2 else None
+filtros_ativos = periodo is not None or any(filtros.values())
+filtros_chave = tuple((dimensao, tuple(valores)) for dimensao, valores in filtros.items())
+
+
+# Os cubos não cruzam todas as dimensões dos filtros: com filtros, os registros são usados
+with instrumentacao.secao('filtros') as medicao, medicao.etapa('calculo'):
+    if usar_cubos and filtros_ativos:
+        usar_cubos = False
+        if not em_lotes:
+            indice = indexar_dados(tuple(ufs_selecionadas), tuple(competencias_selecionadas))
+            if indice is None:
+                st.stop()
+
+    # Fonte dos indicadores: 'cubos' e 'lotes' produzem um CubosSelecao; 'registros', o frame filtrado.
+    # Aqui só se conta o total filtrado; cada seção obtém a origem pelas funções em cache.
+    if usar_cubos:
+        fonte = 'cubos'
+        st.sidebar.caption("Fonte: cubos de agregados pré-calculados.")
+    elif em_lotes:
+        fonte = 'lotes'
+        cubos = agregar_lotes(tuple(ufs_selecionadas), tuple(competencias_selecionadas), filtros_chave, periodo)
+        total_filtrado = cubos.calcular_percentual_obitos()[0]
+        st.sidebar.caption(
+            f"Fonte: registros de AIH agregados em lotes ({total_filtrado:,.0f} internações após os filtros).".replace(',', '.')
+        )
+        if total_filtrado == 0:
+            st.warning("Nenhuma internação atende aos filtros selecionados.")
+            st.stop()
+    else:
+        fonte = 'registros'
+        total_filtrado = int(indice.mascara(filtros, periodo).sum()) if filtros_ativos else len(indice.df)
+        medicao.linhas += len(indice.df) if filtros_ativos else 0
+        st.sidebar.caption(
+            f"Fonte: registros de AIH ({total_filtrado:,.0f} internações após os filtros).".replace(',', '.')
+        )
+        if total_filtrado == 0:
+            st.warning("Nenhuma internação atende aos filtros selecionados.")
+            st.stop()
+
+# Seleção completa (chave das funções em cache de cada seção)
+selecao = (tuple(ufs_selecionadas), tuple(competencias_selecionadas), filtros_chave, periodo, fonte)
+
+# Gráficos como imagem (matplotlib, rasterizada no servidor) ou Vega-Lite (desenhado no navegador)
+st.sidebar.header("Exibição")
+motor_graficos = st.sidebar.radio("Gráficos", ["Imagem", "Interativo (Vega-Lite)"], horizontal=True)
+diagnostico = st.sidebar.toggle(
+    "Diagnóstico de desempenho", help="Tempo de cálculo e de renderização, linhas varridas e uso do cache de cada seção."
+)
 
-st.markdown("---")
+# --- 2. Funções de Geração de Gráficos e Resultados (Adaptadas do notebook) ---
 
-# --- GRÁFICOS E TABELAS (Análise Demográfica) ---
+# Os indicadores (contar_*, calcular_*) de sih.indicadores têm equivalentes, com o
+# mesmo nome, em sih.cubos.CubosSelecao; os gráficos (sih.graficos) recebem a
+# contagem pronta, venha ela dos registros ou dos cubos.
+
+def abrir_selecao(ufs, competencias, filtros, periodo, fonte):
+    """Origem dos indicadores: `CubosSelecao` (cubos ou lotes) ou o frame filtrado (registros)."""
+    if fonte == 'cubos':
+        return carregar_cubos(ufs, competencias)
+    if fonte == 'lotes':
+        return agregar_lotes(ufs, competencias, filtros, periodo)
+    return indexar_dados(ufs, competencias).filtrar(dict(filtros), periodo)
+
+def calcular(origem, indicador):
+    if isinstance(origem, pd.DataFrame):
+        return indicador(origem)
+    return getattr(origem, indicador.__name__)()
+
+# Contagens dos gráficos de cada seção
+GRAFICOS_SECOES = {
+    'demografia': {
+        'sexo': contar_sexo,
+        'faixa_etaria': contar_faixa_etaria,
+        'raca': contar_raca,
+        'tempo_medio_idade': calcular_tempo_medio_idade,
+    },
+    'localizacao': {
+        'municipios': contar_municipios,
+        'cid10': contar_capitulos_cid10,
+    },
+}
+
+# Etapa "agregar": contagens pequenas por estado dos filtros e seção. As últimas 32
+# seleções ficam em cache (as mais antigas são descartadas primeiro); revisitar uma
+# seleção não relê nem refiltra os registros.
+@st.cache_data(max_entries=32)
+def agregar_graficos(ufs, competencias, filtros, periodo, fonte, secao):
+    origem = abrir_selecao(ufs, competencias, filtros, periodo, fonte)
+    anotar_falha('agregar_graficos', linhas_varridas(origem))
+    contagens = {nome: calcular(origem, contar) for nome, contar in GRAFICOS_SECOES[secao].items()}
+    if 'municipios' in contagens:
+        contagens['municipios'] = rotular_municipios(contagens['municipios'], abrir_dimensoes().municipios)
+    return contagens
+
+# Detalhamento CID-10 (grupos de um capítulo, categorias de um grupo): bincount sobre os
+# códigos inteiros das categorias, ou soma do cubo por categoria
+@st.cache_data(max_entries=32)
+def detalhar_grafico_cid10(ufs, competencias, filtros, periodo, fonte, capitulo, grupo=None):
+    origem = abrir_selecao(ufs, competencias, filtros, periodo, fonte)
+    anotar_falha('detalhar_grafico_cid10', linhas_varridas(origem))
+    if isinstance(origem, pd.DataFrame):
+        return detalhar_cid10(origem, capitulo, grupo)
+    return origem.detalhar_cid10(capitulo, grupo)
+
+@st.cache_data(max_entries=32)
+def calcular_metricas(ufs, competencias, filtros, periodo, fonte):
+    origem = abrir_selecao(ufs, competencias, filtros, periodo, fonte)
+    anotar_falha('calcular_metricas', linhas_varridas(origem))
+    return calcular(origem, calcular_percentual_obitos), calcular(origem, calcular_custos)
+
+# Perfil por hospital calculado uma única vez por seleção; os rankings são seleções top-k sobre ele
+@st.cache_data(max_entries=32)
+def calcular_perfil_hospitais(ufs, competencias, filtros, periodo, fonte):
+    origem = abrir_selecao(ufs, competencias, filtros, periodo, fonte)
+    anotar_falha('calcular_perfil_hospitais', linhas_varridas(origem))
+    return calcular(origem, perfil_hospitais)
+
+@st.cache_data(max_entries=32)
+def calcular_financeiro(ufs, competencias, filtros, periodo, fonte):
+    origem = abrir_selecao(ufs, competencias, filtros, periodo, fonte)
+    anotar_falha('calcular_financeiro', linhas_varridas(origem))
+    return calcular(origem, calcular_valor_medio_obito), calcular(origem, calcular_proporcao_gestrisco)
+
+# Séries temporais: sem filtros (além do período), vêm das séries gravadas com os cubos, com
+# todo o histórico das UFs e sem ler registros; com filtros, são montadas a partir dos
+# registros filtrados das competências selecionadas. Com um período, lê também os períodos
+# anteriores de que a média móvel e o ano anterior precisam (`periodo_leitura`)
+@st.cache_data(max_entries=32)
+def carregar_serie(ufs, competencias, filtros, periodo, fonte, dimensao, chave, frequencia, janela, com_ano_anterior):
+    series = abrir_series()
+    historico = not any(valores for _, valores in filtros) and series.cobre(ufs)
+    if periodo is not None:
+        periodo = periodo_leitura(*periodo, frequencia, janela, com_ano_anterior)
+    if historico:
+        inicio, fim = periodo if periodo is not None else (None, None)
+        tabela = series.ler(dimensao, list(ufs), chave, inicio, fim)
+        linhas = tabela.num_rows
+    elif fonte == 'lotes':
+        tabela = selecionar_serie(
+            series_em_lotes(abrir_dataset(), list(ufs), list(competencias), dict(filtros), periodo,
+                            dimensoes=abrir_dimensoes()),
+            dimensao, chave,
+        )
+        linhas = abrir_dataset().linhas(ufs, competencias)
+    else:
+        df_filtrado = indexar_dados(ufs, competencias).filtrar(dict(filtros), periodo)
+        tabela = selecionar_serie(serializar(df_filtrado), dimensao, chave)
+        linhas = len(df_filtrado)
+    anotar_falha('carregar_serie', linhas)
+    return somar(tabela, frequencia), historico
+
+# Etapa "renderizar": PNG por contagem; a figura é fechada logo após a rasterização
+@st.cache_data(max_entries=64)
+def renderizar_grafico(nome, agregado):
+    anotar_falha('renderizar_grafico')
+    return renderizar_png(nome, agregado)
+
+def mostrar_grafico(nome, agregado):
+    if motor_graficos == "Imagem":
+        st.image(renderizar_grafico(nome, agregado), width='stretch')
+    else:
+        st.vega_lite_chart(spec=especificacao_vega(nome, agregado), width='stretch')
 
-st.header("👥 Análise Demográfica dos Pacientes")
+# Função de formatação de valores R$ para as tabelas
+def formatar_reais(valor):
+    if pd.isna(valor):
+        return "-"
+    return f'R$ {valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
 
-col_demografia1, col_demografia2 = st.columns(2)
+def formatar_inteiro(valor):
+    return f"{valor:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
-with col_demografia1:
-    st.subheader("Distribuição por Sexo")
-    fig_sexo = plot_distribuicao_sexo(df_bahia)
-    st.pyplot(fig_sexo)
+# 18: Valor Médio das Internações: Óbito vs. Não Óbito
+def formatar_valor_medio_obito(valor_medio_obito):
+    valor_medio_obito['Valor_Medio_R$'] = valor_medio_obito['Valor_Medio_Internacao'].apply(formatar_reais)
+    return valor_medio_obito[['Status', 'Valor_Medio_R$']]
 
-with col_demografia2:
-    st.subheader("Distribuição por Faixa Etária")
-    fig_idade = plot_distribuicao_idade(df_bahia)
-    st.pyplot(fig_idade)
+# Nome do hospital pela chave inteira do CNES na dimensão de estabelecimentos (se houver cadastro)
+def ranking_hospitais(perfil_hosp, ranking, colunas=None):
+    tabela = nomear_hospitais(ranking(perfil_hosp), dimensoes.cnes)
+    return tabela if colunas is None else tabela[[c for c in tabela.columns if c in ['CNES', 'Hospital'] + colunas]]
 
-st.markdown("---") # Opcional: separador visual
+# --- 3. Estrutura do Dashboard no Streamlit ---
 
-col_raca_tempo1, col_raca_tempo2 = st.columns(2)
+# Cada seção é medida em duas etapas: cálculo (funções em cache) e renderização. As
+# seções das abas são fragmentos: só a aba aberta é calculada, e um widget de uma
+# seção reexecuta apenas ela, sem recarregar os dados nem refazer as demais.
 
-with col_raca_tempo1:
-    st.subheader("Distribuição por Raça/Cor")
-    fig_raca = plot_distribuicao_raca(df_bahia)
-    st.pyplot(fig_raca)
+nomes_ufs = ', '.join(UFS[uf][1] for uf in ufs_selecionadas)
+competencias_texto = ', '.join(f"{c // 100}/{c % 100:02d}" for c in competencias_selecionadas)
 
-with col_raca_tempo2:
-    st.subheader("Tempo Médio de Permanência por Faixa Etária")
-    fig_tempo_idade = plot_tempo_medio_idade(df_bahia)
-    st.pyplot(fig_tempo_idade)
+st.title(f"🏥 Dashboard de Internações Hospitalares (SIH/SUS) - {nomes_ufs}")
+st.markdown(f"Análise de dados de Autorizações de Internação Hospitalar (AIH) do SUS ({nomes_ufs}), competência(s) {competencias_texto}.")
+st.markdown("---")
 
-# --- GRÁFICOS E TABELAS (Análise de Condições e Localização) ---
 
-st.header("📍 Condições de Saúde e Localização")
+# --- METRICS (Requisitos 5, 16, 17) ---
+def secao_metricas():
+    with instrumentacao.secao('metricas') as medicao:
+        with medicao.etapa('calculo'):
+            (total_internacoes, total_obitos, percentual_obitos), (valor_total_gasto, custo_medio_internacao) = (
+                calcular_metricas(*selecao)
+            )
+
+        with medicao.etapa('renderizacao'):
+            st.header("🎯 Principais Métricas")
+            col1, col2, col3, col4 = st.columns(4)
+
+            with col1:
+                st.metric(
+                    label="Total de Internações",
+                    value=formatar_inteiro(total_internacoes)
+                )
+            with col2:
+                st.metric(
+                    label="Percentual de Óbitos",
+                    value=f"{percentual_obitos:.2f}%",
+                    delta=f"{formatar_inteiro(total_obitos)} Óbitos"
+                )
+            with col3:
+                st.metric(
+                    label="Custo Total (VAL_TOT)",
+                    value=formatar_reais(valor_total_gasto)
+                )
+            with col4:
+                st.metric(
+                    label="Custo Médio por Internação",
+                    value=formatar_reais(custo_medio_internacao)
+                )
 
-col_local1, col_local2 = st.columns(2)
 
-with col_local1:
-    st.subheader("Top 10 Cidades de Estabelecimento")
-    fig_municipios = plot_top_municipios(df_bahia, df_municipios)
-    st.pyplot(fig_municipios)
+# --- GRÁFICOS E TABELAS (Análise Demográfica) ---
+@st.fragment
+def secao_demografia():
+    with instrumentacao.secao('demografia') as medicao:
+        with medicao.etapa('calculo'):
+            contagens = agregar_graficos(*selecao, 'demografia')
 
-with col_local2:
-    st.subheader("Internações por Capítulo da CID-10 (Principal)")
-    fig_cid = plot_distribuicao_cid10(df_bahia)
-    st.pyplot(fig_cid)
+        with medicao.etapa('renderizacao'):
+            col_demografia1, col_demografia2 = st.columns(2)
 
-st.markdown("---")
+            with col_demografia1:
+                st.subheader("Distribuição por Sexo")
+                mostrar_grafico('sexo', contagens['sexo'])
 
-# --- ANÁLISE DETALHADA POR HOSPITAL (Requisitos 11, 12, 13, 15) ---
-st.header("🏥 Análise por Hospital (CNES)")
+            with col_demografia2:
+                st.subheader("Distribuição por Faixa Etária")
+                mostrar_grafico('faixa_etaria', contagens['faixa_etaria'])
 
-# Função de formatação de valores R$ para as tabelas
-def formatar_reais(valor):
-    if pd.isna(valor):
-        return "-"
-    return f'R$ {valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+            st.markdown("---") # Opcional: separador visual
 
-# 11: Top 10 Hospitais por Número de Internações
-def get_top_hospitais_internacoes(df_bahia):
-    df_temp = df_bahia.dropna(subset=['CNES']).copy()
-    df_temp = df_temp[df_temp['CNES'].str.len() > 0].copy()
-    frequencia_hospitais = df_temp['CNES'].value_counts().reset_index()
-    frequencia_hospitais.columns = ['CNES', 'Total_Internacoes']
-    return frequencia_hospitais.head(10)
-
-# 12: Top 10 Hospitais por Tempo Médio de Permanência
-def get_top_hospitais_tempo_medio(df_bahia):
-    df_temp = df_bahia.dropna(subset=['CNES', 'DIAS_PERM']).copy()
-    df_temp = df_temp[df_temp['CNES'].str.len() > 0].copy()
-    tempo_medio_hospitais = (
-        df_temp.groupby('CNES')['DIAS_PERM']
-        .mean()
-        .reset_index()
-        .sort_values(by='DIAS_PERM', ascending=False)
-    )
-    tempo_medio_hospitais.columns = ['CNES', 'Tempo_Medio_Permanencia_(dias)']
-    return tempo_medio_hospitais.head(10)
-
-# 13: Top 10 Hospitais por Taxa de Mortalidade
-def get_top_hospitais_mortalidade(df_bahia):
-    df_temp = df_bahia.dropna(subset=['CNES', 'MORTE']).copy()
-    df_temp['CNES'] = df_temp['CNES'].astype(str).str.strip()
-    df_temp = df_temp[df_temp['CNES'].str.len() > 0].copy()
-    
-    mortalidade_hosp = df_temp.groupby('CNES').agg(
-        Total_Internacoes=('MORTE', 'size'),
-        Total_Obitos=('MORTE', lambda x: (x == 1).sum())
-    ).reset_index()
-    
-    MIN_INTERNACOES = 50 
-    mortalidade_hosp = mortalidade_hosp[mortalidade_hosp['Total_Internacoes'] >= MIN_INTERNACOES].copy()
-    mortalidade_hosp['Taxa_Mortalidade_(%)'] = (mortalidade_hosp['Total_Obitos'] / mortalidade_hosp['Total_Internacoes']) * 100
-    
-    return mortalidade_hosp.sort_values(by='Taxa_Mortalidade_(%)', ascending=False).head(10)
-
-# 15: Top 10 Hospitais por Proporção de Internações em UTI
-def get_top_hospitais_uti(df_bahia):
-    df_temp = df_bahia.dropna(subset=['CNES', 'MARCA_UTI']).copy()
-    df_temp['CNES'] = df_temp['CNES'].astype(str).str.strip()
-    df_temp = df_temp[df_temp['CNES'].str.len() > 0].copy()
-    
-    proporcao_uti_hosp = df_temp.groupby('CNES').agg(
-        Total_Internacoes=('MARCA_UTI', 'size'),
-        Total_UTI=('MARCA_UTI', lambda x: (x > 0).sum())
-    ).reset_index()
-    
-    MIN_INTERNACOES = 50
-    proporcao_uti_hosp = proporcao_uti_hosp[proporcao_uti_hosp['Total_Internacoes'] >= MIN_INTERNACOES].copy()
-    proporcao_uti_hosp['Proporcao_UTI_(%)'] = (proporcao_uti_hosp['Total_UTI'] / proporcao_uti_hosp['Total_Internacoes']) * 100
-    
-    return proporcao_uti_hosp.sort_values(by='Proporcao_UTI_(%)', ascending=False).head(10)
+            col_raca_tempo1, col_raca_tempo2 = st.columns(2)
 
-# 18: Valor Médio das Internações: Óbito vs. Não Óbito
-def get_valor_medio_obito(df_bahia):
-    valor_medio_obito = (
-        df_bahia.groupby('Status_Obito')['VAL_TOT']
-        .mean()
-        .reset_index()
-        .sort_values(by='VAL_TOT', ascending=False)
-    )
-    valor_medio_obito.columns = ['Status', 'Valor_Medio_Internacao']
-    valor_medio_obito['Valor_Medio_R$'] = valor_medio_obito['Valor_Medio_Internacao'].apply(formatar_reais)
-    return valor_medio_obito[['Status', 'Valor_Medio_R$']]
+            with col_raca_tempo1:
+                st.subheader("Distribuição por Raça/Cor")
+                mostrar_grafico('raca', contagens['raca'])
 
-# Exibir os resultados em colunas
-col_hosp1, col_hosp2 = st.columns(2)
+            with col_raca_tempo2:
+                st.subheader("Tempo Médio de Permanência por Faixa Etária")
+                mostrar_grafico('tempo_medio_idade', contagens['tempo_medio_idade'])
 
-with col_hosp1:
-    st.subheader("📈 Top 10 Hospitais por Internações")
-    df_hosp_internacoes = get_top_hospitais_internacoes(df_bahia)
-    st.dataframe(df_hosp_internacoes, hide_index=True)
-    
-    st.subheader("💀 Top 10 Hospitais por Taxa de Mortalidade (Min. 50 Internações)")
-    df_hosp_mortalidade = get_top_hospitais_mortalidade(df_bahia)
-    df_hosp_mortalidade['Taxa_Mortalidade_(%)'] = df_hosp_mortalidade['Taxa_Mortalidade_(%)'].map('{:.2f}%'.format)
-    st.dataframe(df_hosp_mortalidade[['CNES', 'Total_Internacoes', 'Taxa_Mortalidade_(%)']], hide_index=True)
 
+# --- GRÁFICOS E TABELAS (Análise de Condições e Localização) ---
+@st.fragment
+def secao_localizacao():
+    with instrumentacao.secao('localizacao') as medicao:
+        with medicao.etapa('calculo'):
+            contagens = agregar_graficos(*selecao, 'localizacao')
+
+        col_local1, col_local2 = st.columns(2)
+
+        with col_local1, medicao.etapa('renderizacao'):
+            st.subheader("Top 10 Cidades de Estabelecimento")
+            mostrar_grafico('municipios', contagens['municipios'])
+
+        with col_local2:
+            with medicao.etapa('renderizacao'):
+                st.subheader("Internações por Capítulo da CID-10 (Principal)")
+                mostrar_grafico('cid10', contagens['cid10'])
+
+            # Detalhamento: capítulo -> grupo -> categoria de 3 caracteres
+            capitulos = [c for c in contagens['cid10']['Capitulo_CID'] if c != NAO_MAPEADO]
+            capitulo_detalhe = st.selectbox(
+                "Detalhar capítulo", [None] + capitulos, format_func=lambda c: "—" if c is None else c
+            )
+            if capitulo_detalhe is not None:
+                with medicao.etapa('calculo'):
+                    detalhe_grupos = detalhar_grafico_cid10(*selecao, capitulo_detalhe)
+                grupo_detalhe = st.selectbox(
+                    "Detalhar grupo", [None] + list(detalhe_grupos['Grupo_CID']),
+                    format_func=lambda g: "—" if g is None else g
+                )
+                if grupo_detalhe is None:
+                    detalhe = detalhe_grupos
+                else:
+                    with medicao.etapa('calculo'):
+                        detalhe = detalhar_grafico_cid10(*selecao, capitulo_detalhe, grupo_detalhe)
+                with medicao.etapa('renderizacao'):
+                    mostrar_grafico('cid10_detalhe', detalhe)
 
-with col_hosp2:
-    st.subheader("⏱️ Top 10 Hospitais por Tempo Médio de Permanência (dias)")
-    df_hosp_tempo = get_top_hospitais_tempo_medio(df_bahia)
-    df_hosp_tempo['Tempo_Medio_Permanencia_(dias)'] = df_hosp_tempo['Tempo_Medio_Permanencia_(dias)'].map('{:.2f}'.format)
-    st.dataframe(df_hosp_tempo, hide_index=True)
 
-    st.subheader(" intensive_care_unit: Top 10 Hospitais por Proporção de UTI (Min. 50 Internações)")
-    df_hosp_uti = get_top_hospitais_uti(df_bahia)
-    df_hosp_uti['Proporcao_UTI_(%)'] = df_hosp_uti['Proporcao_UTI_(%)'].map('{:.2f}%'.format)
-    st.dataframe(df_hosp_uti[['CNES', 'Total_Internacoes', 'Proporcao_UTI_(%)']], hide_index=True)
+# --- ANÁLISE DETALHADA POR HOSPITAL (Requisitos 11, 12, 13, 15) ---
+@st.fragment
+def secao_hospitais():
+    with instrumentacao.secao('hospitais') as medicao:
+        with medicao.etapa('calculo'):
+            perfil_hosp = calcular_perfil_hospitais(*selecao)
+            df_hosp_internacoes = ranking_hospitais(perfil_hosp, get_top_hospitais_internacoes)
+            df_hosp_mortalidade = ranking_hospitais(
+                perfil_hosp, get_top_hospitais_mortalidade, ['Total_Internacoes', 'Taxa_Mortalidade_(%)']
+            )
+            df_hosp_tempo = ranking_hospitais(perfil_hosp, get_top_hospitais_tempo_medio)
+            df_hosp_uti = ranking_hospitais(perfil_hosp, get_top_hospitais_uti, ['Total_Internacoes', 'Proporcao_UTI_(%)'])
+
+        with medicao.etapa('renderizacao'):
+            # Exibir os resultados em colunas
+            col_hosp1, col_hosp2 = st.columns(2)
+
+            with col_hosp1:
+                st.subheader("📈 Top 10 Hospitais por Internações")
+                st.dataframe(df_hosp_internacoes, hide_index=True)
+
+                st.subheader("💀 Top 10 Hospitais por Taxa de Mortalidade (Min. 50 Internações)")
+                df_hosp_mortalidade['Taxa_Mortalidade_(%)'] = df_hosp_mortalidade['Taxa_Mortalidade_(%)'].map('{:.2f}%'.format)
+                st.dataframe(df_hosp_mortalidade, hide_index=True)
+
+            with col_hosp2:
+                st.subheader("⏱️ Top 10 Hospitais por Tempo Médio de Permanência (dias)")
+                df_hosp_tempo['Tempo_Medio_Permanencia_(dias)'] = df_hosp_tempo['Tempo_Medio_Permanencia_(dias)'].map('{:.2f}'.format)
+                st.dataframe(df_hosp_tempo, hide_index=True)
+
+                st.subheader(" intensive_care_unit: Top 10 Hospitais por Proporção de UTI (Min. 50 Internações)")
+                df_hosp_uti['Proporcao_UTI_(%)'] = df_hosp_uti['Proporcao_UTI_(%)'].map('{:.2f}%'.format)
+                st.dataframe(df_hosp_uti, hide_index=True)
+
+        # O perfil completo só é montado com o expansor aberto
+        perfil_completo = st.expander("Perfil completo dos hospitais", key='perfil_completo', on_change='rerun')
+        if perfil_completo.open:
+            with medicao.etapa('calculo'):
+                df_perfil = perfil_hosp[['internacoes', 'tempo_medio', 'obitos', 'taxa_mortalidade', 'uti', 'proporcao_uti', 'val_tot', 'val_uti']].reset_index()
+                df_perfil.columns = [
+                    'CNES', 'Total_Internacoes', 'Tempo_Medio_Permanencia_(dias)', 'Total_Obitos', 'Taxa_Mortalidade_(%)',
+                    'Total_UTI', 'Proporcao_UTI_(%)', 'Valor_Total_(VAL_TOT)', 'Valor_UTI_(VAL_UTI)'
+                ]
+                if len(dimensoes.cnes):
+                    # Hospital -> município -> região de saúde: três `take` pelas chaves inteiras
+                    descricao = dimensoes.descrever_cnes(df_perfil['CNES'].astype(str)).set_axis(df_perfil.index)
+                    df_perfil = pd.concat([df_perfil[['CNES']], descricao, df_perfil.drop(columns='CNES')], axis=1)
+            with perfil_completo, medicao.etapa('renderizacao'):
+                st.dataframe(df_perfil.sort_values('Total_Internacoes', ascending=False), hide_index=True)
 
-st.markdown("---")
 
 # --- ANÁLISE FINANCEIRA DE ÓBITOS E GESTRISCO (Requisitos 6, 18) ---
-st.header("💲 Análise Financeira e Obstétrica")
-
-col_fin1, col_fin2 = st.columns(2)
-
-# Requisito 6: Proporção de gestantes de risco
-def calcular_proporcao_gestrisco(df_bahia):
-    df_obstetricas_bahia = df_bahia[df_bahia['ESPEC'] == 2].copy()
-    total_obstetricas = len(df_obstetricas_bahia)
-    total_gestrisco = df_obstetricas_bahia[df_obstetricas_bahia['GESTRISCO'] == 1].shape[0]
-    proporcao_gestrisco = (total_gestrisco / total_obstetricas) * 100 if total_obstetricas > 0 else 0
-    return total_obstetricas, total_gestrisco, proporcao_gestrisco
-
-with col_fin1:
-    st.subheader("Valor Médio de Internação: Óbito vs. Não Óbito")
-    df_valor_obito = get_valor_medio_obito(df_bahia)
-    st.dataframe(df_valor_obito, hide_index=True)
-
-with col_fin2:
-    total_obstetricas, total_gestrisco, proporcao_gestrisco = calcular_proporcao_gestrisco(df_bahia)
-    st.subheader("Proporção de Gestantes de Risco (Internações Obstétricas)")
-    st.metric(
-        label="Total de Internações Obstétricas (ESPEC=2)",
-        value=f"{total_obstetricas:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
-    st.metric(
-        label="Gestantes de Risco (GESTRISCO=1)",
-        value=f"{total_gestrisco:,.0f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-    )
-    st.metric(
-        label="Proporção de Risco",
-        value=f"{proporcao_gestrisco:.2f}%"
-    )
+@st.fragment
+def secao_financeira():
+    with instrumentacao.secao('financeira') as medicao:
+        with medicao.etapa('calculo'):
+            valor_medio_obito, (total_obstetricas, total_gestrisco, proporcao_gestrisco) = calcular_financeiro(*selecao)
+
+        with medicao.etapa('renderizacao'):
+            col_fin1, col_fin2 = st.columns(2)
+
+            with col_fin1:
+                st.subheader("Valor Médio de Internação: Óbito vs. Não Óbito")
+                st.dataframe(formatar_valor_medio_obito(valor_medio_obito), hide_index=True)
+
+            with col_fin2:
+                st.subheader("Proporção de Gestantes de Risco (Internações Obstétricas)")
+                st.metric(
+                    label="Total de Internações Obstétricas (ESPEC=2)",
+                    value=formatar_inteiro(total_obstetricas)
+                )
+                st.metric(
+                    label="Gestantes de Risco (GESTRISCO=1)",
+                    value=formatar_inteiro(total_gestrisco)
+                )
+                st.metric(
+                    label="Proporção de Risco",
+                    value=f"{proporcao_gestrisco:.2f}%"
+                )
+
+
+# --- SÉRIES TEMPORAIS (por dia de internação) ---
+@st.fragment
+def secao_series():
+    with instrumentacao.secao('series') as medicao:
+        col_serie1, col_serie2, col_serie3 = st.columns(3)
+
+        # Valores de cada dimensão: os mesmos da barra lateral
+        opcoes_dimensao = {
+            'UF': (ufs_selecionadas, lambda uf: f"{uf} - {UFS[uf][1]}"),
+            'MUNIC_MOV': (list(nomes_municipios), lambda codigo: f"{nomes_municipios[codigo]} ({codigo})"),
+            'CNES': (opcoes_cnes, str),
+            'capitulo_cid': (ROTULOS_CAPITULOS, str),
+        }
+        with col_serie1:
+            dimensao = st.selectbox("Série por", list(DIMENSOES_SERIE), format_func=DIMENSOES_SERIE.get)
+            opcoes, rotulo = opcoes_dimensao[dimensao]
+            chave = st.selectbox(
+                DIMENSOES_SERIE[dimensao], [None] + list(opcoes), key=f'serie_{dimensao}',
+                format_func=lambda valor: "Todos" if valor is None else rotulo(valor)
+            )
+        with col_serie2:
+            indicador = st.selectbox("Indicador", list(INDICADORES), format_func=INDICADORES.get)
+            frequencia = st.radio(
+                "Frequência", list(FREQUENCIAS), index=2, horizontal=True, format_func=lambda f: FREQUENCIAS[f][0]
+            )
+        with col_serie3:
+            janela = st.number_input("Média móvel (períodos)", min_value=1, max_value=FREQUENCIAS[frequencia][2], value=1)
+            com_ano_anterior = st.checkbox("Comparar com o ano anterior")
+
+        with medicao.etapa('calculo'):
+            somas, historico = carregar_serie(*selecao, dimensao, chave, frequencia, janela, com_ano_anterior)
+            inicio, fim = periodo if periodo is not None else (None, None)
+            tabela = None if somas.empty else comparar(somas, indicador, frequencia, janela, com_ano_anterior, inicio, fim)
+            if tabela is not None and tabela.empty:
+                tabela = None
+
+        with medicao.etapa('renderizacao'):
+            if tabela is None:
+                st.info("Nenhuma internação para o valor escolhido.")
+                return
+            mostrar_grafico('serie', tabela)
+            with st.expander("Dados da série"):
+                st.dataframe(tabela, hide_index=True)
+            if historico:
+                st.caption("Todas as competências já agregadas das UFs selecionadas (séries gravadas com os cubos).")
+            else:
+                st.caption(
+                    "Competências selecionadas, com os filtros aplicados: internações de meses anteriores à primeira "
+                    "competência aparecem incompletas. Sem filtros, com as séries de `python -m sih.cubos`, o histórico é completo."
+                )
+
+
+# Abas na ordem da página; a troca de aba reexecuta apenas este fragmento
+SECOES = {
+    "👥 Análise Demográfica dos Pacientes": secao_demografia,
+    "📍 Condições de Saúde e Localização": secao_localizacao,
+    "🏥 Análise por Hospital (CNES)": secao_hospitais,
+    "💲 Análise Financeira e Obstétrica": secao_financeira,
+    "📈 Séries Temporais": secao_series,
+}
+
+@st.fragment
+def mostrar_secoes():
+    abas = st.tabs(list(SECOES), key='secao_aberta', on_change='rerun')
+    for aba, mostrar in zip(abas, SECOES.values()):
+        if aba.open:
+            with aba:
+                mostrar()
+
+# Painel de diagnóstico: última medição de cada seção nesta sessão. "Atualizar" reexecuta
+# só o painel, para incluir as seções reexecutadas depois dele
+@st.fragment
+def painel_desempenho():
+    st.button("Atualizar medições")
+    st.dataframe(instrumentacao.tabela(), hide_index=True)
+
+secao_metricas()
+st.markdown("---")
+mostrar_secoes()
 
 st.markdown("---")
-st.caption("Dados de referência: SIH/SUS - Bahia (RD202401).")
+if diagnostico:
+    with st.expander("⏱️ Desempenho por seção", expanded=True):
+        painel_desempenho()
+st.caption(f"Dados de referência: SIH/SUS - {nomes_ufs} ({competencias_texto}).")
@@ -0,0 +1 @@
+"""Camada de dados e indicadores do SIH/SUS usada pelo dashboard (`app.py`)."""
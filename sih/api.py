@@ -0,0 +1,279 @@
+"""API HTTP local dos indicadores do dashboard (modo opcional).
+
+`python -m sih.api` serve as tabelas de `sih.relatorios` (métricas,
+distribuições e rankings de hospitais) por UF, competência, período e os
+mesmos filtros da barra lateral, em JSON ou em stream Arrow IPC. Requer os
+pacotes opcionais `starlette` e `uvicorn`.
+
+A origem de cada consulta segue o dashboard: cubos de `sih.cubos` quando
+cobrem a seleção sem filtros; senão, os registros limpos do cache Arrow em
+disco (os mesmos arquivos do dashboard) ou, com `--lotes`, a agregação em
+lotes por partição. As respostas já serializadas ficam em um
+`CacheResultados` com validade e descarte LRU, compartilhado por todas as
+conexões; um acerto é respondido no próprio laço de eventos, sem recalcular
+nem reserializar. O servidor é assíncrono (ASGI, uvicorn) e mantém as
+conexões abertas entre requisições (keep-alive).
+
+Rotas:
+
+* `GET /`: UFs disponíveis, tabelas, filtros e formatos;
+* `GET /competencias?ufs=BA,SE`: competências disponíveis das UFs;
+* `GET /indicadores/{tabela}?ufs=BA&competencias=202401,202402&inicio=2024-01-01&fim=2024-01-31&CNES=...&formato=arrow`.
+"""
+import argparse
+import json
+from datetime import date
+
+import pyarrow as pa
+
+from sih.cache import CacheArrow, CacheResultados
+from sih.cubos import CubosRD
+from sih.dataset import UFS, DatasetRD
+from sih.dimensoes import DimensoesRD
+from sih.filtros import IndiceFiltros
+from sih.hospitais import nomear_hospitais
+from sih.paralelo import abrir_pool, calcular_em_paralelo, tipar_em_paralelo
+from sih.preprocessamento import montar_frame
+from sih.relatorios import RANKINGS, TABELAS, calcular_tabela
+
+# Filtros aceitos como parâmetros (os mesmos da barra lateral do dashboard)
+FILTROS = ['MUNIC_MOV', 'regiao_saude', 'CNES', 'capitulo_cid', 'SEXO', 'faixa_etaria', 'ESPEC']
+
+# Formato -> tipo de conteúdo da resposta
+FORMATOS = {
+    'json': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Seleções cujos registros ficam carregados em memória (como no dashboard)
+SELECOES_EM_MEMORIA = 4
+
+# O catálogo de partições e as dimensões são relidos a cada 10 minutos
+VALIDADE_CATALOGO = 600
+
+
+class ParametroInvalido(ValueError):
+    """Parâmetro de consulta ausente ou mal formado (resposta 400)."""
+
+
+# --- Cálculo (síncrono, fora do laço de eventos) ---
+
+class ServicoIndicadores:
+    """Tabelas de indicadores por seleção, com as mesmas origens e caches em disco do dashboard."""
+
+    def __init__(self, diretorio_dados='datasets', diretorio_cubos='cubos', diretorio_cache='cache',
+                 diretorio_dimensoes='dimensoes', em_lotes=False, maximo=1024, ttl=300):
+        self.diretorio_dados = diretorio_dados
+        self.diretorio_dimensoes = diretorio_dimensoes
+        self.em_lotes = em_lotes
+        self.cubos = CubosRD(diretorio_cubos)
+        self.cache_arrow = CacheArrow(diretorio_cache)
+        self.pool = abrir_pool() if em_lotes else None
+        self.respostas = CacheResultados(maximo, ttl)
+        self._catalogo = CacheResultados(2, VALIDADE_CATALOGO)
+        self._indices = CacheResultados(SELECOES_EM_MEMORIA)
+
+    def dataset(self):
+        return self._catalogo.obter('dataset', lambda: DatasetRD(self.diretorio_dados))
+
+    def dimensoes(self):
+        return self._catalogo.obter(
+            'dimensoes', lambda: DimensoesRD.abrir(self.diretorio_dados, self.diretorio_dimensoes)
+        )
+
+    def _indexar(self, ufs, competencias):
+        dataset = self.dataset()
+        arquivos = [p.caminho for p in dataset.arquivos(ufs, competencias)]
+        # Mesma entrada do cache Arrow que o dashboard usa para a seleção
+        tabela = self.cache_arrow.obter(
+            'rd', arquivos, lambda: tipar_em_paralelo(dataset, list(ufs), list(competencias)),
+            ufs=ufs, competencias=competencias,
+        )
+        return IndiceFiltros(montar_frame(tabela), self.dimensoes())
+
+    def origem(self, ufs, competencias, filtros, periodo):
+        """(fonte, origem): `CubosSelecao` dos cubos ou dos lotes, ou o frame filtrado dos registros."""
+        filtros = dict(filtros)
+        filtros_ativos = periodo is not None or any(filtros.values())
+        if not filtros_ativos and self.cubos.cobre(list(ufs), list(competencias)):
+            return 'cubos', self.cubos.ler(list(ufs), list(competencias))
+        if self.em_lotes:
+            return 'lotes', calcular_em_paralelo(self.dataset(), list(ufs), list(competencias), filtros, periodo,
+                                                 pool=self.pool, dimensoes=self.dimensoes())
+        indice = self._indices.obter((ufs, competencias), lambda: self._indexar(ufs, competencias))
+        return 'registros', indice.filtrar(filtros, periodo)
+
+    def tabela(self, tabela, ufs, competencias, filtros=(), periodo=None):
+        """(fonte, DataFrame) de uma tabela de `sih.relatorios.TABELAS` para a seleção."""
+        if tabela not in TABELAS:
+            raise KeyError(f"Tabela desconhecida: {tabela}")
+        fonte, origem = self.origem(ufs, competencias, filtros, periodo)
+        resultado = calcular_tabela(origem, tabela)
+        if tabela in RANKINGS and len(self.dimensoes().cnes):
+            resultado = nomear_hospitais(resultado, self.dimensoes().cnes)
+        return fonte, resultado
+
+    def resposta(self, chave):
+        """(fonte, corpo em bytes) da consulta `chave`, da cache de respostas ou calculada."""
+        return self.respostas.obter(chave, lambda: self._serializar(*chave))
+
+    def _serializar(self, tabela, formato, ufs, competencias, filtros, periodo):
+        fonte, resultado = self.tabela(tabela, ufs, competencias, filtros, periodo)
+        if formato == 'arrow':
+            return fonte, serializar_arrow(resultado, fonte)
+        return fonte, serializar_json(resultado, tabela, fonte, ufs, competencias)
+
+
+def serializar_json(resultado, tabela, fonte, ufs, competencias):
+    # to_json converte NaN em null e tipos do NumPy/pandas em tipos JSON
+    conteudo = {
+        'tabela': tabela, 'fonte': fonte, 'ufs': list(ufs), 'competencias': list(competencias),
+        'linhas': json.loads(resultado.to_json(orient='records', force_ascii=False)),
+    }
+    return json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+
+
+def serializar_arrow(resultado, fonte):
+    """Stream Arrow IPC de uma tabela; a fonte vai nos metadados do esquema."""
+    tabela = pa.Table.from_pandas(resultado, preserve_index=False)
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b'fonte': fonte.encode()})
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue().to_pybytes()
+
+
+# --- Parâmetros ---
+
+def _lista(parametros, nome):
+    """Valores de um parâmetro repetido (`ufs=BA&ufs=SE`) ou separado por vírgulas (`ufs=BA,SE`)."""
+    return [valor for item in parametros.getlist(nome) for valor in item.split(',') if valor]
+
+
+def _inteiros(valores, nome):
+    try:
+        return [int(valor) for valor in valores]
+    except ValueError:
+        raise ParametroInvalido(f"'{nome}' deve conter apenas números inteiros") from None
+
+
+def consulta(parametros, dataset, tabela):
+    """Chave da consulta (tabela, formato, UFs, competências, filtros, período) a partir da query string.
+
+    Sem `competencias`, usa a última competência disponível das UFs, como o dashboard.
+    """
+    formato = parametros.get('formato', 'json')
+    if formato not in FORMATOS:
+        raise ParametroInvalido(f"'formato' deve ser um de: {', '.join(FORMATOS)}")
+    ufs = tuple(sorted({uf.upper() for uf in _lista(parametros, 'ufs')}))
+    if not ufs:
+        raise ParametroInvalido("Informe ao menos uma UF em 'ufs'")
+    desconhecidas = [uf for uf in ufs if uf not in UFS]
+    if desconhecidas:
+        raise ParametroInvalido(f"UF(s) desconhecida(s): {', '.join(desconhecidas)}")
+    competencias = tuple(sorted(set(_inteiros(_lista(parametros, 'competencias'), 'competencias'))))
+    if not competencias:
+        competencias = tuple(dataset.competencias(list(ufs))[-1:])
+        if not competencias:
+            raise FileNotFoundError(f"Nenhuma competência para UF(s) {', '.join(ufs)}")
+    filtros = tuple(
+        (dimensao, tuple(_inteiros(_lista(parametros, dimensao), dimensao) if dimensao == 'ESPEC'
+                         else _lista(parametros, dimensao)))
+        for dimensao in FILTROS
+    )
+    # O período só vale com as duas datas, como no dashboard
+    inicio, fim = parametros.get('inicio'), parametros.get('fim')
+    if (inicio is None) != (fim is None):
+        raise ParametroInvalido("Informe 'inicio' e 'fim' juntos")
+    try:
+        periodo = None if inicio is None else (date.fromisoformat(inicio), date.fromisoformat(fim))
+    except ValueError:
+        raise ParametroInvalido("'inicio' e 'fim' devem estar no formato AAAA-MM-DD") from None
+    return tabela, formato, ufs, competencias, filtros, periodo
+
+
+# --- Servidor ASGI ---
+
+def criar_app(servico):
+    """Aplicação Starlette que serve as consultas de `servico` (`ServicoIndicadores`)."""
+    try:
+        from starlette.applications import Starlette
+        from starlette.concurrency import run_in_threadpool
+        from starlette.responses import JSONResponse, Response
+        from starlette.routing import Route
+    except ImportError as erro:
+        raise ImportError("O modo API requer os pacotes 'starlette' e 'uvicorn' (pip install starlette uvicorn)") from erro
+
+    def erro(status, mensagem):
+        return JSONResponse({'erro': mensagem}, status_code=status)
+
+    async def catalogo(request):
+        dataset = await run_in_threadpool(servico.dataset)
+        return JSONResponse({
+            'ufs': dataset.ufs(), 'tabelas': TABELAS, 'filtros': FILTROS, 'formatos': list(FORMATOS),
+        })
+
+    async def competencias(request):
+        ufs = [uf.upper() for uf in _lista(request.query_params, 'ufs')]
+        if any(uf not in UFS for uf in ufs):
+            return erro(400, f"UF(s) desconhecida(s): {', '.join(uf for uf in ufs if uf not in UFS)}")
+        dataset = await run_in_threadpool(servico.dataset)
+        return JSONResponse({'ufs': ufs, 'competencias': dataset.competencias(ufs or None)})
+
+    async def indicador(request):
+        tabela = request.path_params['tabela']
+        if tabela not in TABELAS:
+            return erro(404, f"Tabela desconhecida: {tabela}")
+        # O catálogo expira e é relistado (ou esperado, se outra thread o relista) fora do laço
+        dataset = await run_in_threadpool(servico.dataset)
+        try:
+            chave = consulta(request.query_params, dataset, tabela)
+        except ParametroInvalido as e:
+            return erro(400, str(e))
+        except FileNotFoundError as e:
+            return erro(404, str(e))
+        # Acerto de cache: respondido no laço de eventos; o cálculo vai para uma thread
+        resultado = servico.respostas.consultar(chave)
+        if resultado is None:
+            try:
+                resultado = await run_in_threadpool(servico.resposta, chave)
+            except FileNotFoundError as e:
+                return erro(404, str(e))
+        fonte, corpo = resultado
+        return Response(corpo, media_type=FORMATOS[chave[1]], headers={
+            'X-Fonte': fonte,
+            'Cache-Control': f'max-age={int(servico.respostas.ttl or 0)}',
+        })
+
+    return Starlette(routes=[
+        Route('/', catalogo),
+        Route('/competencias', competencias),
+        Route('/indicadores/{tabela}', indicador),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve os indicadores do dashboard por HTTP (JSON ou Arrow IPC).")
+    parser.add_argument('--dados', default='datasets', help="diretório com os arquivos RD (.parquet)")
+    parser.add_argument('--cubos', default='cubos', help="diretório dos cubos (`python -m sih.cubos`)")
+    parser.add_argument('--cache', default='cache', help="diretório do cache Arrow das tabelas limpas")
+    parser.add_argument('--dimensoes', default='dimensoes', help="diretório das dimensões (`python -m sih.dimensoes`)")
+    parser.add_argument('--lotes', action='store_true', help="agrega os registros em lotes, por partição, em vez de carregá-los")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--ttl', type=float, default=300, help="validade das respostas em cache (segundos)")
+    parser.add_argument('--max-respostas', type=int, default=1024, help="respostas mantidas em cache (LRU)")
+    parser.add_argument('--keep-alive', type=int, default=30, help="segundos que uma conexão ociosa fica aberta")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError as erro:
+        raise ImportError("O modo API requer os pacotes 'starlette' e 'uvicorn' (pip install starlette uvicorn)") from erro
+
+    servico = ServicoIndicadores(args.dados, args.cubos, args.cache, args.dimensoes, args.lotes,
+                                 args.max_respostas, args.ttl)
+    uvicorn.run(criar_app(servico), host=args.host, port=args.porta, timeout_keep_alive=args.keep_alive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark do carregamento e de cada indicador, sobre dados RD sintéticos.
+
+Para cada escala (número de internações), gera um arquivo `RDBA` com
+`sih.sintetico` e mede tempo e pico de memória de:
+
+* `carregar_dados` (leitura do parquet + pré-processamento, sem os caches do dashboard);
+* cada `calcular_*`/`contar_*` de `sih.indicadores` e o detalhamento CID-10
+  do capítulo mais frequente;
+* o perfil por hospital e cada `get_top_hospitais_*` de `sih.hospitais`;
+* cada gráfico de `sih.graficos` (`plot_*` rasterizado em PNG e `vega_*`).
+
+O tempo é o melhor de N repetições. O pico de memória vem de uma execução
+separada: o tracemalloc cobre Python, NumPy e pandas, e um pool proxy do
+Arrow cobre os buffers do pyarrow. Cada medição vira uma linha JSON acrescentada
+ao arquivo de saída, para comparar execuções e escalas
+(`python -m sih.benchmark --escalas 10000 1000000`).
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import matplotlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from sih import graficos, hospitais, indicadores
+from sih.dataset import DatasetRD
+from sih.dimensoes import Dimensao
+from sih.paralelo import tipar_em_paralelo
+from sih.preprocessamento import montar_frame
+from sih.sintetico import gerar_arquivo, nome_arquivo
+
+ESCALAS = [10_000, 100_000, 1_000_000]
+
+COMPETENCIA = 202401
+UF = 'BA'
+
+# Pools proxy do Arrow usados nas medições: precisam viver até o fim do processo,
+# pois buffers alocados por eles podem sobreviver à medição
+_POOLS = []
+
+
+def medir(funcao, *args, repeticoes=3):
+    """Melhor tempo e mediana de `repeticoes` execuções e pico de memória de uma execução extra."""
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+
+    # Memória medida à parte: o rastreamento do tracemalloc deixa a execução mais lenta
+    gc.collect()
+    pool_anterior = pa.default_memory_pool()
+    pool = pa.proxy_memory_pool(pool_anterior)
+    _POOLS.append(pool)
+    pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        funcao(*args)
+        _, pico_python = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(pool_anterior)
+    return {
+        'segundos': min(tempos),
+        'segundos_mediana': statistics.median(tempos),
+        'pico_python_mb': pico_python / 2**20,
+        'pico_arrow_mb': pool.max_memory() / 2**20,
+    }
+
+
+def carregar_dados(diretorio):
+    """O mesmo caminho do `carregar_dados` do dashboard, sem cache."""
+    return montar_frame(tipar_em_paralelo(DatasetRD(diretorio), [UF], [COMPETENCIA]))
+
+
+def casos(diretorio):
+    """(nome, função, argumentos) de cada medição, com os insumos já calculados."""
+    df = carregar_dados(diretorio)
+    lista = [('carregar_dados', carregar_dados, (diretorio,))]
+
+    for nome in sorted(dir(indicadores)):
+        if nome.startswith(('calcular_', 'contar_')):
+            lista.append((nome, getattr(indicadores, nome), (df,)))
+
+    capitulo = indicadores.contar_capitulos_cid10(df)['Capitulo_CID'].iloc[0]
+    lista.append(('detalhar_cid10', indicadores.detalhar_cid10, (df, capitulo)))
+
+    lista.append(('perfil_hospitais', hospitais.perfil_hospitais, (df,)))
+    perfil = hospitais.perfil_hospitais(df)
+    for nome in sorted(dir(hospitais)):
+        if nome.startswith('get_'):
+            lista.append((nome, getattr(hospitais, nome), (perfil,)))
+
+    codigos = df['MUNIC_MOV'].cat.categories.astype(str)
+    municipios = Dimensao(pa.table({'codigo': codigos, 'nome': 'Município ' + codigos}))
+    agregados = {
+        'municipios': graficos.rotular_municipios(indicadores.contar_municipios(df), municipios),
+        'sexo': indicadores.contar_sexo(df),
+        'faixa_etaria': indicadores.contar_faixa_etaria(df),
+        'raca': indicadores.contar_raca(df),
+        'tempo_medio_idade': indicadores.calcular_tempo_medio_idade(df),
+        'cid10': indicadores.contar_capitulos_cid10(df),
+        'cid10_detalhe': indicadores.detalhar_cid10(df, capitulo),
+    }
+    for nome, (plot, vega) in graficos.GRAFICOS.items():
+        lista.append((plot.__name__, lambda plot=plot, agregado=agregados[nome]: graficos.png(plot(agregado)), ()))
+        lista.append((vega.__name__, vega, (agregados[nome],)))
+    return lista
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'maquina': platform.node(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+    }
+
+
+def executar(escalas, saida, repeticoes=3, diretorio=None, filtro=None):
+    """Mede todas as funções em cada escala e acrescenta os resultados (JSON Lines) em `saida`."""
+    execucao = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    contexto = ambiente()
+    with tempfile.TemporaryDirectory() as temporario:
+        for escala in escalas:
+            pasta = os.path.join(diretorio or temporario, f'rd_{escala}')
+            caminho = os.path.join(pasta, nome_arquivo(COMPETENCIA, UF))
+            if not os.path.exists(caminho):
+                gerar_arquivo(caminho, escala, COMPETENCIA, UF)
+            for nome, funcao, args in casos(pasta):
+                if filtro and not any(parte in nome for parte in filtro):
+                    continue
+                resultado = {'execucao': execucao, 'escala': escala, 'funcao': nome}
+                resultado.update(medir(funcao, *args, repeticoes=repeticoes))
+                resultado['ambiente'] = contexto
+                with open(saida, 'a', encoding='utf-8') as arquivo:
+                    arquivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+                yield resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do carregamento e dos indicadores com dados RD sintéticos.")
+    parser.add_argument('--escalas', nargs='+', type=int, default=ESCALAS, help="internações por arquivo sintético")
+    parser.add_argument('--saida', default='benchmark.jsonl', help="arquivo JSON Lines de resultados (acrescentado)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="execuções cronometradas por função")
+    parser.add_argument('--dados', default=None, help="mantém os arquivos sintéticos neste diretório (reaproveitados)")
+    parser.add_argument('--funcoes', nargs='*', default=None, help="mede apenas funções cujo nome contém um destes trechos")
+    args = parser.parse_args(argv)
+
+    print(f"{'escala':>12} {'função':<36} {'segundos':>10} {'python MB':>10} {'arrow MB':>10}")
+    for r in executar(args.escalas, args.saida, args.repeticoes, args.dados, args.funcoes):
+        print(f"{r['escala']:>12,} {r['funcao']:<36} {r['segundos']:>10.4f} "
+              f"{r['pico_python_mb']:>10.1f} {r['pico_arrow_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
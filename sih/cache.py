@@ -0,0 +1,210 @@
+"""Cache em disco, compartilhado entre processos, das tabelas já limpas.
+
+Cada entrada é um arquivo Arrow IPC sem compressão, chaveado pela assinatura
+dos arquivos de origem (caminho, tamanho e data de modificação), pelos
+parâmetros da leitura e por VERSAO_PIPELINE. Ler uma entrada é mapear o
+arquivo em memória: a leitura e a limpeza (`tipar`) dos parquet não são
+refeitas. Na montagem do frame (`montar_frame`), as colunas float64 e de
+datas sem nulos são referenciadas direto das páginas mapeadas, que os
+processos do Streamlit no mesmo host compartilham pelo cache do sistema
+operacional; as categorias, os inteiros anuláveis (Int8/Int16) e as colunas
+derivadas são convertidos e copiados em cada processo.
+
+O diretório tem um limite de tamanho (`maximo_bytes`): ao gravar uma
+entrada, as menos usadas (pela data de modificação, renovada a cada acerto)
+são removidas até caber no limite. Versões antigas de uma entrada (origem
+alterada ou pipeline antigo) são removidas logo que a nova é gravada.
+
+`CacheResultados` é o cache em memória de resultados prontos (ex.: as
+respostas da API de `sih.api`), com validade (TTL) e descarte dos menos
+usados (LRU).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pyarrow as pa
+
+# Versão do pipeline de limpeza: incrementar ao mudar `tipar` ou as colunas lidas
+VERSAO_PIPELINE = 3
+
+EXTENSAO = '.arrow'
+
+# Tamanho máximo padrão do diretório do cache
+MAXIMO_BYTES = 8 * 2**30
+
+
+def assinatura_arquivos(caminhos):
+    """Caminho, tamanho e data de modificação de cada arquivo de origem, em ordem."""
+    arquivos = []
+    for caminho in sorted(caminhos):
+        estado = os.stat(caminho)
+        arquivos.append([caminho, estado.st_size, estado.st_mtime_ns])
+    return arquivos
+
+
+def _resumo(valor):
+    texto = json.dumps(valor, sort_keys=True, default=list)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def mapear(caminho):
+    """Tabela de um arquivo Arrow IPC mapeado em memória (sem cópia)."""
+    return pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+
+
+class CacheArrow:
+    """Diretório de tabelas Arrow limpas, chaveadas pela origem e pela versão do pipeline."""
+
+    def __init__(self, diretorio, maximo_bytes=MAXIMO_BYTES):
+        self.diretorio = diretorio
+        self.maximo_bytes = maximo_bytes
+
+    def caminho(self, nome, arquivos, **parametros):
+        """Arquivo da entrada `nome` para os parâmetros e o estado atual dos arquivos de origem."""
+        chave_parametros = _resumo(parametros)
+        chave_origem = _resumo({'versao': VERSAO_PIPELINE, 'arquivos': assinatura_arquivos(arquivos)})
+        return os.path.join(self.diretorio, f'{nome}-{chave_parametros}-{chave_origem}{EXTENSAO}')
+
+    def obter(self, nome, arquivos, gerar, **parametros):
+        """Tabela em cache para a entrada; se não existe (ou a origem mudou), chama `gerar()` e grava.
+
+        `gerar` deve devolver a tabela já limpa. O retorno é sempre a tabela
+        mapeada do disco, inclusive logo após gravá-la.
+        """
+        caminho = self.caminho(nome, arquivos, **parametros)
+        try:
+            # Acerto: a data de modificação marca o uso mais recente (ordem de descarte)
+            os.utime(caminho)
+        except FileNotFoundError:
+            self._gravar(caminho, gerar())
+            self._descartar_antigas(caminho)
+            self._limitar(caminho)
+        return mapear(caminho)
+
+    def _gravar(self, caminho, tabela):
+        os.makedirs(self.diretorio, exist_ok=True)
+        # Um único lote: colunas contíguas podem ir para o pandas sem cópia
+        tabela = tabela.unify_dictionaries().combine_chunks()
+        # Nome temporário por processo; a troca atômica resolve gravações concorrentes da mesma entrada
+        temporario = f'{caminho}.{uuid.uuid4().hex}.tmp'
+        try:
+            with pa.OSFile(temporario, 'wb') as arquivo:
+                with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+                    escritor.write_table(tabela, max_chunksize=max(tabela.num_rows, 1))
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def _descartar_antigas(self, caminho):
+        """Remove as versões anteriores da mesma entrada (origem alterada ou pipeline antigo)."""
+        prefixo = os.path.basename(caminho).rsplit('-', 1)[0] + '-'
+        for nome in os.listdir(self.diretorio):
+            antigo = os.path.join(self.diretorio, nome)
+            if nome.startswith(prefixo) and nome.endswith(EXTENSAO) and antigo != caminho:
+                # Processos que ainda mapeiam o arquivo antigo continuam lendo-o normalmente
+                try:
+                    os.remove(antigo)
+                except FileNotFoundError:
+                    pass  # já removido por outro processo
+
+    def _limitar(self, caminho):
+        """Remove as entradas usadas há mais tempo até o diretório caber em `maximo_bytes`.
+
+        A entrada recém-gravada nunca é removida, mesmo que sozinha passe do limite.
+        """
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            arquivo = os.path.join(self.diretorio, nome)
+            if not nome.endswith(EXTENSAO) or arquivo == caminho:
+                continue
+            try:
+                estado = os.stat(arquivo)
+            except FileNotFoundError:
+                continue
+            entradas.append((estado.st_mtime_ns, estado.st_size, arquivo))
+        total = os.path.getsize(caminho) + sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, arquivo in sorted(entradas):
+            if total <= self.maximo_bytes:
+                break
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+
+class CacheResultados:
+    """Resultados em memória, compartilhados entre threads, com validade e descarte LRU.
+
+    Guarda no máximo `maximo` entradas; ao passar disso, descarta a usada há
+    mais tempo. Entradas com mais de `ttl` segundos (None: sem validade) são
+    recalculadas. Pedidos simultâneos da mesma chave esperam um único cálculo.
+    """
+
+    def __init__(self, maximo=256, ttl=None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # chave -> (instante, valor), da menos para a mais usada
+        self._em_curso = {}             # chave -> Future do cálculo em andamento
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _valida(self, chave):
+        # Chamado com a trava adquirida
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entrada[0] > self.ttl:
+            del self._entradas[chave]
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada
+
+    def consultar(self, chave, padrao=None):
+        """Valor em cache para a chave, sem calcular; `padrao` se não há entrada válida."""
+        with self._trava:
+            entrada = self._valida(chave)
+        return padrao if entrada is None else entrada[1]
+
+    def obter(self, chave, calcular):
+        """Valor em cache para a chave; se não há entrada válida, chama `calcular()` e guarda."""
+        with self._trava:
+            entrada = self._valida(chave)
+            if entrada is not None:
+                return entrada[1]
+            futuro = self._em_curso.get(chave)
+            calcula_aqui = futuro is None
+            if calcula_aqui:
+                futuro = self._em_curso[chave] = Future()
+        if not calcula_aqui:
+            return futuro.result()
+
+        try:
+            valor = calcular()
+        except BaseException as erro:
+            with self._trava:
+                del self._em_curso[chave]
+            futuro.set_exception(erro)
+            raise
+        with self._trava:
+            self._entradas[chave] = (time.monotonic(), valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+            del self._em_curso[chave]
+        futuro.set_result(valor)
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
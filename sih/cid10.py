@@ -0,0 +1,429 @@
+"""Hierarquia da CID-10 (capítulo -> grupo -> categoria) em tabelas de consulta inteiras.
+
+Cada categoria de 3 caracteres (letra + 2 dígitos) tem um código inteiro fixo
+(`A00` = 0 ... `Z99` = 2599) e os vetores `CAPITULO_POR_CATEGORIA` e
+`GRUPO_POR_CATEGORIA` dão o capítulo e o grupo de cada uma. Os capítulos e
+grupos seguem as faixas oficiais, não só a primeira letra: `D00–D48` são
+neoplasias (cap. II) e `D50–D89` doenças do sangue (cap. III); `H00–H59` são
+doenças do olho (cap. VII) e `H60–H95` do ouvido (cap. VIII).
+
+`codificar` traduz cada código distinto de DIAG_PRINC uma só vez e distribui
+o resultado às linhas pelos índices do dicionário; as contagens por capítulo,
+grupo ou categoria são `np.bincount` sobre esses códigos.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# (primeira categoria, última categoria, descrição)
+CAPITULOS = [
+    ('A00', 'B99', 'I. Doenças infecciosas'),
+    ('C00', 'D48', 'II. Neoplasias (tumores)'),
+    ('D50', 'D89', 'III. Doenças sangue'),
+    ('E00', 'E90', 'IV. Doenças endócrinas'),
+    ('F00', 'F99', 'V. Transtornos mentais'),
+    ('G00', 'G99', 'VI. Doenças do sistema nervoso'),
+    ('H00', 'H59', 'VII. Doenças do olho e anexos'),
+    ('H60', 'H95', 'VIII. Doenças do ouvido'),
+    ('I00', 'I99', 'IX. Doenças do aparelho circulatório'),
+    ('J00', 'J99', 'X. Doenças do aparelho respiratório'),
+    ('K00', 'K93', 'XI. Doenças do aparelho digestivo'),
+    ('L00', 'L99', 'XII. Doenças da pele'),
+    ('M00', 'M99', 'XIII. Doenças osteomusculares'),
+    ('N00', 'N99', 'XIV. Doenças do aparelho geniturinário'),
+    ('O00', 'O99', 'XV. Gravidez parto e puerpério'),
+    ('P00', 'P96', 'XVI. Afecções perinatais'),
+    ('Q00', 'Q99', 'XVII. Malformações congênitas'),
+    ('R00', 'R99', 'XVIII. Sintomas sinais anormais'),
+    ('S00', 'T98', 'XIX. Lesões envenenamentos'),
+    ('V01', 'Y98', 'XX. Causas externas'),
+    ('Z00', 'Z99', 'XXI. Contatos com serviços de saúde'),
+    ('U00', 'U99', 'XXII. Códigos especiais'),
+]
+
+# Grupos (agrupamentos de categorias) de cada capítulo
+GRUPOS = [
+    # I
+    ('A00', 'A09', 'Doenças infecciosas intestinais'),
+    ('A15', 'A19', 'Tuberculose'),
+    ('A20', 'A28', 'Algumas doenças bacterianas zoonóticas'),
+    ('A30', 'A49', 'Outras doenças bacterianas'),
+    ('A50', 'A64', 'Infecções de transmissão predominantemente sexual'),
+    ('A65', 'A69', 'Outras doenças por espiroquetas'),
+    ('A70', 'A74', 'Outras doenças causadas por clamídias'),
+    ('A75', 'A79', 'Rickettsioses'),
+    ('A80', 'A89', 'Infecções virais do sistema nervoso central'),
+    ('A90', 'A99', 'Febres por arbovírus e febres hemorrágicas virais'),
+    ('B00', 'B09', 'Infecções virais com lesões de pele e mucosas'),
+    ('B15', 'B19', 'Hepatite viral'),
+    ('B20', 'B24', 'Doença pelo vírus da imunodeficiência humana [HIV]'),
+    ('B25', 'B34', 'Outras doenças por vírus'),
+    ('B35', 'B49', 'Micoses'),
+    ('B50', 'B64', 'Doenças devidas a protozoários'),
+    ('B65', 'B83', 'Helmintíases'),
+    ('B85', 'B89', 'Pediculose, acaríase e outras infestações'),
+    ('B90', 'B94', 'Sequelas de doenças infecciosas e parasitárias'),
+    ('B95', 'B98', 'Agentes de infecções bacterianas, virais e outros'),
+    ('B99', 'B99', 'Outras doenças infecciosas'),
+    # II
+    ('C00', 'C14', 'Neoplasias malignas do lábio, cavidade oral e faringe'),
+    ('C15', 'C26', 'Neoplasias malignas dos órgãos digestivos'),
+    ('C30', 'C39', 'Neoplasias malignas do aparelho respiratório e órgãos intratorácicos'),
+    ('C40', 'C41', 'Neoplasias malignas dos ossos e cartilagens articulares'),
+    ('C43', 'C44', 'Melanoma e outras neoplasias malignas da pele'),
+    ('C45', 'C49', 'Neoplasias malignas do tecido mesotelial e tecidos moles'),
+    ('C50', 'C50', 'Neoplasia maligna da mama'),
+    ('C51', 'C58', 'Neoplasias malignas dos órgãos genitais femininos'),
+    ('C60', 'C63', 'Neoplasias malignas dos órgãos genitais masculinos'),
+    ('C64', 'C68', 'Neoplasias malignas do trato urinário'),
+    ('C69', 'C72', 'Neoplasias malignas dos olhos, encéfalo e sistema nervoso central'),
+    ('C73', 'C75', 'Neoplasias malignas da tireoide e outras glândulas endócrinas'),
+    ('C76', 'C80', 'Neoplasias malignas de localizações mal definidas e secundárias'),
+    ('C81', 'C96', 'Neoplasias malignas do tecido linfático e hematopoético'),
+    ('C97', 'C97', 'Neoplasias malignas de localizações múltiplas independentes'),
+    ('D00', 'D09', 'Neoplasias in situ'),
+    ('D10', 'D36', 'Neoplasias benignas'),
+    ('D37', 'D48', 'Neoplasias de comportamento incerto ou desconhecido'),
+    # III
+    ('D50', 'D53', 'Anemias nutricionais'),
+    ('D55', 'D59', 'Anemias hemolíticas'),
+    ('D60', 'D64', 'Anemias aplásticas e outras anemias'),
+    ('D65', 'D69', 'Defeitos da coagulação, púrpura e outras afecções hemorrágicas'),
+    ('D70', 'D77', 'Outras doenças do sangue e dos órgãos hematopoéticos'),
+    ('D80', 'D89', 'Transtornos do mecanismo imunitário'),
+    # IV
+    ('E00', 'E07', 'Transtornos da glândula tireoide'),
+    ('E10', 'E14', 'Diabetes mellitus'),
+    ('E15', 'E16', 'Outros transtornos da regulação da glicose e da secreção pancreática'),
+    ('E20', 'E35', 'Transtornos de outras glândulas endócrinas'),
+    ('E40', 'E46', 'Desnutrição'),
+    ('E50', 'E64', 'Outras deficiências nutricionais'),
+    ('E65', 'E68', 'Obesidade e outras formas de hiperalimentação'),
+    ('E70', 'E90', 'Distúrbios metabólicos'),
+    # V
+    ('F00', 'F09', 'Transtornos mentais orgânicos'),
+    ('F10', 'F19', 'Transtornos devidos ao uso de substância psicoativa'),
+    ('F20', 'F29', 'Esquizofrenia e transtornos esquizotípicos e delirantes'),
+    ('F30', 'F39', 'Transtornos do humor [afetivos]'),
+    ('F40', 'F48', 'Transtornos neuróticos, relacionados com o estresse e somatoformes'),
+    ('F50', 'F59', 'Síndromes comportamentais associadas a disfunções fisiológicas'),
+    ('F60', 'F69', 'Transtornos da personalidade e do comportamento do adulto'),
+    ('F70', 'F79', 'Retardo mental'),
+    ('F80', 'F89', 'Transtornos do desenvolvimento psicológico'),
+    ('F90', 'F98', 'Transtornos do comportamento e emocionais da infância e adolescência'),
+    ('F99', 'F99', 'Transtorno mental não especificado'),
+    # VI
+    ('G00', 'G09', 'Doenças inflamatórias do sistema nervoso central'),
+    ('G10', 'G14', 'Atrofias sistêmicas do sistema nervoso central'),
+    ('G20', 'G26', 'Doenças extrapiramidais e transtornos dos movimentos'),
+    ('G30', 'G32', 'Outras doenças degenerativas do sistema nervoso'),
+    ('G35', 'G37', 'Doenças desmielinizantes do sistema nervoso central'),
+    ('G40', 'G47', 'Transtornos episódicos e paroxísticos'),
+    ('G50', 'G59', 'Transtornos dos nervos, das raízes e dos plexos nervosos'),
+    ('G60', 'G64', 'Polineuropatias e outros transtornos do sistema nervoso periférico'),
+    ('G70', 'G73', 'Doenças da junção mioneural e dos músculos'),
+    ('G80', 'G83', 'Paralisia cerebral e outras síndromes paralíticas'),
+    ('G90', 'G99', 'Outros transtornos do sistema nervoso'),
+    # VII
+    ('H00', 'H06', 'Transtornos da pálpebra, do aparelho lacrimal e da órbita'),
+    ('H10', 'H13', 'Transtornos da conjuntiva'),
+    ('H15', 'H22', 'Transtornos da esclera, córnea, íris e corpo ciliar'),
+    ('H25', 'H28', 'Transtornos do cristalino'),
+    ('H30', 'H36', 'Transtornos da coroide e da retina'),
+    ('H40', 'H42', 'Glaucoma'),
+    ('H43', 'H45', 'Transtornos do humor vítreo e do globo ocular'),
+    ('H46', 'H48', 'Transtornos do nervo óptico e das vias ópticas'),
+    ('H49', 'H52', 'Transtornos dos músculos oculares, da acomodação e da refração'),
+    ('H53', 'H54', 'Distúrbios visuais e cegueira'),
+    ('H55', 'H59', 'Outros transtornos do olho e anexos'),
+    # VIII
+    ('H60', 'H62', 'Doenças do ouvido externo'),
+    ('H65', 'H75', 'Doenças do ouvido médio e da mastoide'),
+    ('H80', 'H83', 'Doenças do ouvido interno'),
+    ('H90', 'H95', 'Outros transtornos do ouvido'),
+    # IX
+    ('I00', 'I02', 'Febre reumática aguda'),
+    ('I05', 'I09', 'Doenças reumáticas crônicas do coração'),
+    ('I10', 'I15', 'Doenças hipertensivas'),
+    ('I20', 'I25', 'Doenças isquêmicas do coração'),
+    ('I26', 'I28', 'Doença cardíaca pulmonar e da circulação pulmonar'),
+    ('I30', 'I52', 'Outras formas de doença do coração'),
+    ('I60', 'I69', 'Doenças cerebrovasculares'),
+    ('I70', 'I79', 'Doenças das artérias, arteríolas e capilares'),
+    ('I80', 'I89', 'Doenças das veias, dos vasos e dos gânglios linfáticos'),
+    ('I95', 'I99', 'Outros transtornos do aparelho circulatório'),
+    # X
+    ('J00', 'J06', 'Infecções agudas das vias aéreas superiores'),
+    ('J09', 'J18', 'Influenza [gripe] e pneumonia'),
+    ('J20', 'J22', 'Outras infecções agudas das vias aéreas inferiores'),
+    ('J30', 'J39', 'Outras doenças das vias aéreas superiores'),
+    ('J40', 'J47', 'Doenças crônicas das vias aéreas inferiores'),
+    ('J60', 'J70', 'Doenças pulmonares devidas a agentes externos'),
+    ('J80', 'J84', 'Outras doenças respiratórias do interstício'),
+    ('J85', 'J86', 'Afecções necróticas e supurativas das vias aéreas inferiores'),
+    ('J90', 'J94', 'Outras doenças da pleura'),
+    ('J95', 'J99', 'Outras doenças do aparelho respiratório'),
+    # XI
+    ('K00', 'K14', 'Doenças da cavidade oral, glândulas salivares e maxilares'),
+    ('K20', 'K31', 'Doenças do esôfago, do estômago e do duodeno'),
+    ('K35', 'K38', 'Doenças do apêndice'),
+    ('K40', 'K46', 'Hérnias'),
+    ('K50', 'K52', 'Enterites e colites não infecciosas'),
+    ('K55', 'K64', 'Outras doenças dos intestinos'),
+    ('K65', 'K67', 'Doenças do peritônio'),
+    ('K70', 'K77', 'Doenças do fígado'),
+    ('K80', 'K87', 'Transtornos da vesícula biliar, vias biliares e pâncreas'),
+    ('K90', 'K93', 'Outras doenças do aparelho digestivo'),
+    # XII
+    ('L00', 'L08', 'Infecções da pele e do tecido subcutâneo'),
+    ('L10', 'L14', 'Afecções bolhosas'),
+    ('L20', 'L30', 'Dermatite e eczema'),
+    ('L40', 'L45', 'Afecções pápulo-descamativas'),
+    ('L50', 'L54', 'Urticária e eritema'),
+    ('L55', 'L59', 'Afecções da pele relacionadas com a radiação'),
+    ('L60', 'L75', 'Afecções dos anexos da pele'),
+    ('L80', 'L99', 'Outras afecções da pele e do tecido subcutâneo'),
+    # XIII
+    ('M00', 'M03', 'Artropatias infecciosas'),
+    ('M05', 'M14', 'Poliartropatias inflamatórias'),
+    ('M15', 'M19', 'Artroses'),
+    ('M20', 'M25', 'Outros transtornos articulares'),
+    ('M30', 'M36', 'Doenças sistêmicas do tecido conjuntivo'),
+    ('M40', 'M43', 'Dorsopatias deformantes'),
+    ('M45', 'M49', 'Espondilopatias'),
+    ('M50', 'M54', 'Outras dorsopatias'),
+    ('M60', 'M63', 'Transtornos musculares'),
+    ('M65', 'M68', 'Transtornos das sinóvias e dos tendões'),
+    ('M70', 'M79', 'Outros transtornos dos tecidos moles'),
+    ('M80', 'M85', 'Transtornos da densidade e da estrutura ósseas'),
+    ('M86', 'M90', 'Outras osteopatias'),
+    ('M91', 'M94', 'Condropatias'),
+    ('M95', 'M99', 'Outros transtornos do sistema osteomuscular e do tecido conjuntivo'),
+    # XIV
+    ('N00', 'N08', 'Doenças glomerulares'),
+    ('N10', 'N16', 'Doenças renais túbulo-intersticiais'),
+    ('N17', 'N19', 'Insuficiência renal'),
+    ('N20', 'N23', 'Litíase urinária'),
+    ('N25', 'N29', 'Outros transtornos do rim e do ureter'),
+    ('N30', 'N39', 'Outras doenças do aparelho urinário'),
+    ('N40', 'N51', 'Doenças dos órgãos genitais masculinos'),
+    ('N60', 'N64', 'Doenças da mama'),
+    ('N70', 'N77', 'Doenças inflamatórias dos órgãos pélvicos femininos'),
+    ('N80', 'N98', 'Transtornos não inflamatórios do trato genital feminino'),
+    ('N99', 'N99', 'Outros transtornos do aparelho geniturinário'),
+    # XV
+    ('O00', 'O08', 'Gravidez que termina em aborto'),
+    ('O10', 'O16', 'Edema, proteinúria e transtornos hipertensivos na gravidez'),
+    ('O20', 'O29', 'Outros transtornos maternos relacionados com a gravidez'),
+    ('O30', 'O48', 'Assistência à mãe por motivos ligados ao feto e ao parto'),
+    ('O60', 'O75', 'Complicações do trabalho de parto e do parto'),
+    ('O80', 'O84', 'Parto'),
+    ('O85', 'O92', 'Complicações relacionadas com o puerpério'),
+    ('O94', 'O99', 'Outras afecções obstétricas'),
+    # XVI
+    ('P00', 'P04', 'Feto e recém-nascido afetados por fatores maternos e do parto'),
+    ('P05', 'P08', 'Transtornos da duração da gestação e do crescimento fetal'),
+    ('P10', 'P15', 'Traumatismo de parto'),
+    ('P20', 'P29', 'Transtornos respiratórios e cardiovasculares do período perinatal'),
+    ('P35', 'P39', 'Infecções específicas do período perinatal'),
+    ('P50', 'P61', 'Transtornos hemorrágicos e hematológicos do feto e do recém-nascido'),
+    ('P70', 'P74', 'Transtornos endócrinos e metabólicos transitórios do recém-nascido'),
+    ('P75', 'P78', 'Transtornos do aparelho digestivo do feto ou do recém-nascido'),
+    ('P80', 'P83', 'Afecções do tegumento e da regulação térmica do recém-nascido'),
+    ('P90', 'P96', 'Outros transtornos originados no período perinatal'),
+    # XVII
+    ('Q00', 'Q07', 'Malformações congênitas do sistema nervoso'),
+    ('Q10', 'Q18', 'Malformações congênitas do olho, ouvido, face e pescoço'),
+    ('Q20', 'Q28', 'Malformações congênitas do aparelho circulatório'),
+    ('Q30', 'Q34', 'Malformações congênitas do aparelho respiratório'),
+    ('Q35', 'Q37', 'Fenda labial e fenda palatina'),
+    ('Q38', 'Q45', 'Outras malformações congênitas do aparelho digestivo'),
+    ('Q50', 'Q56', 'Malformações congênitas dos órgãos genitais'),
+    ('Q60', 'Q64', 'Malformações congênitas do aparelho urinário'),
+    ('Q65', 'Q79', 'Malformações e deformidades congênitas do sistema osteomuscular'),
+    ('Q80', 'Q89', 'Outras malformações congênitas'),
+    ('Q90', 'Q99', 'Anomalias cromossômicas'),
+    # XVIII
+    ('R00', 'R09', 'Sintomas e sinais do aparelho circulatório e respiratório'),
+    ('R10', 'R19', 'Sintomas e sinais do aparelho digestivo e do abdome'),
+    ('R20', 'R23', 'Sintomas e sinais da pele e do tecido subcutâneo'),
+    ('R25', 'R29', 'Sintomas e sinais dos sistemas nervoso e osteomuscular'),
+    ('R30', 'R39', 'Sintomas e sinais do aparelho urinário'),
+    ('R40', 'R46', 'Sintomas e sinais da cognição, percepção, emoção e comportamento'),
+    ('R47', 'R49', 'Sintomas e sinais da fala e da voz'),
+    ('R50', 'R69', 'Sintomas e sinais gerais'),
+    ('R70', 'R79', 'Achados anormais de exames de sangue'),
+    ('R80', 'R82', 'Achados anormais de exames de urina'),
+    ('R83', 'R89', 'Achados anormais de exames de outros líquidos e tecidos'),
+    ('R90', 'R94', 'Achados anormais de exames de imagem e de função'),
+    ('R95', 'R99', 'Causas mal definidas e desconhecidas de mortalidade'),
+    # XIX
+    ('S00', 'S09', 'Traumatismos da cabeça'),
+    ('S10', 'S19', 'Traumatismos do pescoço'),
+    ('S20', 'S29', 'Traumatismos do tórax'),
+    ('S30', 'S39', 'Traumatismos do abdome, dorso, coluna lombar e pelve'),
+    ('S40', 'S49', 'Traumatismos do ombro e do braço'),
+    ('S50', 'S59', 'Traumatismos do cotovelo e do antebraço'),
+    ('S60', 'S69', 'Traumatismos do punho e da mão'),
+    ('S70', 'S79', 'Traumatismos do quadril e da coxa'),
+    ('S80', 'S89', 'Traumatismos do joelho e da perna'),
+    ('S90', 'S99', 'Traumatismos do tornozelo e do pé'),
+    ('T00', 'T07', 'Traumatismos de múltiplas regiões do corpo'),
+    ('T08', 'T14', 'Traumatismos de localização não especificada'),
+    ('T15', 'T19', 'Efeitos da penetração de corpo estranho por orifício natural'),
+    ('T20', 'T32', 'Queimaduras e corrosões'),
+    ('T33', 'T35', 'Geladuras'),
+    ('T36', 'T50', 'Intoxicação por drogas, medicamentos e substâncias biológicas'),
+    ('T51', 'T65', 'Efeitos tóxicos de substâncias não medicinais'),
+    ('T66', 'T78', 'Outros efeitos de causas externas'),
+    ('T79', 'T79', 'Complicações precoces dos traumatismos'),
+    ('T80', 'T88', 'Complicações de cuidados médicos e cirúrgicos'),
+    ('T90', 'T98', 'Sequelas de traumatismos, intoxicações e causas externas'),
+    # XX
+    ('V01', 'V99', 'Acidentes de transporte'),
+    ('W00', 'W19', 'Quedas'),
+    ('W20', 'W49', 'Exposição a forças mecânicas inanimadas'),
+    ('W50', 'W64', 'Exposição a forças mecânicas animadas'),
+    ('W65', 'W74', 'Afogamento e submersão acidentais'),
+    ('W75', 'W84', 'Outros riscos acidentais à respiração'),
+    ('W85', 'W99', 'Exposição à corrente elétrica, radiação e temperaturas extremas'),
+    ('X00', 'X09', 'Exposição à fumaça, ao fogo e às chamas'),
+    ('X10', 'X19', 'Contato com fonte de calor ou substâncias quentes'),
+    ('X20', 'X29', 'Contato com animais e plantas venenosos'),
+    ('X30', 'X39', 'Exposição às forças da natureza'),
+    ('X40', 'X49', 'Envenenamento acidental por substâncias nocivas'),
+    ('X50', 'X57', 'Excesso de esforços, viagens e privações'),
+    ('X58', 'X59', 'Exposição acidental a outros fatores'),
+    ('X60', 'X84', 'Lesões autoprovocadas intencionalmente'),
+    ('X85', 'Y09', 'Agressões'),
+    ('Y10', 'Y34', 'Eventos cuja intenção é indeterminada'),
+    ('Y35', 'Y36', 'Intervenções legais e operações de guerra'),
+    ('Y40', 'Y84', 'Complicações de assistência médica e cirúrgica'),
+    ('Y85', 'Y89', 'Sequelas de causas externas'),
+    ('Y90', 'Y98', 'Fatores suplementares relacionados às causas de morbidade'),
+    # XXI
+    ('Z00', 'Z13', 'Exame e investigação'),
+    ('Z20', 'Z29', 'Riscos potenciais relacionados com doenças transmissíveis'),
+    ('Z30', 'Z39', 'Circunstâncias relacionadas com a reprodução'),
+    ('Z40', 'Z54', 'Procedimentos específicos e cuidados de saúde'),
+    ('Z55', 'Z65', 'Riscos relacionados com circunstâncias socioeconômicas e psicossociais'),
+    ('Z70', 'Z76', 'Contato com os serviços de saúde em outras circunstâncias'),
+    ('Z80', 'Z99', 'Riscos relacionados com a história familiar e pessoal'),
+    # XXII
+    ('U00', 'U49', 'Atribuição provisória de novas doenças de etiologia incerta'),
+    ('U80', 'U89', 'Agentes bacterianos resistentes a antibióticos'),
+    ('U99', 'U99', 'CID 10ª Revisão não disponível'),
+]
+
+NAO_MAPEADO = 'Não Mapeado'
+
+# Códigos A00 ... Z99, na ordem dos códigos inteiros
+CATEGORIAS = [f'{chr(ord("A") + letra)}{numero:02d}' for letra in range(26) for numero in range(100)]
+
+ROTULOS_CAPITULOS = [descricao for _, _, descricao in CAPITULOS] + [NAO_MAPEADO]
+ROTULOS_GRUPOS = [f'{inicio}–{fim} {descricao}' if inicio != fim else f'{inicio} {descricao}'
+                  for inicio, fim, descricao in GRUPOS]
+
+
+def codigo_categoria(categoria):
+    """Código inteiro de uma categoria de 3 caracteres ('A00' -> 0, 'Z99' -> 2599)."""
+    return (ord(categoria[0]) - ord('A')) * 100 + int(categoria[1:3])
+
+
+def _faixas(tabela, tipo):
+    vetor = np.full(len(CATEGORIAS), -1, dtype=tipo)
+    for indice, (inicio, fim, _) in enumerate(tabela):
+        vetor[codigo_categoria(inicio):codigo_categoria(fim) + 1] = indice
+    return vetor
+
+
+# Capítulo e grupo de cada categoria (-1: fora das faixas da CID-10). Categorias
+# entre grupos (ex.: O50–O59) não existem: ficam sem capítulo, e a soma dos
+# grupos de um capítulo é sempre o total do capítulo
+GRUPO_POR_CATEGORIA = _faixas(GRUPOS, 'int16')
+CAPITULO_POR_CATEGORIA = np.where(GRUPO_POR_CATEGORIA >= 0, _faixas(CAPITULOS, 'int8'), -1).astype('int8')
+# O capítulo de cada grupo vem da sua primeira categoria
+CAPITULO_POR_GRUPO = CAPITULO_POR_CATEGORIA[[codigo_categoria(inicio) for inicio, _, _ in GRUPOS]]
+
+
+def categorias_de_codigos(codigos):
+    """Código inteiro da categoria de cada diagnóstico (texto Arrow); -1 para códigos fora do padrão."""
+    texto = pc.fill_null(pc.utf8_upper(pc.utf8_slice_codeunits(codigos, 0, 3)), '')
+    # Pontos de código dos 3 primeiros caracteres (0 depois do fim de códigos curtos)
+    pontos = texto.to_numpy(zero_copy_only=False).astype('U3').view('int32').reshape(-1, 3)
+    letra, dezena, unidade = pontos[:, 0] - ord('A'), pontos[:, 1] - ord('0'), pontos[:, 2] - ord('0')
+    validos = (letra >= 0) & (letra < 26) & (dezena >= 0) & (dezena <= 9) & (unidade >= 0) & (unidade <= 9)
+    return np.where(validos, letra * 100 + dezena * 10 + unidade, -1).astype('int16')
+
+
+def _dicionario(indices, rotulos):
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indices, mask=indices < 0), pa.array(rotulos, pa.string())
+    )
+
+
+def codificar(diag_princ):
+    """Colunas (capitulo_cid, grupo_cid, categoria_cid) de uma coluna DIAG_PRINC já codificada em dicionário.
+
+    A categoria é calculada uma vez por código distinto do dicionário; as
+    linhas recebem capítulo, grupo e categoria por `take` nos vetores de
+    consulta. As três colunas são dicionários com todas as descrições (as
+    categorias do pandas são fixas e na ordem da CID-10). Diagnósticos vazios
+    ficam nulos em todas; códigos fora dos grupos da CID-10 têm capítulo
+    'Não Mapeado' e grupo/categoria nulos.
+    """
+    capitulos, grupos, categorias = [], [], []
+    for bloco in diag_princ.chunks:
+        # Uma vez por código distinto; a última posição (-1) serve aos diagnósticos nulos
+        categoria = categorias_de_codigos(bloco.dictionary)
+        valida = categoria >= 0
+        capitulo = np.where(valida, CAPITULO_POR_CATEGORIA[categoria], -1)
+        grupo = np.where(valida, GRUPO_POR_CATEGORIA[categoria], -1)
+        categoria = np.where(capitulo >= 0, categoria, -1)
+        preenchido = pc.greater(pc.utf8_length(bloco.dictionary), 0).to_numpy(zero_copy_only=False)
+        capitulo = np.where(preenchido & (capitulo < 0), len(CAPITULOS), capitulo)
+
+        indices = pc.fill_null(bloco.indices, len(bloco.dictionary)).to_numpy(zero_copy_only=False)
+        capitulos.append(_dicionario(np.append(capitulo, -1).astype('int8')[indices], ROTULOS_CAPITULOS))
+        grupos.append(_dicionario(np.append(grupo, -1).astype('int16')[indices], ROTULOS_GRUPOS))
+        categorias.append(_dicionario(np.append(categoria, -1).astype('int16')[indices], CATEGORIAS))
+    tipos = [pa.dictionary(pa.int8(), pa.string()), pa.dictionary(pa.int16(), pa.string()),
+             pa.dictionary(pa.int16(), pa.string())]
+    return tuple(pa.chunked_array(partes, tipo) for partes, tipo in zip((capitulos, grupos, categorias), tipos))
+
+
+# --- Detalhamento ---
+
+def contagens_categorias(categoria_cid, pesos=None):
+    """Internações (ou soma de `pesos`) por código inteiro de categoria, em um vetor de 2600 posições."""
+    codigos = np.asarray(categoria_cid.cat.codes)
+    validos = codigos >= 0
+    pesos = None if pesos is None else np.asarray(pesos)[validos]
+    return np.bincount(codigos[validos], weights=pesos, minlength=len(CATEGORIAS)).astype('int64')
+
+
+def _tabela(rotulos, contagens, coluna):
+    tabela = pd.DataFrame({coluna: rotulos, 'Frequencia': contagens})
+    tabela = tabela[tabela['Frequencia'] > 0].sort_values('Frequencia', ascending=False, kind='stable')
+    tabela['Percentual'] = tabela['Frequencia'] / tabela['Frequencia'].sum() * 100
+    return tabela.reset_index(drop=True)
+
+
+def detalhar(contagens, capitulo, grupo=None):
+    """Distribuição dos grupos de um capítulo ou, com `grupo`, das categorias do grupo.
+
+    `contagens` vem de `contagens_categorias` (ou de um cubo por categoria).
+    Colunas: Grupo_CID ou Categoria_CID, Frequencia e Percentual (sobre o
+    total do capítulo ou do grupo).
+    """
+    contagens = np.asarray(contagens, dtype='int64')
+    if grupo is None:
+        com_grupo = GRUPO_POR_CATEGORIA >= 0
+        por_grupo = np.bincount(GRUPO_POR_CATEGORIA[com_grupo], weights=contagens[com_grupo],
+                                minlength=len(GRUPOS)).astype('int64')
+        grupos = np.flatnonzero(CAPITULO_POR_GRUPO == ROTULOS_CAPITULOS.index(capitulo))
+        return _tabela([ROTULOS_GRUPOS[g] for g in grupos], por_grupo[grupos], 'Grupo_CID')
+    categorias = np.flatnonzero(GRUPO_POR_CATEGORIA == ROTULOS_GRUPOS.index(grupo))
+    return _tabela([CATEGORIAS[c] for c in categorias], contagens[categorias], 'Categoria_CID')
+
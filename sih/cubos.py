@@ -0,0 +1,360 @@
+"""Cubos de agregados pré-calculados para os indicadores do dashboard.
+
+O passo offline (`python -m sih.cubos`) agrega cada partição RD (UF x
+competência) em três cubos pequenos, gravados em parquet:
+
+* `hospital`: internações por CNES e município do estabelecimento;
+* `perfil`: internações por faixa etária, sexo, raça/cor, capítulo CID-10
+  e especialidade do leito;
+* `cid`: internações por categoria CID-10 de 3 caracteres (o detalhamento
+  por grupo e categoria de `sih.cid10`).
+
+Junto deles são gravados os esboços de `sih.esbocos` (rankings e contagens
+distintas por dia de internação) e as séries diárias de `sih.series`.
+
+As medidas são somas e contagens (nunca médias), então cubos de várias
+competências ou UFs se combinam somando linhas. A construção é incremental:
+um manifesto guarda tamanho e data de modificação dos arquivos de origem, e
+só as partições novas ou alteradas são reagregadas.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from sih.cid10 import CATEGORIAS, codigo_categoria, detalhar
+from sih.dataset import DatasetRD, UFS, SIGLA_POR_CODIGO, ler_particoes
+from sih.esbocos import esbocar, gravar as gravar_esbocos
+from sih.hospitais import MEDIDAS_HOSPITAL, completar_perfil, maiores
+from sih.preprocessamento import (
+    FAIXAS_ETARIAS, MAP_OBITO, MAP_RACA_COR, MAP_SEXO, centavos, preprocessar
+)
+from sih.series import gravar as gravar_series, serializar
+
+# Versão do formato dos cubos: incrementar ao mudar medidas, dimensões ou pré-processamento
+VERSAO_CUBOS = 7
+
+# Dimensões de cada cubo (além de uf, ano e mes)
+DIMENSOES = {
+    'hospital': ['CNES', 'MUNIC_MOV'],
+    'perfil': ['faixa_etaria', 'SEXO', 'RACA_COR', 'capitulo_cid', 'ESPEC'],
+    'cid': ['categoria_cid'],
+}
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+
+def _sim(condicao):
+    """Condição como array booleano, com NA (inteiros anuláveis) tratado como falso."""
+    return condicao.to_numpy(dtype=bool, na_value=False)
+
+
+def _medidas(df):
+    """Medidas aditivas por linha; contagens `n_*` permitem recompor médias sem NaN.
+
+    Valores em R$ são somados em centavos inteiros, para que qualquer soma de
+    cubos reproduza exatamente os totais e médias calculados sobre os registros.
+    """
+    obito = _sim(df['MORTE'] == 1)
+    sem_obito = _sim(df['MORTE'] == 0)
+    val_tot = centavos(df['VAL_TOT'])
+    tem_val_tot = val_tot.notna().to_numpy()
+    return pd.DataFrame({
+        'internacoes': 1,
+        'obitos': obito,
+        'sem_obito': sem_obito,
+        'n_morte': df['MORTE'].notna(),
+        'val_tot': val_tot,
+        'n_val_tot': tem_val_tot,
+        'val_tot_obito': val_tot.where(obito),
+        'n_val_tot_obito': tem_val_tot & obito,
+        'val_tot_sem_obito': val_tot.where(sem_obito),
+        'n_val_tot_sem_obito': tem_val_tot & sem_obito,
+        'dias_perm': df['DIAS_PERM'],
+        'n_dias_perm': df['DIAS_PERM'].notna(),
+        'uti': _sim(df['MARCA_UTI'] > 0),
+        'n_marca_uti': df['MARCA_UTI'].notna(),
+        'val_uti': centavos(pd.to_numeric(df['VAL_UTI'], errors='coerce')),
+        'gestrisco': _sim(df['GESTRISCO'] == 1),
+    }, index=df.index)
+
+
+def agregar(df):
+    """Agrega um frame pré-processado (com colunas `ano`/`mes`) em {nome: cubo}."""
+    base = _medidas(df)
+    medidas = list(base.columns)
+    base['uf'] = df['UF_ZI'].str[:2].map(SIGLA_POR_CODIGO)
+    base['ano'] = df['ano']
+    base['mes'] = df['mes']
+    base['CNES'] = df['CNES']
+    base['MUNIC_MOV'] = df['MUNIC_MOV']
+    base['faixa_etaria'] = df['faixa_etaria']
+    base['SEXO'] = df['SEXO']
+    base['RACA_COR'] = df['RACA_COR']
+    base['capitulo_cid'] = df['capitulo_cid']
+    base['categoria_cid'] = df['categoria_cid']
+    base['ESPEC'] = df['ESPEC']
+
+    cubos = {}
+    for nome, dimensoes in DIMENSOES.items():
+        chaves = ['uf', 'ano', 'mes'] + dimensoes
+        cubos[nome] = (
+            base.groupby(chaves, dropna=False, observed=True, sort=False)[medidas]
+            .sum()
+            .reset_index()
+        )
+    return cubos
+
+
+# --- Construção incremental ---
+
+def _unidades(dataset):
+    """Agrupa as partições do dataset em unidades de construção (uf, competência).
+
+    Arquivos nacionais formam a unidade (None, competência) e, ao serem gravados,
+    não sobrescrevem UFs que têm arquivo próprio na mesma competência.
+    """
+    unidades = {}
+    for particao in dataset.particoes:
+        unidades.setdefault((particao.uf, particao.competencia), []).append(particao)
+    # Nacionais primeiro, para que os arquivos por UF prevaleçam na mesma execução
+    return sorted(unidades.items(), key=lambda item: (item[0][0] is not None, item[0][1]))
+
+
+def _assinatura(particoes):
+    arquivos = []
+    for particao in sorted(particoes, key=lambda p: p.caminho):
+        estado = os.stat(particao.caminho)
+        arquivos.append([particao.caminho, estado.st_size, estado.st_mtime_ns])
+    return {'versao': VERSAO_CUBOS, 'arquivos': arquivos}
+
+
+def construir(diretorio_dados, diretorio_cubos, forcar=False):
+    """Agrega as partições novas ou alteradas e grava os cubos por UF e competência.
+
+    Retorna a lista de unidades (uf, competência) reagregadas.
+    """
+    dataset = DatasetRD(diretorio_dados)
+    caminho_manifesto = os.path.join(diretorio_cubos, ARQUIVO_MANIFESTO)
+    manifesto = {}
+    if os.path.exists(caminho_manifesto) and not forcar:
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+
+    com_arquivo_proprio = {(p.uf, p.competencia) for p in dataset.particoes if p.uf is not None}
+    construidas = []
+    for (uf, competencia), particoes in _unidades(dataset):
+        chave = f"{uf or 'BR'}/{competencia}"
+        assinatura = _assinatura(particoes)
+        if manifesto.get(chave) == assinatura:
+            continue
+
+        ufs = [uf] if uf is not None else list(UFS)
+        df = preprocessar(ler_particoes(particoes, ufs))
+        for nome, cubo in agregar(df).items():
+            for (uf_cubo, ano, mes), parte in cubo.groupby(['uf', 'ano', 'mes'], observed=True):
+                competencia_cubo = int(ano) * 100 + int(mes)
+                if uf is None and (uf_cubo, competencia_cubo) in com_arquivo_proprio:
+                    continue
+                destino = os.path.join(diretorio_cubos, nome, uf_cubo, f'{competencia_cubo}.parquet')
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                parte.to_parquet(destino, index=False)
+
+        # Esboços por dia de internação (sih.esbocos); a unidade tem uma só competência
+        esbocos = esbocar(df)
+        for uf_esboco in pc.unique(esbocos['uf']).to_pylist():
+            if uf is None and (uf_esboco, competencia) in com_arquivo_proprio:
+                continue
+            gravar_esbocos(esbocos.filter(pc.equal(esbocos['uf'], uf_esboco)), diretorio_cubos, uf_esboco, competencia)
+
+        # Séries diárias por dia de internação (sih.series), também por UF
+        series = serializar(df)
+        for uf_serie in pc.unique(series['uf']).to_pylist():
+            if uf is None and (uf_serie, competencia) in com_arquivo_proprio:
+                continue
+            gravar_series(series.filter(pc.equal(series['uf'], uf_serie)), diretorio_cubos, uf_serie, competencia)
+
+        # O manifesto é salvo a cada unidade: uma interrupção não perde o que já foi feito
+        manifesto[chave] = assinatura
+        os.makedirs(diretorio_cubos, exist_ok=True)
+        with open(caminho_manifesto, 'w', encoding='utf-8') as arquivo:
+            json.dump(manifesto, arquivo, indent=1)
+        construidas.append((uf, competencia))
+    return construidas
+
+
+# --- Consulta ---
+
+class CubosRD:
+    """Diretório de cubos gravado por `construir`."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.versao_atual = self._versao_atual()
+
+    def _versao_atual(self):
+        """Indica se os cubos foram gravados com a VERSAO_CUBOS atual (cubos antigos são ignorados)."""
+        caminho_manifesto = os.path.join(self.diretorio, ARQUIVO_MANIFESTO)
+        if not os.path.exists(caminho_manifesto):
+            return False
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            manifesto = json.load(arquivo)
+        return all(assinatura.get('versao') == VERSAO_CUBOS for assinatura in manifesto.values())
+
+    def _caminho(self, nome, uf, competencia):
+        return os.path.join(self.diretorio, nome, uf, f'{competencia}.parquet')
+
+    def cobre(self, ufs, competencias):
+        """Indica se todos os cubos existem, na versão atual, para a seleção."""
+        return self.versao_atual and bool(ufs) and bool(competencias) and all(
+            os.path.exists(self._caminho(nome, uf, competencia))
+            for nome in DIMENSOES for uf in ufs for competencia in competencias
+        )
+
+    def ler(self, ufs, competencias):
+        """Lê os cubos da seleção como um `CubosSelecao`."""
+        cubos = {}
+        for nome in DIMENSOES:
+            caminhos = [self._caminho(nome, uf, c) for uf in ufs for c in competencias]
+            # Os índices dos dicionários variam por arquivo (int8 em uma UF, int16 em outra): promoção permissiva
+            tabelas = [pq.read_table(caminho) for caminho in caminhos]
+            cubos[nome] = pa.concat_tables(tabelas, promote_options='permissive').to_pandas()
+        return CubosSelecao(cubos['hospital'], cubos['perfil'], cubos['cid'])
+
+
+class CubosSelecao:
+    """Indicadores do dashboard calculados a partir dos cubos de uma seleção.
+
+    Cada método devolve o mesmo formato da função de mesmo nome de
+    `sih.indicadores` (ou de `sih.hospitais`), calculada sobre os registros
+    de AIH.
+    """
+
+    def __init__(self, hospital, perfil, cid):
+        self.hospital = hospital
+        self.perfil = perfil
+        self.cid = cid
+
+    # Métricas gerais
+
+    def calcular_percentual_obitos(self):
+        total_internacoes = int(self.perfil['internacoes'].sum())
+        total_obitos = int(self.perfil['obitos'].sum())
+        percentual_obitos = (total_obitos / total_internacoes) * 100 if total_internacoes > 0 else 0
+        return total_internacoes, total_obitos, percentual_obitos
+
+    def calcular_custos(self):
+        """Custo total e custo médio por internação (VAL_TOT)."""
+        valor_total = self.perfil['val_tot'].sum() / 100
+        n_valores = self.perfil['n_val_tot'].sum()
+        return valor_total, (valor_total / n_valores if n_valores > 0 else float('nan'))
+
+    def calcular_proporcao_gestrisco(self):
+        obstetricas = self.perfil[self.perfil['ESPEC'] == 2]
+        total_obstetricas = int(obstetricas['internacoes'].sum())
+        total_gestrisco = int(obstetricas['gestrisco'].sum())
+        proporcao_gestrisco = (total_gestrisco / total_obstetricas) * 100 if total_obstetricas > 0 else 0
+        return total_obstetricas, total_gestrisco, proporcao_gestrisco
+
+    def calcular_valor_medio_obito(self):
+        """Valor médio de VAL_TOT por status de óbito (colunas Status, Valor_Medio_Internacao)."""
+        linhas = []
+        for morte, status in MAP_OBITO.items():
+            sufixo = 'obito' if morte == 1 else 'sem_obito'
+            coluna_internacoes = 'obitos' if morte == 1 else 'sem_obito'
+            if self.perfil[coluna_internacoes].sum() == 0:
+                continue
+            n_valores = self.perfil[f'n_val_tot_{sufixo}'].sum()
+            valor = self.perfil[f'val_tot_{sufixo}'].sum() / 100 / n_valores if n_valores > 0 else float('nan')
+            linhas.append((status, valor))
+        valor_medio_obito = pd.DataFrame(linhas, columns=['Status', 'Valor_Medio_Internacao'])
+        return valor_medio_obito.sort_values(by='Valor_Medio_Internacao', ascending=False)
+
+    # Distribuições (mesmos formatos usados pelos gráficos de sih.graficos)
+
+    def contar_municipios(self):
+        contagem = self.hospital.groupby('MUNIC_MOV')['internacoes'].sum()
+        contagem_internacoes = maiores(contagem, 10).reset_index()
+        contagem_internacoes.columns = ['MUNIC_MOV', 'INTER']
+        return contagem_internacoes
+
+    def contar_sexo(self):
+        contagem = self.perfil.groupby('SEXO')['internacoes'].sum()
+        contagem.index = contagem.index.map(MAP_SEXO)
+        contagem = contagem[contagem.index.notna()]
+        sexo_counts = contagem.groupby(level=0).sum().sort_values(ascending=False).reset_index()
+        sexo_counts.columns = ['Sexo', 'QTD_INTERNAÇÕES']
+        return sexo_counts
+
+    def contar_faixa_etaria(self):
+        contagem = self.perfil.groupby('faixa_etaria', observed=True)['internacoes'].sum()
+        faixa_counts = contagem.reindex(FAIXAS_ETARIAS, fill_value=0).reset_index()
+        faixa_counts.columns = ['Faixa Etária', 'Internações']
+        return faixa_counts
+
+    def contar_raca(self):
+        raca_cor = self.perfil['RACA_COR'].map(MAP_RACA_COR).fillna('Não Informado')
+        raca_counts = (
+            self.perfil['internacoes'].groupby(raca_cor).sum()
+            .sort_values(ascending=False)
+            .reset_index()
+        )
+        raca_counts.columns = ['Raça/Cor', 'Total_Internacoes']
+        total_internacoes = raca_counts['Total_Internacoes'].sum()
+        raca_counts['Percentual'] = (raca_counts['Total_Internacoes'] / total_internacoes) * 100
+        return raca_counts
+
+    def calcular_tempo_medio_idade(self):
+        somas = self.perfil.groupby('faixa_etaria', observed=True)[['dias_perm', 'n_dias_perm']].sum()
+        somas = somas[somas['n_dias_perm'] > 0]
+        tempo_medio_permanencia = (somas['dias_perm'] / somas['n_dias_perm']).reset_index()
+        tempo_medio_permanencia.columns = ['Faixa_Etaria', 'Tempo_Medio_Permanencia_(dias)']
+        return tempo_medio_permanencia
+
+    def contar_capitulos_cid10(self):
+        frequencia_capitulos = (
+            self.perfil.groupby('capitulo_cid')['internacoes'].sum()
+            .sort_values(ascending=False)
+            .reset_index()
+        )
+        frequencia_capitulos.columns = ['Capitulo_CID', 'Frequencia']
+        total_internacoes = frequencia_capitulos['Frequencia'].sum()
+        frequencia_capitulos['Percentual'] = (frequencia_capitulos['Frequencia'] / total_internacoes) * 100
+        return frequencia_capitulos
+
+    def detalhar_cid10(self, capitulo, grupo=None):
+        contagem = self.cid.groupby('categoria_cid', observed=True)['internacoes'].sum()
+        contagens = np.zeros(len(CATEGORIAS), dtype='int64')
+        contagens[[codigo_categoria(categoria) for categoria in contagem.index]] = contagem.to_numpy()
+        return detalhar(contagens, capitulo, grupo)
+
+    # Perfil por hospital (os rankings são seleções top-k em sih.hospitais)
+
+    def perfil_hospitais(self):
+        perfil = self.hospital.groupby('CNES', observed=True)[MEDIDAS_HOSPITAL].sum()
+        return completar_perfil(perfil)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Constrói (incrementalmente) os cubos de agregados a partir dos arquivos RD."
+    )
+    parser.add_argument('--dados', default='datasets', help="diretório com os arquivos RD (.parquet)")
+    parser.add_argument('--saida', default='cubos', help="diretório de destino dos cubos")
+    parser.add_argument('--forcar', action='store_true', help="reagrega todas as partições, ignorando o manifesto")
+    args = parser.parse_args(argv)
+
+    construidas = construir(args.dados, args.saida, forcar=args.forcar)
+    if not construidas:
+        print("Cubos já atualizados.")
+    for uf, competencia in construidas:
+        print(f"Agregado: {uf or 'nacional'} {competencia // 100}/{competencia % 100:02d}")
+
+
+if __name__ == '__main__':
+    main()
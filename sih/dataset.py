@@ -0,0 +1,213 @@
+"""Dataset particionado de arquivos RD (AIH reduzida) por UF, ano e mês.
+
+Um diretório de dados pode conter, em qualquer combinação:
+
+* arquivos no padrão do DataSUS, um por UF e competência: `RDBA2401.parquet`;
+* arquivos nacionais legados, um por competência: `RD202401.parquet`;
+* diretórios no layout hive: `uf=BA/ano=2024/mes=1/*.parquet`.
+
+Abrir o dataset apenas lista os nomes dos arquivos; nenhum parquet é aberto
+até que uma seleção de UFs e competências seja lida, e então somente os
+arquivos dessas partições são varridos.
+"""
+import os
+import re
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+# Recorte de colunas de interesse (lidas diretamente do parquet, sem decodificar as demais)
+COLUNAS_INTERESSE = [
+    'UF_ZI', 'ESPEC', 'MUNIC_RES', 'SEXO', 'DIAR_ACOM', 'QT_DIARIAS', 
+    'VAL_TOT', 'DT_INTER', 'DT_SAIDA', 'DIAG_PRINC', 'GESTRISCO',
+    'COD_IDADE', 'IDADE', 'DIAS_PERM', 'MORTE', 'RACA_COR', 'CNES',
+    'COMPLEX', 'MARCA_UTI', 'MUNIC_MOV', 'VAL_UTI' # Adicionei VAL_UTI
+]
+
+# Colunas de partição materializadas em toda leitura (competência do arquivo)
+COLUNAS_PARTICAO = ['ano', 'mes']
+
+# Sigla -> (código IBGE, nome) das 27 UFs
+UFS = {
+    'RO': ('11', 'Rondônia'), 'AC': ('12', 'Acre'), 'AM': ('13', 'Amazonas'),
+    'RR': ('14', 'Roraima'), 'PA': ('15', 'Pará'), 'AP': ('16', 'Amapá'),
+    'TO': ('17', 'Tocantins'), 'MA': ('21', 'Maranhão'), 'PI': ('22', 'Piauí'),
+    'CE': ('23', 'Ceará'), 'RN': ('24', 'Rio Grande do Norte'), 'PB': ('25', 'Paraíba'),
+    'PE': ('26', 'Pernambuco'), 'AL': ('27', 'Alagoas'), 'SE': ('28', 'Sergipe'),
+    'BA': ('29', 'Bahia'), 'MG': ('31', 'Minas Gerais'), 'ES': ('32', 'Espírito Santo'),
+    'RJ': ('33', 'Rio de Janeiro'), 'SP': ('35', 'São Paulo'), 'PR': ('41', 'Paraná'),
+    'SC': ('42', 'Santa Catarina'), 'RS': ('43', 'Rio Grande do Sul'),
+    'MS': ('50', 'Mato Grosso do Sul'), 'MT': ('51', 'Mato Grosso'),
+    'GO': ('52', 'Goiás'), 'DF': ('53', 'Distrito Federal'),
+}
+SIGLA_POR_CODIGO = {codigo: sigla for sigla, (codigo, _) in UFS.items()}
+
+# Arquivo de uma partição. `uf` é None nos arquivos nacionais (todas as UFs).
+# `competencia` é um inteiro AAAAMM (ex.: 202401).
+Particao = namedtuple('Particao', ['uf', 'competencia', 'caminho'])
+
+_PADRAO_UF = re.compile(r'^RD(?P<uf>[A-Z]{2})(?P<ano>\d{2})(?P<mes>\d{2})\.parquet$', re.IGNORECASE)
+_PADRAO_NACIONAL = re.compile(r'^RD(?P<ano>\d{4})(?P<mes>\d{2})\.parquet$', re.IGNORECASE)
+_PADRAO_HIVE = re.compile(r'^(?P<chave>uf|ano|mes)=(?P<valor>[^/]+)$')
+
+
+def filtro_uf(schema, codigo_uf):
+    """Monta o filtro de UF_ZI por prefixo do código IBGE da UF (ex.: '29' = Bahia).
+
+    O prefixo é expresso como intervalo (>= '29' e < '2:'), o que permite ao
+    pyarrow descartar row groups inteiros pelas estatísticas min/max do parquet.
+    """
+    campo = ds.field('UF_ZI')
+    tipo = schema.field('UF_ZI').type
+    if pa.types.is_integer(tipo):
+        # UF_ZI numérico (ex.: 290000): mesmo recorte em faixa de inteiros
+        inicio = int(codigo_uf) * 10000
+        return (campo >= inicio) & (campo < inicio + 10000)
+    proximo = codigo_uf[:-1] + chr(ord(codigo_uf[-1]) + 1)
+    return (campo >= codigo_uf) & (campo < proximo)
+
+
+def _particao_do_arquivo(nome, chaves_hive):
+    """Extrai (uf, competencia) do nome do arquivo ou dos diretórios hive."""
+    if {'uf', 'ano', 'mes'} <= chaves_hive.keys():
+        return chaves_hive['uf'].upper(), int(chaves_hive['ano']) * 100 + int(chaves_hive['mes'])
+    encontrado = _PADRAO_UF.match(nome)
+    if encontrado and encontrado['uf'].upper() in UFS:
+        return encontrado['uf'].upper(), (2000 + int(encontrado['ano'])) * 100 + int(encontrado['mes'])
+    encontrado = _PADRAO_NACIONAL.match(nome)
+    if encontrado:
+        return None, int(encontrado['ano']) * 100 + int(encontrado['mes'])
+    return None
+
+
+def listar_particoes(diretorio):
+    """Lista as partições de um diretório de dados sem abrir nenhum arquivo."""
+    particoes = []
+    for raiz, diretorios, arquivos in os.walk(diretorio):
+        diretorios.sort()
+        relativo = os.path.relpath(raiz, diretorio)
+        chaves_hive = {}
+        for parte in relativo.split(os.sep):
+            encontrado = _PADRAO_HIVE.match(parte)
+            if encontrado:
+                chaves_hive[encontrado['chave']] = encontrado['valor']
+        for nome in sorted(arquivos):
+            if not nome.lower().endswith('.parquet'):
+                continue
+            chave = _particao_do_arquivo(nome, chaves_hive)
+            if chave is not None:
+                particoes.append(Particao(chave[0], chave[1], os.path.join(raiz, nome)))
+    return particoes
+
+
+class DatasetRD:
+    """Catálogo preguiçoso de partições RD de um diretório.
+
+    A construção só percorre nomes de arquivos; `ler` abre apenas os arquivos
+    das partições selecionadas, com projeção de colunas e filtro de UF
+    empurrados para a leitura do parquet.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.particoes = listar_particoes(diretorio)
+        if not self.particoes:
+            raise FileNotFoundError(f"Nenhum arquivo RD (.parquet) encontrado em '{diretorio}'")
+
+    def ufs(self):
+        """UFs disponíveis (arquivos nacionais disponibilizam todas)."""
+        if any(p.uf is None for p in self.particoes):
+            return list(UFS)
+        return [uf for uf in UFS if any(p.uf == uf for p in self.particoes)]
+
+    def competencias(self, ufs=None):
+        """Competências (AAAAMM) disponíveis para as UFs informadas, em ordem."""
+        return sorted({p.competencia for p in self.particoes
+                       if ufs is None or p.uf is None or p.uf in ufs})
+
+    def arquivos(self, ufs, competencias):
+        """Partições que cobrem a seleção, preferindo arquivos por UF aos nacionais."""
+        selecionadas = []
+        for competencia in competencias:
+            da_competencia = [p for p in self.particoes if p.competencia == competencia]
+            por_uf = [p for p in da_competencia if p.uf in ufs]
+            cobertas = {p.uf for p in por_uf}
+            selecionadas.extend(por_uf)
+            # Arquivos nacionais só entram se alguma UF pedida não tem arquivo próprio
+            if cobertas != set(ufs):
+                selecionadas.extend(p for p in da_competencia if p.uf is None)
+        return selecionadas
+
+    def linhas(self, ufs, competencias):
+        """Linhas dos arquivos da seleção, lidas dos rodapés (arquivos nacionais contam todas as UFs)."""
+        return sum(pq.read_metadata(p.caminho).num_rows for p in self.arquivos(ufs, competencias))
+
+    def _particoes(self, ufs, competencias):
+        particoes = self.arquivos(ufs, competencias)
+        if not particoes:
+            raise FileNotFoundError(
+                f"Nenhuma partição para UF(s) {', '.join(ufs)} nas competências {list(competencias)}"
+            )
+        return particoes
+
+    def abrir(self, ufs, competencias):
+        """Dataset pyarrow restrito às partições da seleção, com colunas `ano` e `mes`."""
+        return abrir_particoes(self._particoes(ufs, competencias))
+
+    def ler(self, ufs, competencias, colunas=None):
+        """Lê a seleção como `pyarrow.Table` (por padrão, COLUNAS_INTERESSE + ano/mes)."""
+        return ler_particoes(self._particoes(ufs, competencias), ufs, colunas)
+
+    def lotes(self, ufs, competencias, linhas_por_lote, colunas=None):
+        """Lê a seleção em `pyarrow.RecordBatch` de até `linhas_por_lote` linhas."""
+        return lotes_particoes(self._particoes(ufs, competencias), ufs, linhas_por_lote, colunas)
+
+
+def abrir_particoes(particoes):
+    """Dataset pyarrow sobre os arquivos informados, com colunas `ano` e `mes`."""
+    caminhos = [p.caminho for p in particoes]
+    # Apenas o rodapé do primeiro arquivo é lido para obter o schema
+    schema = ds.dataset(caminhos[0], format='parquet').schema
+    schema = schema.append(pa.field('ano', pa.int16())).append(pa.field('mes', pa.int8()))
+    expressoes = [
+        (ds.field('ano') == pa.scalar(p.competencia // 100, pa.int16()))
+        & (ds.field('mes') == pa.scalar(p.competencia % 100, pa.int8()))
+        for p in particoes
+    ]
+    return ds.FileSystemDataset.from_paths(
+        caminhos, schema=schema, format=ds.ParquetFileFormat(),
+        filesystem=pafs.LocalFileSystem(), partitions=expressoes
+    )
+
+
+def filtro_ufs(schema, ufs):
+    """Filtro de UF_ZI que aceita qualquer uma das UFs (siglas) informadas."""
+    filtro = None
+    for uf in ufs:
+        filtro_da_uf = filtro_uf(schema, UFS[uf][0])
+        filtro = filtro_da_uf if filtro is None else filtro | filtro_da_uf
+    return filtro
+
+
+def ler_particoes(particoes, ufs, colunas=None):
+    """Lê os arquivos informados mantendo apenas as linhas das UFs pedidas (via UF_ZI)."""
+    colunas = (colunas or COLUNAS_INTERESSE) + COLUNAS_PARTICAO
+    dataset = abrir_particoes(particoes)
+    return dataset.to_table(columns=colunas, filter=filtro_ufs(dataset.schema, ufs))
+
+
+def lotes_particoes(particoes, ufs, linhas_por_lote, colunas=None):
+    """Como `ler_particoes`, mas gera lotes de até `linhas_por_lote` linhas.
+
+    A leitura antecipada é limitada a poucos lotes de um arquivo por vez, de
+    modo que a memória ocupada depende do tamanho do lote, não da seleção.
+    """
+    colunas = (colunas or COLUNAS_INTERESSE) + COLUNAS_PARTICAO
+    dataset = abrir_particoes(particoes)
+    return dataset.to_batches(
+        columns=colunas, filter=filtro_ufs(dataset.schema, ufs), batch_size=linhas_por_lote,
+        batch_readahead=2, fragment_readahead=1, use_threads=False,
+    )
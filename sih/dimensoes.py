@@ -0,0 +1,262 @@
+"""Tabelas de dimensão conformadas: municípios, regiões de saúde e estabelecimentos (CNES).
+
+Cada dimensão é uma tabela Arrow em que a linha i tem a chave inteira i e a
+coluna `codigo` guarda a chave natural (município IBGE de 6 dígitos, como no
+RD; código da região; CNES). Um índice por hash traduz códigos em chaves uma
+vez por código distinto (nos fatos, uma vez por categoria de MUNIC_MOV/CNES);
+daí em diante, juntar fatos e dimensões é indexar arrays pelas chaves
+(`take`), sem merges por texto. As dimensões se referenciam pelas mesmas
+chaves: estabelecimento -> município -> região de saúde.
+
+As tabelas são montadas a partir dos arquivos auxiliares do diretório de dados:
+
+* `municipios.csv` (Codigo, Nome): municípios do IBGE;
+* `regioes_saude.csv` (Codigo_Municipio, Codigo_Regiao, Nome_Regiao):
+  região de saúde de cada município;
+* `cnes_estabelecimentos.csv` (CO_CNES, NO_FANTASIA, CO_MUNICIPIO_GESTOR,
+  do cadastro de estabelecimentos do CNES): nome e município de cada hospital.
+
+Os fatos (arquivos RD, cache Arrow, cubos) não ganham colunas de chave
+inteira: MUNIC_MOV e CNES já são categorias, e a chave de cada linha é a
+chave da sua categoria, obtida uma vez por categoria (`regioes_por_linha`) e
+distribuída às linhas pelos códigos das categorias. Gravar as chaves nos
+fatos mudaria o layout RD lido pela ingestão, pelo cache e pelos cubos, e
+as ligaria a uma versão das dimensões: uma atualização do cadastro do CNES
+obrigaria a reprocessar todas as competências. Nas consultas, a tradução por
+hash só é feita sobre as categorias ou sobre tabelas de resultado pequenas
+(os 10 municípios do gráfico, os hospitais de um ranking).
+
+Arquivos ausentes dão dimensões vazias. As tabelas são gravadas em parquet
+(`python -m sih.dimensoes`) com a assinatura dos arquivos de origem e só são
+remontadas quando a origem muda.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from sih.cache import assinatura_arquivos
+from sih.dataset import SIGLA_POR_CODIGO
+
+# Versão do formato das dimensões: incrementar ao mudar colunas ou regras de montagem
+VERSAO_DIMENSOES = 1
+
+ARQUIVO_MUNICIPIOS = 'municipios.csv'
+ARQUIVO_REGIOES = 'regioes_saude.csv'
+ARQUIVO_CNES = 'cnes_estabelecimentos.csv'
+
+# Colunas do cadastro de estabelecimentos do CNES -> colunas da dimensão
+COLUNAS_CNES = {'CO_CNES': 'codigo', 'NO_FANTASIA': 'nome', 'CO_MUNICIPIO_GESTOR': 'municipio'}
+
+# Chaves estrangeiras (int32) apontam para a linha da outra dimensão
+ESQUEMAS = {
+    'municipios': pa.schema([('codigo', pa.string()), ('nome', pa.string()), ('uf', pa.string()),
+                             ('regiao', pa.int32())]),
+    'regioes_saude': pa.schema([('codigo', pa.string()), ('nome', pa.string()), ('uf', pa.string())]),
+    'cnes': pa.schema([('codigo', pa.string()), ('nome', pa.string()), ('municipio', pa.int32())]),
+}
+
+
+class Dimensao:
+    """Tabela de dimensão: a linha i tem a chave inteira i; `codigo` é a chave natural."""
+
+    def __init__(self, tabela):
+        self.tabela = tabela
+        # Índice por hash código -> posição; a tabela de hash é criada no primeiro uso e reaproveitada
+        self._indice = pd.Index(tabela['codigo'].to_pandas())
+
+    def __len__(self):
+        return self.tabela.num_rows
+
+    def chaves(self, codigos):
+        """Chave inteira (int32) de cada código; -1 para códigos fora da dimensão."""
+        return self._indice.get_indexer(pd.Index(codigos)).astype('int32')
+
+    def valores(self, coluna, chaves, nulo=None):
+        """Valores de `coluna` nas linhas `chaves` (`take`); chaves -1 dão `nulo`."""
+        chaves = np.asarray(chaves)
+        valores = pc.take(self.tabela[coluna], pa.array(chaves, type=pa.int32(), mask=chaves < 0))
+        if nulo is not None:
+            valores = pc.fill_null(valores, nulo)
+        return valores.to_numpy(zero_copy_only=False)
+
+    def codigos_das_ufs(self, ufs):
+        """{código: nome} das linhas das UFs pedidas, na ordem dos códigos."""
+        tabela = self.tabela.filter(pc.is_in(self.tabela['uf'], pa.array(list(ufs), pa.string())))
+        tabela = tabela.sort_by('codigo')
+        return dict(zip(tabela['codigo'].to_pylist(), tabela['nome'].to_pylist()))
+
+
+def _tabela(colunas, nome):
+    """Tabela da dimensão `nome`; chaves estrangeiras -1 viram nulos."""
+    arrays = []
+    for campo in ESQUEMAS[nome]:
+        valores = colunas[campo.name]
+        if pa.types.is_integer(campo.type):
+            arrays.append(pa.array(valores, type=campo.type, mask=np.asarray(valores) < 0))
+        else:
+            arrays.append(pa.array(valores, type=campo.type, from_pandas=True))
+    return pa.table(arrays, schema=ESQUEMAS[nome])
+
+
+def _ler_csv(caminho, colunas, encoding='utf-8'):
+    """CSV auxiliar com as `colunas` como texto (preserva zeros à esquerda); separador ',' ou ';'."""
+    with open(caminho, encoding=encoding) as arquivo:
+        cabecalho = arquivo.readline()
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    df = pd.read_csv(caminho, sep=separador, dtype=str, usecols=colunas, encoding=encoding)
+    return df.apply(lambda coluna: coluna.str.strip())
+
+
+# --- Montagem ---
+
+def montar_regioes(caminho):
+    """(dimensão de regiões de saúde, Series município -> código da região)."""
+    df = _ler_csv(caminho, ['Codigo_Municipio', 'Codigo_Regiao', 'Nome_Regiao'])
+    df['Codigo_Municipio'] = df['Codigo_Municipio'].str[:6]
+    regioes = df.drop_duplicates('Codigo_Regiao').sort_values('Codigo_Regiao')
+    regioes = {
+        'codigo': regioes['Codigo_Regiao'],
+        'nome': regioes['Nome_Regiao'],
+        'uf': regioes['Codigo_Municipio'].str[:2].map(SIGLA_POR_CODIGO),
+    }
+    regiao_por_municipio = df.drop_duplicates('Codigo_Municipio').set_index('Codigo_Municipio')['Codigo_Regiao']
+    return Dimensao(_tabela(regioes, 'regioes_saude')), regiao_por_municipio
+
+
+def montar_municipios(caminho, regioes=None, regiao_por_municipio=None):
+    """Dimensão de municípios: o código IBGE de 7 dígitos vira o de 6 usado no RD (uma vez, na montagem)."""
+    df = _ler_csv(caminho, ['Codigo', 'Nome'])
+    df['Codigo'] = df['Codigo'].str[:6]
+    df = df.drop_duplicates('Codigo').sort_values('Codigo')
+    regiao = np.full(len(df), -1, dtype='int32')
+    if regioes is not None:
+        regiao = regioes.chaves(regiao_por_municipio.reindex(df['Codigo']).fillna(''))
+    municipios = {
+        'codigo': df['Codigo'],
+        'nome': df['Nome'],
+        'uf': df['Codigo'].str[:2].map(SIGLA_POR_CODIGO),
+        'regiao': regiao,
+    }
+    return Dimensao(_tabela(municipios, 'municipios'))
+
+
+def montar_cnes(caminho, municipios):
+    """Dimensão de estabelecimentos, com a chave do município gestor."""
+    df = _ler_csv(caminho, list(COLUNAS_CNES), encoding='latin-1').rename(columns=COLUNAS_CNES)
+    df['codigo'] = df['codigo'].str.zfill(7)
+    df = df.drop_duplicates('codigo').sort_values('codigo')
+    colunas = {
+        'codigo': df['codigo'],
+        'nome': df['nome'],
+        'municipio': municipios.chaves(df['municipio'].fillna('').str[:6]),
+    }
+    return Dimensao(_tabela(colunas, 'cnes'))
+
+
+def _vazia(nome):
+    return Dimensao(ESQUEMAS[nome].empty_table())
+
+
+def _origem(diretorio_dados):
+    caminhos = [os.path.join(diretorio_dados, nome) for nome in (ARQUIVO_MUNICIPIOS, ARQUIVO_REGIOES, ARQUIVO_CNES)]
+    return {'versao': VERSAO_DIMENSOES, 'arquivos': assinatura_arquivos([c for c in caminhos if os.path.exists(c)])}
+
+
+class DimensoesRD:
+    """Municípios, regiões de saúde e estabelecimentos, ligados por chaves inteiras."""
+
+    NOMES = ['municipios', 'regioes_saude', 'cnes']
+
+    def __init__(self, municipios, regioes_saude, cnes):
+        self.municipios = municipios
+        self.regioes_saude = regioes_saude
+        self.cnes = cnes
+
+    @classmethod
+    def montar(cls, diretorio_dados):
+        """Monta as dimensões a partir dos arquivos auxiliares (os ausentes dão dimensões vazias)."""
+        caminho = os.path.join(diretorio_dados, ARQUIVO_REGIOES)
+        regioes, regiao_por_municipio = montar_regioes(caminho) if os.path.exists(caminho) else (None, None)
+        caminho = os.path.join(diretorio_dados, ARQUIVO_MUNICIPIOS)
+        municipios = (montar_municipios(caminho, regioes, regiao_por_municipio)
+                      if os.path.exists(caminho) else _vazia('municipios'))
+        caminho = os.path.join(diretorio_dados, ARQUIVO_CNES)
+        cnes = montar_cnes(caminho, municipios) if os.path.exists(caminho) else _vazia('cnes')
+        return cls(municipios, regioes if regioes is not None else _vazia('regioes_saude'), cnes)
+
+    def gravar(self, diretorio, origem):
+        os.makedirs(diretorio, exist_ok=True)
+        metadados = {b'origem': json.dumps(origem).encode('utf-8')}
+        for nome in self.NOMES:
+            tabela = getattr(self, nome).tabela.replace_schema_metadata(metadados)
+            pq.write_table(tabela, os.path.join(diretorio, f'{nome}.parquet'), compression='zstd')
+
+    @classmethod
+    def ler(cls, diretorio, origem=None):
+        """Lê as dimensões gravadas; com `origem`, retorna None se alguma foi gravada de outra origem."""
+        tabelas = []
+        for nome in cls.NOMES:
+            caminho = os.path.join(diretorio, f'{nome}.parquet')
+            if not os.path.exists(caminho):
+                return None
+            tabela = pq.read_table(caminho)
+            if origem is not None and json.loads(tabela.schema.metadata[b'origem']) != origem:
+                return None
+            tabelas.append(Dimensao(tabela.replace_schema_metadata(None)))
+        return cls(*tabelas)
+
+    @classmethod
+    def abrir(cls, diretorio_dados, diretorio_dimensoes):
+        """Dimensões gravadas em `diretorio_dimensoes`, remontadas (e regravadas) se a origem mudou."""
+        origem = _origem(diretorio_dados)
+        dimensoes = cls.ler(diretorio_dimensoes, origem)
+        if dimensoes is None:
+            dimensoes = cls.montar(diretorio_dados)
+            dimensoes.gravar(diretorio_dimensoes, origem)
+        return dimensoes
+
+    # Junções por chave
+
+    def regioes_por_linha(self, munic_mov):
+        """Chave da região de saúde de cada linha (-1 sem região), a partir de MUNIC_MOV categórico.
+
+        A tradução código -> município -> região é feita por categoria; as
+        linhas recebem a chave pelos códigos das categorias.
+        """
+        municipio = self.municipios.chaves(munic_mov.cat.categories)
+        por_categoria = self.municipios.valores('regiao', municipio, nulo=-1).astype('int32')
+        return np.append(por_categoria, -1).astype('int32')[munic_mov.cat.codes.to_numpy()]
+
+    def descrever_cnes(self, codigos):
+        """Hospital, município e região de saúde de cada CNES (nulos quando fora do cadastro)."""
+        cnes = self.cnes.chaves(codigos)
+        municipio = self.cnes.valores('municipio', cnes, nulo=-1)
+        regiao = self.municipios.valores('regiao', municipio, nulo=-1)
+        return pd.DataFrame({
+            'Hospital': self.cnes.valores('nome', cnes),
+            'Município': self.municipios.valores('nome', municipio),
+            'Região de Saúde': self.regioes_saude.valores('nome', regiao),
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Monta as dimensões de municípios, regiões de saúde e estabelecimentos (CNES)."
+    )
+    parser.add_argument('--dados', default='datasets', help="diretório com os arquivos auxiliares (.csv)")
+    parser.add_argument('--saida', default='dimensoes', help="diretório de destino (.parquet)")
+    args = parser.parse_args(argv)
+
+    dimensoes = DimensoesRD.abrir(args.dados, args.saida)
+    for nome in DimensoesRD.NOMES:
+        print(f"{nome}: {len(getattr(dimensoes, nome))} linhas")
+
+
+if __name__ == '__main__':
+    main()
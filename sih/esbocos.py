@@ -0,0 +1,332 @@
+"""Esboços (sketches) mergeáveis para rankings e contagens distintas de alta cardinalidade.
+
+Para cada UF, dia de internação (DT_INTER) e dimensão de código (município,
+hospital, diagnóstico), `esbocar` guarda três estados pequenos:
+
+* HyperLogLog: contagem aproximada de valores distintos (registros combinados pelo máximo);
+* Count-Min: contagem aproximada de qualquer valor, nunca abaixo da real (combinado pela soma);
+* Misra-Gries: os valores mais frequentes com contagens que nunca passam da
+  real, mais o limiar descontado (combinados pela soma).
+
+Os estados são gravados por `python -m sih.cubos` ao lado dos cubos
+(`esbocos/UF/AAAAMM.parquet`, uma linha por dimensão e dia). Top-N e
+distintos de qualquer período são respondidos somando os dias, sem ler os
+registros de AIH (`EsbocosRD`). `ContagensExatas` responde às mesmas
+consultas a partir dos registros, lidos em lotes; `python -m sih.esbocos
+--exato` escolhe entre as duas.
+"""
+import argparse
+import glob
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from sih.dataset import DatasetRD, SIGLA_POR_CODIGO
+from sih.preprocessamento import tipar
+
+# Dimensões com esboços (colunas de código do RD)
+DIMENSOES_ESBOCO = ['MUNIC_MOV', 'CNES', 'DIAG_PRINC', 'MUNIC_RES']
+
+# HyperLogLog com 2^11 registros: erro padrão de ~2,3% nas contagens distintas
+BITS_HLL = 11
+REGISTROS_HLL = 1 << BITS_HLL
+
+# Count-Min: PROFUNDIDADE linhas de LARGURA contadores
+LARGURA_CM = 1024
+PROFUNDIDADE_CM = 4
+
+# Contadores do resumo Misra-Gries por dia
+CONTADORES_MG = 128
+
+LINHAS_POR_LOTE = 256 * 1024
+
+SUBDIRETORIO = 'esbocos'
+
+
+# --- Hashes ---
+
+def _hash(valores):
+    """Hash de 64 bits estável (entre processos e execuções) de cada valor de texto."""
+    return pd.util.hash_array(np.asarray(valores, dtype=object), categorize=False)
+
+
+def _bits(valores):
+    """Número de bits significativos (int.bit_length) de inteiros sem sinal de 64 bits."""
+    def bits32(parte):
+        parte = parte.astype('float64')
+        return np.where(parte > 0, np.floor(np.log2(np.maximum(parte, 1))) + 1, 0).astype('int64')
+    alto = valores >> np.uint64(32)
+    baixo = valores & np.uint64(0xFFFFFFFF)
+    return np.where(alto > 0, 32 + bits32(alto), bits32(baixo))
+
+
+def _hll(hashes):
+    """(registro, posto) HyperLogLog de cada hash."""
+    resto_bits = 64 - BITS_HLL
+    registro = (hashes >> np.uint64(resto_bits)).astype('int64')
+    resto = hashes & np.uint64((1 << resto_bits) - 1)
+    posto = (resto_bits - _bits(resto) + 1).astype('uint8')
+    return registro, posto
+
+
+def _colunas_cm(hashes):
+    """Coluna do Count-Min de cada hash em cada linha (hashing duplo), forma (n, PROFUNDIDADE_CM)."""
+    h1 = (hashes & np.uint64(0xFFFFFFFF)).astype('int64')
+    h2 = (hashes >> np.uint64(32)).astype('int64') | 1
+    linhas = np.arange(PROFUNDIDADE_CM, dtype='int64')
+    return (h1[:, None] + linhas[None, :] * h2[:, None]) % LARGURA_CM
+
+
+def _binario(matriz):
+    """Cada linha da matriz como um valor binário de tamanho fixo."""
+    matriz = np.ascontiguousarray(matriz)
+    largura = matriz.itemsize * matriz.shape[1]
+    return pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(largura), len(matriz), [None, pa.py_buffer(matriz.tobytes())]
+    )
+
+
+def _matriz(coluna, dtype, largura):
+    """Inverso de `_binario` para uma coluna lida do parquet."""
+    dados = pa.concat_arrays(coluna.chunks) if coluna.num_chunks else pa.array([], coluna.type)
+    return np.frombuffer(dados.buffers()[1], dtype=dtype, count=len(dados) * largura).reshape(len(dados), largura)
+
+
+def estimar_distintos(registros):
+    """Estimativa HyperLogLog (com correção para poucas observações) a partir dos registros."""
+    m = len(registros)
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimativa = alfa * m * m / np.sum(np.ldexp(1.0, -registros.astype('int64')))
+    vazios = int(np.count_nonzero(registros == 0))
+    if estimativa <= 2.5 * m and vazios > 0:
+        return m * np.log(m / vazios)
+    return estimativa
+
+
+# --- Construção ---
+
+def esbocar(df):
+    """Tabela de esboços por UF, dia de internação e dimensão de um frame pré-processado."""
+    uf = df['UF_ZI'].str[:2].map(SIGLA_POR_CODIGO)
+    dia = df['DT_INTER'].to_numpy().astype('datetime64[D]')
+    grupos = pd.DataFrame({'uf': uf, 'dia': dia})
+    grupo = grupos.groupby(['uf', 'dia'], sort=True, dropna=True).ngroup().fillna(-1).to_numpy('int64')
+    chaves_grupo = grupos.drop_duplicates().dropna().sort_values(['uf', 'dia'])
+    n_grupos = len(chaves_grupo)
+
+    partes = []
+    for dimensao in DIMENSOES_ESBOCO:
+        coluna = df[dimensao]
+        if not isinstance(coluna.dtype, pd.CategoricalDtype):
+            coluna = coluna.astype('category')
+        categorias = np.asarray(coluna.cat.categories, dtype=object)
+        n_categorias = max(len(categorias), 1)
+        codigos = coluna.cat.codes.to_numpy().astype('int64')
+        # Códigos vazios e UFs inválidas ficam de fora
+        validas = (codigos >= 0) & (grupo >= 0)
+        validas &= np.append(categorias != '', False)[codigos]
+
+        # Contagem de cada (grupo, valor): todos os esboços partem destes pares
+        pares, contagens = np.unique(grupo[validas] * n_categorias + codigos[validas], return_counts=True)
+        grupo_par, valor_par = np.divmod(pares, n_categorias)
+        hashes = _hash(categorias)
+
+        posicoes_cm = (
+            (grupo_par[:, None] * PROFUNDIDADE_CM + np.arange(PROFUNDIDADE_CM)) * LARGURA_CM
+            + _colunas_cm(hashes)[valor_par]
+        )
+        cm = np.bincount(
+            posicoes_cm.ravel(), weights=np.repeat(contagens, PROFUNDIDADE_CM),
+            minlength=n_grupos * PROFUNDIDADE_CM * LARGURA_CM,
+        ).astype('uint32').reshape(n_grupos, -1)
+
+        registro, posto = _hll(hashes)
+        hll = np.zeros(n_grupos * REGISTROS_HLL, dtype='uint8')
+        np.maximum.at(hll, grupo_par * REGISTROS_HLL + registro[valor_par], posto[valor_par])
+        hll = hll.reshape(n_grupos, -1)
+
+        # Misra-Gries de cada grupo: os CONTADORES_MG mais frequentes menos a contagem seguinte
+        ordem = np.lexsort((-contagens, grupo_par))
+        grupo_par, valor_par, contagens = grupo_par[ordem], valor_par[ordem], contagens[ordem]
+        inicio = np.searchsorted(grupo_par, np.arange(n_grupos))
+        posicao = np.arange(len(grupo_par)) - inicio[grupo_par]
+        limiar = np.zeros(n_grupos, dtype='int64')
+        limiar[grupo_par[posicao == CONTADORES_MG]] = contagens[posicao == CONTADORES_MG]
+        mantidos = (posicao < CONTADORES_MG) & (contagens > limiar[grupo_par])
+        deslocamentos = np.searchsorted(grupo_par[mantidos], np.arange(n_grupos + 1))
+
+        partes.append(pa.table({
+            'uf': pa.array(chaves_grupo['uf'].to_numpy(dtype=object), pa.string()),
+            'dia': pa.array(chaves_grupo['dia'].to_numpy().astype('datetime64[D]')),
+            'dimensao': pa.array([dimensao] * n_grupos, pa.string()),
+            'internacoes': np.bincount(grupo_par, weights=contagens, minlength=n_grupos).astype('int64'),
+            'hll': _binario(hll),
+            'cm': _binario(cm),
+            'limiar': limiar,
+            'chaves': pa.ListArray.from_arrays(
+                deslocamentos.astype('int32'), pa.array(categorias[valor_par[mantidos]], pa.string())
+            ),
+            'contagens': pa.ListArray.from_arrays(
+                deslocamentos.astype('int32'), pa.array(contagens[mantidos] - limiar[grupo_par[mantidos]])
+            ),
+        }))
+    return pa.concat_tables(partes)
+
+
+def gravar(tabela, diretorio_cubos, uf, competencia):
+    destino = os.path.join(diretorio_cubos, SUBDIRETORIO, uf, f'{competencia}.parquet')
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Contadores e registros são quase todos zero: o zstd os reduz a uma fração
+    pq.write_table(tabela, destino, compression='zstd')
+
+
+# --- Consulta ---
+
+def _filtro(dimensao, inicio, fim):
+    filtro = ds.field('dimensao') == dimensao
+    if inicio is not None:
+        filtro &= ds.field('dia') >= pa.scalar(inicio, pa.date32())
+    if fim is not None:
+        filtro &= ds.field('dia') <= pa.scalar(fim, pa.date32())
+    return filtro
+
+
+def _resultado(dimensao, contagens, k):
+    """Top-k ordenado pela contagem (e pelo valor, nos empates) nas colunas do resultado."""
+    contagens = contagens.sort_values(['Internacoes', dimensao], ascending=[False, True]).head(k)
+    return contagens[[dimensao, 'Internacoes', 'Minimo', 'Maximo']].reset_index(drop=True)
+
+
+class EsbocosRD:
+    """Consultas aproximadas sobre os esboços gravados por `python -m sih.cubos`."""
+
+    exato = False
+
+    def __init__(self, diretorio_cubos):
+        self.diretorio = os.path.join(diretorio_cubos, SUBDIRETORIO)
+
+    def cobre(self, ufs):
+        """Indica se há esboços de todas as UFs."""
+        return bool(ufs) and all(glob.glob(os.path.join(self.diretorio, uf, '*.parquet')) for uf in ufs)
+
+    def _ler(self, dimensao, ufs, inicio, fim, colunas):
+        caminhos = [c for uf in ufs for c in sorted(glob.glob(os.path.join(self.diretorio, uf, '*.parquet')))]
+        if not caminhos:
+            raise FileNotFoundError(f"Nenhum esboço para UF(s) {', '.join(ufs)} em '{self.diretorio}'")
+        return ds.dataset(caminhos, format='parquet').to_table(
+            columns=colunas, filter=_filtro(dimensao, inicio, fim)
+        )
+
+    def top_k(self, dimensao, ufs, inicio=None, fim=None, k=10):
+        """Os k valores mais frequentes no período, com limites inferior e superior da contagem.
+
+        Os candidatos vêm dos resumos Misra-Gries; `Internacoes` é a estimativa
+        do Count-Min, limitada pelo máximo garantido pelos resumos.
+        """
+        tabela = self._ler(dimensao, ufs, inicio, fim, ['cm', 'limiar', 'chaves', 'contagens'])
+        colunas = [dimensao, 'Internacoes', 'Minimo', 'Maximo']
+        if tabela.num_rows == 0:
+            return pd.DataFrame(columns=colunas)
+        candidatos = pd.DataFrame({
+            dimensao: pc.list_flatten(tabela['chaves']).to_numpy(zero_copy_only=False),
+            'Minimo': pc.list_flatten(tabela['contagens']).to_numpy(zero_copy_only=False),
+        }).groupby(dimensao)['Minimo'].sum().reset_index()
+
+        cm = _matriz(tabela['cm'], 'uint32', PROFUNDIDADE_CM * LARGURA_CM).sum(axis=0, dtype='int64')
+        cm = cm.reshape(PROFUNDIDADE_CM, LARGURA_CM)
+        colunas_cm = _colunas_cm(_hash(candidatos[dimensao]))
+        estimativa = cm[np.arange(PROFUNDIDADE_CM), colunas_cm].min(axis=1)
+
+        # Fora dos resumos de um dia, a contagem daquele dia não passa do limiar descontado
+        candidatos['Maximo'] = np.minimum(estimativa, candidatos['Minimo'] + int(pc.sum(tabela['limiar']).as_py()))
+        candidatos['Internacoes'] = candidatos['Maximo']
+        return _resultado(dimensao, candidatos, k)
+
+    def distintos(self, dimensao, ufs, inicio=None, fim=None):
+        """Número aproximado de valores distintos da dimensão no período."""
+        tabela = self._ler(dimensao, ufs, inicio, fim, ['hll'])
+        if tabela.num_rows == 0:
+            return 0
+        registros = _matriz(tabela['hll'], 'uint8', REGISTROS_HLL).max(axis=0)
+        return int(round(estimar_distintos(registros)))
+
+
+class ContagensExatas:
+    """As mesmas consultas de `EsbocosRD`, exatas, a partir dos registros de AIH (lidos em lotes)."""
+
+    exato = True
+
+    def __init__(self, dataset, linhas_por_lote=LINHAS_POR_LOTE):
+        self.dataset = dataset
+        self.linhas_por_lote = linhas_por_lote
+
+    def _valores(self, dimensao, ufs, inicio, fim):
+        """Valores não vazios da dimensão nas internações do período, lote a lote."""
+        colunas = [dimensao, 'DT_INTER', 'DT_SAIDA']
+        for lote in self.dataset.lotes(ufs, self.dataset.competencias(ufs), self.linhas_por_lote, colunas):
+            tabela = tipar(pa.Table.from_batches([lote]))
+            dia = pc.cast(tabela['DT_INTER'], pa.date32())
+            manter = pc.and_(pc.is_valid(tabela[dimensao]), pc.not_equal(pc.cast(tabela[dimensao], pa.string()), ''))
+            if inicio is not None:
+                manter = pc.and_(manter, pc.greater_equal(dia, pa.scalar(inicio, pa.date32())))
+            if fim is not None:
+                manter = pc.and_(manter, pc.less_equal(dia, pa.scalar(fim, pa.date32())))
+            yield pc.cast(tabela[dimensao].filter(manter), pa.string())
+
+    def top_k(self, dimensao, ufs, inicio=None, fim=None, k=10):
+        contagens = pd.Series(dtype='int64')
+        for valores in self._valores(dimensao, ufs, inicio, fim):
+            frequencias = pc.value_counts(valores.combine_chunks())
+            parcial = pd.Series(
+                frequencias.field('counts').to_numpy(),
+                index=frequencias.field('values').to_numpy(zero_copy_only=False),
+            )
+            contagens = contagens.add(parcial, fill_value=0)
+        contagens = contagens.astype('int64').rename_axis(dimensao).rename('Internacoes').reset_index()
+        contagens['Minimo'] = contagens['Maximo'] = contagens['Internacoes']
+        return _resultado(dimensao, contagens, k)
+
+    def distintos(self, dimensao, ufs, inicio=None, fim=None):
+        vistos = set()
+        for valores in self._valores(dimensao, ufs, inicio, fim):
+            vistos.update(pc.unique(valores).to_pylist())
+        return len(vistos)
+
+
+def abrir_contagens(exato, diretorio_dados='datasets', diretorio_cubos='cubos'):
+    """`ContagensExatas` (registros) ou `EsbocosRD` (esboços), conforme `exato`."""
+    if exato:
+        return ContagensExatas(DatasetRD(diretorio_dados))
+    return EsbocosRD(diretorio_cubos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Top-N e contagens distintas por período, pelos esboços (aproximado) ou pelos registros (exato)."
+    )
+    parser.add_argument('consulta', choices=['top', 'distintos'])
+    parser.add_argument('--dimensao', choices=DIMENSOES_ESBOCO, default='MUNIC_MOV')
+    parser.add_argument('--ufs', nargs='+', required=True)
+    parser.add_argument('--inicio', type=date.fromisoformat, default=None, help="primeiro dia de internação (AAAA-MM-DD)")
+    parser.add_argument('--fim', type=date.fromisoformat, default=None, help="último dia de internação (AAAA-MM-DD)")
+    parser.add_argument('--k', type=int, default=10, help="tamanho do ranking")
+    parser.add_argument('--exato', action='store_true', help="calcula a partir dos registros de AIH, sem esboços")
+    parser.add_argument('--dados', default='datasets', help="diretório com os arquivos RD (.parquet), para --exato")
+    parser.add_argument('--cubos', default='cubos', help="diretório dos cubos e esboços")
+    args = parser.parse_args(argv)
+
+    contagens = abrir_contagens(args.exato, args.dados, args.cubos)
+    if args.consulta == 'top':
+        print(contagens.top_k(args.dimensao, args.ufs, args.inicio, args.fim, args.k).to_string(index=False))
+    else:
+        print(contagens.distintos(args.dimensao, args.ufs, args.inicio, args.fim))
+
+
+if __name__ == '__main__':
+    main()
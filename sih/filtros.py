@@ -0,0 +1,89 @@
+"""Índices por dimensão para os filtros da barra lateral.
+
+Cada dimensão filtrável é guardada como códigos inteiros por linha (os códigos
+das categorias). Filtrar uma dimensão é uma única indexação em uma tabela
+booleana do tamanho do número de categorias, e o período de internação usa a
+ordem de DT_INTER pré-calculada com busca binária. As máscaras das dimensões
+são combinadas e o frame é recortado uma única vez.
+"""
+import numpy as np
+import pandas as pd
+
+from sih.preprocessamento import MAP_SEXO
+
+
+def _codificar(serie, rotular=None):
+    """(categorias, código por linha); `rotular` transforma as categorias em rótulos."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    categorias = serie.cat.categories
+    codigos = serie.cat.codes.to_numpy()
+    if rotular is None:
+        return categorias, codigos
+    rotulos = pd.Categorical(rotular(pd.Series(categorias)))
+    # código da categoria -> código do rótulo; a última posição recebe os nulos (-1)
+    de_para = np.append(rotulos.codes, -1)
+    return rotulos.categories, de_para[codigos]
+
+
+class IndiceFiltros:
+    """Índices de filtragem sobre um frame pré-processado (somente leitura).
+
+    Com `dimensoes` (`sih.dimensoes.DimensoesRD`) que tenham regiões de saúde,
+    filtra também por `regiao_saude` (código da região do MUNIC_MOV).
+    """
+
+    def __init__(self, df, dimensoes=None):
+        self.df = df
+        datas = df['DT_INTER'].to_numpy()
+        self._ordem_datas = np.argsort(datas, kind='stable')
+        self._datas_ordenadas = datas[self._ordem_datas]
+        self._codigos = {
+            'MUNIC_MOV': _codificar(df['MUNIC_MOV']),
+            'CNES': _codificar(df['CNES']),
+            'capitulo_cid': _codificar(df['capitulo_cid']),
+            'SEXO': _codificar(df['SEXO'], lambda sexo: sexo.map(MAP_SEXO)),
+            'faixa_etaria': _codificar(df['faixa_etaria']),
+            'ESPEC': _codificar(df['ESPEC']),
+        }
+        if dimensoes is not None and len(dimensoes.regioes_saude):
+            # Chave da região por linha: junção pelas chaves inteiras das dimensões
+            regioes = pd.Index(dimensoes.regioes_saude.tabela['codigo'].to_pandas())
+            self._codigos['regiao_saude'] = (regioes, dimensoes.regioes_por_linha(df['MUNIC_MOV']))
+
+    def valores(self, dimensao):
+        """Valores distintos presentes em uma dimensão (opções do filtro)."""
+        return list(self._codigos[dimensao][0])
+
+    def mascara(self, filtros, periodo=None):
+        """Máscara booleana das linhas que atendem a todos os filtros.
+
+        `filtros` mapeia dimensão -> valores aceitos (listas vazias não filtram);
+        `periodo` é um par de datas (inclusivas) aplicado a DT_INTER.
+        """
+        mascara = np.ones(len(self.df), dtype=bool)
+        for dimensao, valores in filtros.items():
+            if not valores:
+                continue
+            categorias, codigos = self._codigos[dimensao]
+            posicoes = categorias.get_indexer(list(valores))
+            aceitos = np.zeros(len(categorias) + 1, dtype=bool)
+            aceitos[posicoes[posicoes >= 0]] = True
+            mascara &= aceitos[codigos]
+        if periodo is not None:
+            inicio, fim = periodo
+            limites = np.array(
+                [np.datetime64(inicio), np.datetime64(fim) + np.timedelta64(1, 'D')],
+                dtype=self._datas_ordenadas.dtype
+            )
+            i, j = np.searchsorted(self._datas_ordenadas, limites, side='left')
+            no_periodo = np.zeros(len(self.df), dtype=bool)
+            no_periodo[self._ordem_datas[i:j]] = True
+            mascara &= no_periodo
+        return mascara
+
+    def filtrar(self, filtros, periodo=None):
+        """Frame filtrado; sem filtros ativos devolve o próprio frame, sem cópia."""
+        if periodo is None and not any(filtros.values()):
+            return self.df
+        return self.df[self.mascara(filtros, periodo)]
@@ -0,0 +1,297 @@
+"""Gráficos do dashboard a partir das contagens já agregadas.
+
+Cada gráfico tem duas saídas:
+
+* `plot_*`: figura matplotlib/seaborn, rasterizada no servidor por `png`,
+  que fecha a figura logo após gravá-la (nenhuma figura fica registrada no
+  pyplot entre reruns ou sessões);
+* `vega_*`: especificação Vega-Lite (dict) com os poucos pontos da contagem,
+  desenhada no navegador, sem custo de renderização no servidor.
+
+As funções recebem apenas as contagens pequenas (dezenas de linhas), então
+podem ser guardadas em cache por valor.
+"""
+import io
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from sih.dataset import SIGLA_POR_CODIGO
+from sih.preprocessamento import FAIXAS_ETARIAS
+
+# Mesmos parâmetros que o st.pyplot usa ao rasterizar figuras
+OPCOES_PNG = {'format': 'png', 'bbox_inches': 'tight', 'dpi': 200}
+
+
+def png(fig):
+    """Rasteriza a figura em PNG e a fecha."""
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, **OPCOES_PNG)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def rotular_municipios(contagem_internacoes, municipios):
+    """Acrescenta o nome formatado ('Município - UF') à contagem por MUNIC_MOV.
+
+    `municipios` é a dimensão de `sih.dimensoes`: o nome vem pela chave inteira
+    de cada código (`take`), sem merge por texto.
+    """
+    top_municipios = contagem_internacoes.copy()
+    chaves = municipios.chaves(top_municipios['MUNIC_MOV'].astype(str))
+    top_municipios['Nome'] = municipios.valores('nome', chaves)
+
+    # Criando coluna com nome formatado
+    top_municipios['Municipios'] = (
+        top_municipios['Nome'].fillna('CNES Inválido') + ' - '
+        + top_municipios['MUNIC_MOV'].astype(str).str[:2].map(SIGLA_POR_CODIGO).fillna('')
+    )
+    return top_municipios[['Municipios', 'INTER']]
+
+
+# --- Figuras matplotlib/seaborn ---
+
+# Requisito 1: Quais cidades tem o maior numero de internações?
+def plot_top_municipios(top_municipios):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(data=top_municipios, x='INTER', y='Municipios', palette='viridis', ax=ax)
+    ax.set_title('Top 10 Municípios com Maior Nº de Internações (Local)', fontsize=14)
+    ax.set_xlabel('Total de Internações', fontsize=12)
+    ax.set_ylabel('Município de Estabelecimento', fontsize=12)
+    fig.tight_layout()
+    return fig
+
+# Requisito 2: Distribuição de internações por sexo
+def plot_distribuicao_sexo(sexo_counts):
+    fig, ax = plt.subplots(figsize=(6, 4))
+    sns.barplot(data=sexo_counts, x='Sexo', y='QTD_INTERNAÇÕES', palette='pastel', ax=ax)
+    ax.set_title('Distribuição de Internações por Sexo', fontsize=14)
+    ax.set_xlabel('Sexo do paciente', fontsize=12)
+    ax.set_ylabel('Número de Internações', fontsize=12)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%d', fontsize=10)
+    fig.tight_layout()
+    return fig
+
+# Requisito 3: Faixa etária mais frequente
+def plot_distribuicao_idade(faixa_counts):
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.barplot(data=faixa_counts, x='Faixa Etária', y='Internações', palette='crest', ax=ax)
+    ax.set_title('Distribuição de Internações por Faixa Etária', fontsize=14)
+    ax.set_xlabel('Faixa Etária', fontsize=12)
+    ax.set_ylabel('Número de Internações', fontsize=12)
+    ax.tick_params(axis='x', rotation=45)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%d', fontsize=10)
+    fig.tight_layout()
+    return fig
+
+# Requisito 7: Distribuição de pacientes por raça/cor
+def plot_distribuicao_raca(raca_counts):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(
+        data=raca_counts,
+        x='Percentual',
+        y='Raça/Cor',
+        palette='Set2',
+        order=raca_counts.sort_values('Total_Internacoes', ascending=False)['Raça/Cor'],
+        ax=ax
+    )
+    ax.set_title('Distribuição de Internações por Raça/Cor', fontsize=14)
+    ax.set_xlabel('Percentual de Internações (%)', fontsize=12)
+    ax.set_ylabel('Raça/Cor', fontsize=12)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f%%', fontsize=10, padding=5)
+    fig.tight_layout()
+    return fig
+
+# Requisito 8: Tempo médio de permanência por faixa etária
+def plot_tempo_medio_idade(tempo_medio_permanencia):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(
+        data=tempo_medio_permanencia,
+        x='Tempo_Medio_Permanencia_(dias)',
+        y='Faixa_Etaria',
+        palette='magma',
+        order=FAIXAS_ETARIAS,
+        ax=ax
+    )
+    ax.set_title('Tempo Médio de Permanência por Faixa Etária', fontsize=14)
+    ax.set_xlabel('Tempo médio de permanência (dias)', fontsize=12)
+    ax.set_ylabel('Faixa Etária', fontsize=12)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f', fontsize=10, padding=5)
+    fig.tight_layout()
+    return fig
+
+# Requisito 10: Distribuição por Capítulo Principal da CID-10
+def plot_distribuicao_cid10(frequencia_capitulos):
+    ordem = frequencia_capitulos.sort_values(by='Frequencia', ascending=False)['Capitulo_CID']
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.barplot(
+        data=frequencia_capitulos,
+        x='Percentual',
+        y='Capitulo_CID',
+        palette='Spectral',
+        order=ordem,
+        ax=ax
+    )
+    ax.set_title('Internações por Capítulo Principal da CID-10', fontsize=14)
+    ax.set_xlabel('Percentual (%)', fontsize=12)
+    ax.set_ylabel('Capítulo CID-10', fontsize=12)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f%%', fontsize=10, padding=5)
+    fig.tight_layout()
+    return fig
+
+# Requisito 10 (detalhamento): grupos de um capítulo ou categorias de um grupo
+TITULOS_DETALHE_CID10 = {
+    'Grupo_CID': ('Internações por Grupo da CID-10', 'Grupo CID-10'),
+    'Categoria_CID': ('Internações por Categoria da CID-10', 'Categoria CID-10'),
+}
+
+def plot_detalhe_cid10(frequencia_detalhe):
+    coluna = frequencia_detalhe.columns[0]
+    titulo, titulo_eixo = TITULOS_DETALHE_CID10[coluna]
+
+    fig, ax = plt.subplots(figsize=(10, max(4, 0.4 * len(frequencia_detalhe) + 1.5)))
+    sns.barplot(
+        data=frequencia_detalhe,
+        x='Percentual',
+        y=coluna,
+        palette='Spectral',
+        order=frequencia_detalhe[coluna],
+        ax=ax
+    )
+    ax.set_title(titulo, fontsize=14)
+    ax.set_xlabel('Percentual (%)', fontsize=12)
+    ax.set_ylabel(titulo_eixo, fontsize=12)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f%%', fontsize=10, padding=5)
+    fig.tight_layout()
+    return fig
+
+# Séries temporais (sih.series): o indicador e, se houver, média móvel e ano anterior
+def _linhas_serie(tabela):
+    return [coluna for coluna in tabela.columns[1:] if coluna != 'Variação (%)']
+
+def plot_serie(tabela):
+    fig, ax = plt.subplots(figsize=(12, 5))
+    for coluna in _linhas_serie(tabela):
+        ax.plot(tabela['Data'], tabela[coluna], label=coluna,
+                linestyle='--' if coluna == 'Ano anterior' else '-')
+    ax.set_title(f'{tabela.columns[1]} por Data de Internação', fontsize=14)
+    ax.set_xlabel('Data de internação', fontsize=12)
+    ax.set_ylabel(tabela.columns[1], fontsize=12)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+# --- Especificações Vega-Lite ---
+
+def _barras(dados, categoria, valor, titulo, titulo_categoria, titulo_valor,
+            horizontal=True, ordem=None, formato=',.0f', esquema='viridis'):
+    """Barras com rótulos de valor; sem `ordem` (lista de categorias), ordenadas pelo valor."""
+    eixo_valor, eixo_categoria = ('x', 'y') if horizontal else ('y', 'x')
+    codificacao = {
+        eixo_categoria: {'field': categoria, 'type': 'nominal', 'title': titulo_categoria,
+                         'sort': ordem if ordem is not None else f'-{eixo_valor}'},
+        eixo_valor: {'field': valor, 'type': 'quantitative', 'title': titulo_valor},
+    }
+    rotulo = {'type': 'text', 'dx': 4 if horizontal else 0, 'dy': 0 if horizontal else -6,
+              'align': 'left' if horizontal else 'center'}
+    return {
+        '$schema': 'https://vega.github.io/schema/vega-lite/v5.json',
+        'title': titulo,
+        'data': {'values': dados.dropna(subset=[valor]).to_dict(orient='records')},
+        'encoding': codificacao,
+        'layer': [
+            {'mark': {'type': 'bar'},
+             'encoding': {'color': {'field': categoria, 'type': 'nominal', 'legend': None,
+                                    'scale': {'scheme': esquema}, 'sort': ordem},
+                          'tooltip': [{'field': categoria, 'title': titulo_categoria},
+                                      {'field': valor, 'title': titulo_valor, 'format': formato}]}},
+            {'mark': rotulo, 'encoding': {'text': {'field': valor, 'format': formato}}},
+        ],
+    }
+
+
+def vega_top_municipios(top_municipios):
+    return _barras(top_municipios, 'Municipios', 'INTER', 'Top 10 Municípios com Maior Nº de Internações (Local)',
+                   'Município de Estabelecimento', 'Total de Internações')
+
+def vega_distribuicao_sexo(sexo_counts):
+    return _barras(sexo_counts, 'Sexo', 'QTD_INTERNAÇÕES', 'Distribuição de Internações por Sexo',
+                   'Sexo do paciente', 'Número de Internações', horizontal=False, esquema='pastel1')
+
+def vega_distribuicao_idade(faixa_counts):
+    return _barras(faixa_counts, 'Faixa Etária', 'Internações', 'Distribuição de Internações por Faixa Etária',
+                   'Faixa Etária', 'Número de Internações', horizontal=False, ordem=FAIXAS_ETARIAS,
+                   esquema='tealblues')
+
+def vega_distribuicao_raca(raca_counts):
+    return _barras(raca_counts, 'Raça/Cor', 'Percentual', 'Distribuição de Internações por Raça/Cor',
+                   'Raça/Cor', 'Percentual de Internações (%)', formato='.1f', esquema='set2')
+
+def vega_tempo_medio_idade(tempo_medio_permanencia):
+    return _barras(tempo_medio_permanencia, 'Faixa_Etaria', 'Tempo_Medio_Permanencia_(dias)',
+                   'Tempo Médio de Permanência por Faixa Etária', 'Faixa Etária',
+                   'Tempo médio de permanência (dias)', ordem=FAIXAS_ETARIAS, formato='.1f', esquema='magma')
+
+def vega_distribuicao_cid10(frequencia_capitulos):
+    return _barras(frequencia_capitulos, 'Capitulo_CID', 'Percentual', 'Internações por Capítulo Principal da CID-10',
+                   'Capítulo CID-10', 'Percentual (%)', formato='.1f', esquema='spectral')
+
+def vega_detalhe_cid10(frequencia_detalhe):
+    coluna = frequencia_detalhe.columns[0]
+    titulo, titulo_eixo = TITULOS_DETALHE_CID10[coluna]
+    return _barras(frequencia_detalhe, coluna, 'Percentual', titulo, titulo_eixo, 'Percentual (%)',
+                   formato='.1f', esquema='spectral')
+
+def vega_serie(tabela):
+    indicador = tabela.columns[1]
+    longa = (tabela.melt(id_vars='Data', value_vars=_linhas_serie(tabela), var_name='Série', value_name='Valor')
+             .dropna(subset=['Valor']))
+    longa['Data'] = longa['Data'].dt.strftime('%Y-%m-%d')
+    return {
+        '$schema': 'https://vega.github.io/schema/vega-lite/v5.json',
+        'title': f'{indicador} por Data de Internação',
+        'data': {'values': longa.to_dict(orient='records')},
+        'mark': {'type': 'line', 'point': len(tabela) <= 60},
+        'encoding': {
+            'x': {'field': 'Data', 'type': 'temporal', 'title': 'Data de internação'},
+            'y': {'field': 'Valor', 'type': 'quantitative', 'title': indicador},
+            'color': {'field': 'Série', 'type': 'nominal', 'sort': _linhas_serie(tabela)},
+            'strokeDash': {'field': 'Série', 'type': 'nominal', 'legend': None, 'sort': _linhas_serie(tabela)},
+            'tooltip': [{'field': 'Data', 'type': 'temporal', 'title': 'Data'},
+                        {'field': 'Série'},
+                        {'field': 'Valor', 'format': ',.2f'}],
+        },
+    }
+
+
+# Nome do gráfico -> (figura matplotlib, especificação Vega-Lite)
+GRAFICOS = {
+    'municipios': (plot_top_municipios, vega_top_municipios),
+    'sexo': (plot_distribuicao_sexo, vega_distribuicao_sexo),
+    'faixa_etaria': (plot_distribuicao_idade, vega_distribuicao_idade),
+    'raca': (plot_distribuicao_raca, vega_distribuicao_raca),
+    'tempo_medio_idade': (plot_tempo_medio_idade, vega_tempo_medio_idade),
+    'cid10': (plot_distribuicao_cid10, vega_distribuicao_cid10),
+    'cid10_detalhe': (plot_detalhe_cid10, vega_detalhe_cid10),
+    'serie': (plot_serie, vega_serie),
+}
+
+
+def renderizar_png(nome, agregado):
+    """PNG do gráfico `nome` (a figura é fechada antes de retornar)."""
+    return png(GRAFICOS[nome][0](agregado))
+
+
+def especificacao_vega(nome, agregado):
+    """Especificação Vega-Lite do gráfico `nome`."""
+    return GRAFICOS[nome][1](agregado)
@@ -0,0 +1,128 @@
+"""Perfil por hospital (CNES) e rankings de hospitais do dashboard.
+
+`perfil_hospitais` calcula, em uma passada vetorizada sobre os códigos
+inteiros do CNES, todas as medidas por hospital: internações, permanência,
+óbitos, UTI e valores. Os rankings `get_top_hospitais_*` são apenas seleções
+top-k sobre essa tabela, que também pode vir do cubo `hospital`.
+"""
+import numpy as np
+import pandas as pd
+
+from sih.preprocessamento import centavos
+
+# Mínimo de internações para um hospital entrar nos rankings de taxas
+MIN_INTERNACOES = 50
+
+# Medidas aditivas por hospital (os mesmos nomes do cubo `hospital`); valores em centavos
+MEDIDAS_HOSPITAL = [
+    'internacoes', 'dias_perm', 'n_dias_perm', 'obitos', 'n_morte',
+    'uti', 'n_marca_uti', 'val_tot', 'val_uti',
+]
+
+
+def perfil_hospitais(df):
+    """Tabela por CNES com as medidas de MEDIDAS_HOSPITAL e as taxas derivadas.
+
+    Cada medida é um `np.bincount` sobre os códigos das categorias de CNES:
+    sem lambdas, sem groupby por string e sem cópias do frame.
+    """
+    cnes = df['CNES']
+    if not isinstance(cnes.dtype, pd.CategoricalDtype):
+        cnes = cnes.astype('category')
+    categorias = cnes.cat.categories
+    codigos = cnes.cat.codes.to_numpy()
+    # CNES nulos (código -1) ficam de fora
+    com_cnes = codigos >= 0
+    codigos = codigos[com_cnes]
+
+    def coluna(serie):
+        return serie.to_numpy(dtype='float64', na_value=np.nan)[com_cnes]
+
+    def somar(pesos=None):
+        return np.bincount(codigos, weights=pesos, minlength=len(categorias))
+
+    dias_perm = coluna(df['DIAS_PERM'])
+    morte = coluna(df['MORTE'])
+    marca_uti = coluna(df['MARCA_UTI'])
+    val_tot = coluna(centavos(df['VAL_TOT']))
+    val_uti = coluna(centavos(df['VAL_UTI']))
+
+    perfil = pd.DataFrame({
+        'internacoes': somar(),
+        'dias_perm': somar(np.nan_to_num(dias_perm)),
+        'n_dias_perm': somar(~np.isnan(dias_perm)),
+        'obitos': somar(morte == 1),
+        'n_morte': somar(~np.isnan(morte)),
+        'uti': somar(marca_uti > 0),
+        'n_marca_uti': somar(~np.isnan(marca_uti)),
+        'val_tot': somar(np.nan_to_num(val_tot)),
+        'val_uti': somar(np.nan_to_num(val_uti)),
+    }, index=pd.Index(categorias, name='CNES'))
+    return completar_perfil(perfil)
+
+
+def completar_perfil(perfil):
+    """Descarta CNES vazios ou sem internações e acrescenta as taxas derivadas."""
+    perfil = perfil[(perfil['internacoes'] > 0) & (perfil.index.astype(str).str.len() > 0)].copy()
+    contagens = [m for m in MEDIDAS_HOSPITAL if m not in ('dias_perm', 'val_tot', 'val_uti')]
+    perfil[contagens] = perfil[contagens].astype('int64')
+    perfil['dias_perm'] = perfil['dias_perm'].astype('float64')
+    perfil[['val_tot', 'val_uti']] = perfil[['val_tot', 'val_uti']].astype('float64') / 100
+    perfil['tempo_medio'] = perfil['dias_perm'] / perfil['n_dias_perm'].where(perfil['n_dias_perm'] > 0)
+    perfil['taxa_mortalidade'] = perfil['obitos'] / perfil['n_morte'].where(perfil['n_morte'] > 0) * 100
+    perfil['proporcao_uti'] = perfil['uti'] / perfil['n_marca_uti'].where(perfil['n_marca_uti'] > 0) * 100
+    return perfil
+
+
+def nomear_hospitais(tabela, cnes):
+    """Insere o nome do estabelecimento (dimensão `cnes` de `sih.dimensoes`) após a coluna CNES.
+
+    Sem cadastro de estabelecimentos (dimensão vazia), a tabela volta inalterada.
+    """
+    if not len(cnes):
+        return tabela
+    tabela = tabela.copy()
+    tabela.insert(tabela.columns.get_loc('CNES') + 1, 'Hospital',
+                  cnes.valores('nome', cnes.chaves(tabela['CNES'].astype(str))))
+    return tabela
+
+
+# --- Rankings (seleções top-k sobre o perfil) ---
+
+def maiores(valores, k=10):
+    """Os k maiores valores (sem nulos) de uma série indexada por código, em ordem decrescente.
+
+    Empates são desfeitos pelo código (crescente): o perfil calculado dos
+    registros, dos lotes ou dos cubos tem os hospitais em ordens diferentes,
+    e o ranking precisa ser o mesmo em todos eles.
+    """
+    valores = valores[valores.notna()]
+    ordem = np.lexsort((valores.index.astype(str), -valores.to_numpy(dtype='float64')))
+    return valores.iloc[ordem[:k]]
+
+
+# 11: Top 10 Hospitais por Número de Internações
+def get_top_hospitais_internacoes(perfil, k=10):
+    frequencia_hospitais = maiores(perfil['internacoes'], k).reset_index()
+    frequencia_hospitais.columns = ['CNES', 'Total_Internacoes']
+    return frequencia_hospitais
+
+# 12: Top 10 Hospitais por Tempo Médio de Permanência
+def get_top_hospitais_tempo_medio(perfil, k=10):
+    tempo_medio_hospitais = maiores(perfil['tempo_medio'], k).reset_index()
+    tempo_medio_hospitais.columns = ['CNES', 'Tempo_Medio_Permanencia_(dias)']
+    return tempo_medio_hospitais
+
+# 13: Top 10 Hospitais por Taxa de Mortalidade
+def get_top_hospitais_mortalidade(perfil, k=10, min_internacoes=MIN_INTERNACOES):
+    elegiveis = perfil[perfil['n_morte'] >= min_internacoes]
+    mortalidade_hosp = elegiveis.loc[maiores(elegiveis['taxa_mortalidade'], k).index, ['n_morte', 'obitos', 'taxa_mortalidade']].reset_index()
+    mortalidade_hosp.columns = ['CNES', 'Total_Internacoes', 'Total_Obitos', 'Taxa_Mortalidade_(%)']
+    return mortalidade_hosp
+
+# 15: Top 10 Hospitais por Proporção de Internações em UTI
+def get_top_hospitais_uti(perfil, k=10, min_internacoes=MIN_INTERNACOES):
+    elegiveis = perfil[perfil['n_marca_uti'] >= min_internacoes]
+    proporcao_uti_hosp = elegiveis.loc[maiores(elegiveis['proporcao_uti'], k).index, ['n_marca_uti', 'uti', 'proporcao_uti']].reset_index()
+    proporcao_uti_hosp.columns = ['CNES', 'Total_Internacoes', 'Total_UTI', 'Proporcao_UTI_(%)']
+    return proporcao_uti_hosp
@@ -0,0 +1,105 @@
+"""Indicadores do dashboard calculados sobre os registros de AIH pré-processados.
+
+Cada função recebe o frame de `preprocessar` (já filtrado) e devolve o mesmo
+formato do método de mesmo nome de `sih.cubos.CubosSelecao`, que calcula o
+indicador a partir dos cubos. Não dependem do Streamlit.
+"""
+from sih.cid10 import contagens_categorias, detalhar
+from sih.hospitais import maiores
+from sih.preprocessamento import MAP_SEXO, centavos
+
+# --- Métricas gerais ---
+
+# Requisito 5: Percentual de óbitos
+def calcular_percentual_obitos(df_bahia):
+    total_internacoes = len(df_bahia)
+    total_obitos = df_bahia[df_bahia['MORTE'] == 1].shape[0]
+    percentual_obitos = (total_obitos / total_internacoes) * 100 if total_internacoes > 0 else 0
+    return total_internacoes, total_obitos, percentual_obitos
+
+# Requisitos 16 e 17: Custo total e custo médio por internação
+def calcular_custos(df_bahia):
+    valores = centavos(df_bahia['VAL_TOT'])
+    valor_total = valores.sum() / 100
+    n_valores = valores.count()
+    return valor_total, (valor_total / n_valores if n_valores > 0 else float('nan'))
+
+# Requisito 6: Proporção de gestantes de risco
+def calcular_proporcao_gestrisco(df_bahia):
+    df_obstetricas_bahia = df_bahia[df_bahia['ESPEC'] == 2]
+    total_obstetricas = len(df_obstetricas_bahia)
+    total_gestrisco = df_obstetricas_bahia[df_obstetricas_bahia['GESTRISCO'] == 1].shape[0]
+    proporcao_gestrisco = (total_gestrisco / total_obstetricas) * 100 if total_obstetricas > 0 else 0
+    return total_obstetricas, total_gestrisco, proporcao_gestrisco
+
+# 18: Valor Médio das Internações: Óbito vs. Não Óbito
+def calcular_valor_medio_obito(df_bahia):
+    # Médias a partir das somas exatas em centavos, as mesmas guardadas nos cubos
+    somas = centavos(df_bahia['VAL_TOT']).groupby(df_bahia['Status_Obito'], observed=True).agg(['sum', 'count'])
+    valor_medio_obito = (
+        (somas['sum'] / 100 / somas['count'])
+        .rename('Valor_Medio_Internacao')
+        .reset_index()
+        .sort_values(by='Valor_Medio_Internacao', ascending=False)
+    )
+    valor_medio_obito.columns = ['Status', 'Valor_Medio_Internacao']
+    return valor_medio_obito
+
+
+# --- Distribuições (contagens usadas pelos gráficos de sih.graficos) ---
+
+# Requisito 1: Quais cidades tem o maior numero de internações?
+def contar_municipios(df_bahia):
+    # Contagem das 10 cidades com mais internações. MUNIC_MOV é categórico: value_counts
+    # traz todas as categorias, e as sem internações (fora dos filtros) não entram, como nos cubos
+    contagem = df_bahia['MUNIC_MOV'].value_counts()
+    contagem_internacoes = maiores(contagem[contagem > 0], 10).reset_index()
+    contagem_internacoes.columns = ['MUNIC_MOV', 'INTER']
+    return contagem_internacoes
+
+# Requisito 2: Distribuição de internações por sexo
+def contar_sexo(df_bahia):
+    sexo_counts = df_bahia['SEXO'].map(MAP_SEXO).value_counts().reset_index()
+    sexo_counts.columns = ['Sexo', 'QTD_INTERNAÇÕES']
+    return sexo_counts
+
+# Requisito 3: Faixa etária mais frequente
+def contar_faixa_etaria(df_bahia):
+    faixa_counts = df_bahia['faixa_etaria'].value_counts().sort_index().reset_index()
+    faixa_counts.columns = ['Faixa Etária', 'Internações']
+    return faixa_counts
+
+# Requisito 7: Distribuição de pacientes por raça/cor
+def contar_raca(df_bahia):
+    raca_counts = df_bahia['Raça/Cor'].value_counts()
+    raca_counts = raca_counts[raca_counts > 0].reset_index()
+    raca_counts.columns = ['Raça/Cor', 'Total_Internacoes']
+    total_internacoes_bahia = raca_counts['Total_Internacoes'].sum()
+    raca_counts['Percentual'] = (raca_counts['Total_Internacoes'] / total_internacoes_bahia) * 100
+    return raca_counts
+
+# Requisito 8: Tempo médio de permanência por faixa etária
+def calcular_tempo_medio_idade(df_bahia):
+    # groupby ignora faixas nulas e mean ignora DIAS_PERM nulos
+    tempo_medio_permanencia = (
+        df_bahia.groupby('faixa_etaria', observed=True)['DIAS_PERM']
+        .mean()
+        .dropna()
+        .reset_index()
+    )
+    tempo_medio_permanencia.columns = ['Faixa_Etaria', 'Tempo_Medio_Permanencia_(dias)']
+    return tempo_medio_permanencia
+
+# Requisito 10: Distribuição por Capítulo Principal da CID-10
+def contar_capitulos_cid10(df_bahia):
+    # capitulo_cid é categórico (calculado por `tipar`): a contagem é sobre os códigos inteiros
+    frequencia_capitulos = df_bahia['capitulo_cid'].value_counts()
+    frequencia_capitulos = frequencia_capitulos[frequencia_capitulos > 0].reset_index()
+    frequencia_capitulos.columns = ['Capitulo_CID', 'Frequencia']
+    total_internacoes = frequencia_capitulos['Frequencia'].sum()
+    frequencia_capitulos['Percentual'] = (frequencia_capitulos['Frequencia'] / total_internacoes) * 100
+    return frequencia_capitulos
+
+# Requisito 10 (detalhamento): grupos de um capítulo e categorias de 3 caracteres de um grupo
+def detalhar_cid10(df_bahia, capitulo, grupo=None):
+    return detalhar(contagens_categorias(df_bahia['categoria_cid']), capitulo, grupo)
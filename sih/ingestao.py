@@ -0,0 +1,327 @@
+"""Ingestão dos arquivos RD brutos (CSV, DBF ou DBC do DataSUS) no layout parquet.
+
+Cada arquivo é lido em lotes de tamanho limitado, tipado e limpo por
+`tipar` (as mesmas regras do dashboard) e gravado em
+`{saida}/uf=XX/ano=AAAA/mes=M/{arquivo}.parquet`, com row groups de tamanho
+fixo, compressão zstd e codificação em dicionário. A memória usada não depende
+do tamanho do arquivo: apenas um lote e um row group por partição ficam em
+memória. Vários arquivos são processados em paralelo por um pool de processos
+(`python -m sih.ingestao`).
+
+A competência vem do nome do arquivo (`RDBA2401.csv`, `RD202401.csv`) ou,
+quando ele não segue o padrão, das colunas ANO_CMPT/MES_CMPT. Arquivos
+nacionais são separados por UF pelo prefixo de UF_ZI.
+"""
+import argparse
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from sih.dataset import COLUNAS_INTERESSE, UFS, SIGLA_POR_CODIGO
+from sih.preprocessamento import COLUNAS_CID, tipar
+
+EXTENSOES = ('.csv', '.dbf', '.dbc')
+
+# Linhas por row group do parquet (e por lote lido dos arquivos DBF)
+LINHAS_POR_GRUPO = 256 * 1024
+
+# Bytes lidos de cada vez dos arquivos CSV (o leitor do Arrow antecipa dezenas de blocos)
+BLOCO_CSV = 4 * 1024 * 1024
+
+# Colunas de competência dos arquivos RD, usadas quando o nome do arquivo não a informa
+COLUNAS_COMPETENCIA = ['ANO_CMPT', 'MES_CMPT']
+
+_PADRAO_UF = re.compile(r'^RD(?P<uf>[A-Z]{2})(?P<ano>\d{2})(?P<mes>\d{2})$', re.IGNORECASE)
+_PADRAO_NACIONAL = re.compile(r'^RD(?P<ano>\d{4})(?P<mes>\d{2})$', re.IGNORECASE)
+
+
+def particao_do_nome(caminho):
+    """(uf, competência AAAAMM) indicados pelo nome do arquivo; None no que faltar."""
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    encontrado = _PADRAO_UF.match(nome)
+    if encontrado and encontrado['uf'].upper() in UFS:
+        return encontrado['uf'].upper(), (2000 + int(encontrado['ano'])) * 100 + int(encontrado['mes'])
+    encontrado = _PADRAO_NACIONAL.match(nome)
+    if encontrado:
+        return None, int(encontrado['ano']) * 100 + int(encontrado['mes'])
+    return None, None
+
+
+# --- Leitura em lotes ---
+
+def _ler_csv(caminho, colunas, separador, encoding, bloco):
+    """Lotes de um CSV com todas as colunas como texto (a tipagem fica com `tipar`)."""
+    with open(caminho, encoding=encoding, newline='') as arquivo:
+        cabecalho = next(iter(arquivo), '').rstrip('\r\n')
+    nomes = [nome.strip().strip('"') for nome in cabecalho.split(separador)]
+    selecionadas = [nome for nome in nomes if colunas is None or nome in colunas]
+    leitor = pacsv.open_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(block_size=bloco, encoding=encoding),
+        parse_options=pacsv.ParseOptions(delimiter=separador),
+        convert_options=pacsv.ConvertOptions(
+            column_types={nome: pa.string() for nome in selecionadas},
+            include_columns=selecionadas,
+            strings_can_be_null=True,
+        ),
+    )
+    for lote in leitor:
+        yield pa.Table.from_batches([lote])
+
+
+def _texto_dbf(valor):
+    """Valor de um campo DBF como texto, no mesmo formato do CSV."""
+    if valor is None:
+        return None
+    # Campos D vêm do dbfread como datetime.date: AAAAMMDD, o formato das datas RD
+    if isinstance(valor, date):
+        return valor.strftime('%Y%m%d')
+    return str(valor)
+
+
+def _ler_dbf(caminho, colunas, encoding, linhas):
+    """Lotes de um DBF, registro a registro (requer o pacote opcional `dbfread`)."""
+    try:
+        from dbfread import DBF
+    except ImportError as erro:
+        raise ImportError("A leitura de arquivos .dbf requer o pacote 'dbfread' (pip install dbfread)") from erro
+    tabela = DBF(caminho, encoding=encoding, load=False, char_decode_errors='replace')
+    nomes = [nome for nome in tabela.field_names if colunas is None or nome in colunas]
+    lote = {nome: [] for nome in nomes}
+    for registro in tabela:
+        for nome in nomes:
+            lote[nome].append(_texto_dbf(registro[nome]))
+        if len(lote[nomes[0]]) >= linhas:
+            yield pa.table({nome: pa.array(valores, pa.string()) for nome, valores in lote.items()})
+            lote = {nome: [] for nome in nomes}
+    if nomes and lote[nomes[0]]:
+        yield pa.table({nome: pa.array(valores, pa.string()) for nome, valores in lote.items()})
+
+
+def _ler_dbc(caminho, colunas, encoding, linhas):
+    """Lotes de um DBC do DataSUS: descompacta para um DBF temporário e o lê em lotes."""
+    try:
+        from datasus_dbc import decompress
+    except ImportError as erro:
+        raise ImportError("A leitura de arquivos .dbc requer o pacote 'datasus-dbc' (pip install datasus-dbc)") from erro
+    with tempfile.TemporaryDirectory() as temporario:
+        dbf = os.path.join(temporario, os.path.splitext(os.path.basename(caminho))[0] + '.dbf')
+        decompress(caminho, dbf)
+        yield from _ler_dbf(dbf, colunas, encoding, linhas)
+
+
+def ler_lotes(caminho, colunas=None, separador=',', encoding='latin-1',
+              linhas=LINHAS_POR_GRUPO, bloco=BLOCO_CSV):
+    """Lotes (`pyarrow.Table`, colunas como texto) de um arquivo RD bruto."""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == '.csv':
+        return _ler_csv(caminho, colunas, separador, encoding, bloco)
+    if extensao == '.dbf':
+        return _ler_dbf(caminho, colunas, encoding, linhas)
+    if extensao == '.dbc':
+        return _ler_dbc(caminho, colunas, encoding, linhas)
+    raise ValueError(f"Formato não suportado: '{caminho}' (use {', '.join(EXTENSOES)})")
+
+
+# --- Gravação particionada ---
+
+def _para_gravacao(tabela):
+    """Dicionários viram texto: o parquet recodifica por row group e o filtro de UF_ZI por faixa continua valendo."""
+    # As colunas CID derivadas não são gravadas: o arquivo mantém o layout RD e `tipar` as recalcula
+    tabela = tabela.drop_columns([nome for nome in COLUNAS_CID if nome in tabela.column_names])
+    colunas = [
+        pc.cast(coluna, coluna.type.value_type) if pa.types.is_dictionary(coluna.type) else coluna
+        for coluna in tabela.columns
+    ]
+    return pa.table(colunas, names=tabela.column_names)
+
+
+def _separar(tabela, uf, competencia):
+    """Divide um lote tipado em {(uf, competência): tabela}."""
+    if uf is not None and competencia is not None:
+        return {(uf, competencia): tabela}
+
+    chaves = []
+    if uf is None:
+        codigo_uf = pc.utf8_slice_codeunits(tabela['UF_ZI'], 0, 2)
+        chaves.append(pc.fill_null(codigo_uf, ''))
+    if competencia is None:
+        for nome in COLUNAS_COMPETENCIA:
+            chaves.append(pc.fill_null(pc.utf8_trim_whitespace(pc.cast(tabela[nome], pa.string())), ''))
+    chave = chaves[0] if len(chaves) == 1 else pc.binary_join_element_wise(*chaves, '|')
+
+    partes = {}
+    for valor in pc.unique(chave).to_pylist():
+        campos = valor.split('|')
+        uf_parte = uf if uf is not None else SIGLA_POR_CODIGO.get(campos.pop(0))
+        if competencia is not None:
+            competencia_parte = competencia
+        elif all(campo.isdigit() for campo in campos):
+            competencia_parte = int(campos[0]) * 100 + int(campos[1])
+        else:
+            competencia_parte = None
+        # Linhas sem UF_ZI válido ou sem competência não têm partição
+        if uf_parte is None or competencia_parte is None:
+            continue
+        partes[(uf_parte, competencia_parte)] = tabela.filter(pc.equal(chave, valor))
+    return partes
+
+
+class _Particao:
+    """Arquivo parquet de uma partição, gravado em row groups de tamanho fixo."""
+
+    def __init__(self, destino, linhas_por_grupo):
+        self.destino = destino
+        self.temporario = destino + '.tmp'
+        self.linhas_por_grupo = linhas_por_grupo
+        self.pendentes = []
+        self.n_pendentes = 0
+        self.escritor = None
+        self.linhas = 0
+
+    def adicionar(self, tabela):
+        self.pendentes.append(tabela)
+        self.n_pendentes += tabela.num_rows
+        self.linhas += tabela.num_rows
+        if self.n_pendentes >= self.linhas_por_grupo:
+            self._gravar(completo=False)
+
+    def _gravar(self, completo):
+        if not self.pendentes:
+            return
+        tabela = pa.concat_tables(self.pendentes)
+        if self.escritor is None:
+            os.makedirs(os.path.dirname(self.destino), exist_ok=True)
+            self.escritor = pq.ParquetWriter(
+                self.temporario, tabela.schema, compression='zstd', use_dictionary=True,
+            )
+        # Só grupos cheios são gravados; o resto espera o próximo lote (ou o fechamento)
+        cheios = tabela.num_rows if completo else tabela.num_rows - tabela.num_rows % self.linhas_por_grupo
+        if cheios:
+            self.escritor.write_table(tabela.slice(0, cheios), row_group_size=self.linhas_por_grupo)
+        resto = tabela.slice(cheios)
+        self.pendentes = [resto] if resto.num_rows else []
+        self.n_pendentes = resto.num_rows
+
+    def fechar(self):
+        self._gravar(completo=True)
+        if self.escritor is not None:
+            self.escritor.close()
+            # Troca atômica: um arquivo incompleto nunca aparece como partição
+            os.replace(self.temporario, self.destino)
+
+    def descartar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+            os.remove(self.temporario)
+
+
+def ingerir_arquivo(caminho, saida, todas_colunas=False, separador=',', encoding='latin-1',
+                    linhas_por_grupo=LINHAS_POR_GRUPO, bloco=BLOCO_CSV):
+    """Ingere um arquivo RD bruto em `saida` e retorna um resumo da ingestão."""
+    uf, competencia = particao_do_nome(caminho)
+    colunas = None
+    if not todas_colunas:
+        colunas = set(COLUNAS_INTERESSE)
+        if competencia is None:
+            colunas.update(COLUNAS_COMPETENCIA)
+
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    particoes = {}
+    lidas = 0
+    try:
+        for lote in ler_lotes(caminho, colunas, separador, encoding, linhas_por_grupo, bloco):
+            lidas += lote.num_rows
+            if competencia is None and not set(COLUNAS_COMPETENCIA) <= set(lote.column_names):
+                raise ValueError(
+                    f"'{caminho}': nome fora do padrão RDUFAAMM/RDAAAAMM e sem colunas {COLUNAS_COMPETENCIA}"
+                )
+            tabela = _para_gravacao(tipar(lote))
+            for (uf_parte, competencia_parte), parte in _separar(tabela, uf, competencia).items():
+                chave = (uf_parte, competencia_parte)
+                if chave not in particoes:
+                    destino = os.path.join(
+                        saida, f'uf={uf_parte}', f'ano={competencia_parte // 100}',
+                        f'mes={competencia_parte % 100}', f'{nome}.parquet'
+                    )
+                    particoes[chave] = _Particao(destino, linhas_por_grupo)
+                particoes[chave].adicionar(parte)
+    except BaseException:
+        for particao in particoes.values():
+            particao.descartar()
+        raise
+
+    for particao in particoes.values():
+        particao.fechar()
+    return {
+        'arquivo': caminho,
+        'linhas_lidas': lidas,
+        'linhas_gravadas': sum(p.linhas for p in particoes.values()),
+        'particoes': sorted(f'{uf_parte}/{competencia_parte}' for uf_parte, competencia_parte in particoes),
+    }
+
+
+def listar_entradas(entradas):
+    """Arquivos brutos informados diretamente ou contidos nos diretórios informados."""
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, diretorios, nomes in os.walk(entrada):
+                diretorios.sort()
+                arquivos.extend(os.path.join(raiz, nome) for nome in sorted(nomes)
+                                if nome.lower().endswith(EXTENSOES))
+        else:
+            arquivos.append(entrada)
+    return arquivos
+
+
+def ingerir(entradas, saida, processos=None, **opcoes):
+    """Ingere os arquivos em paralelo (um por processo) e gera os resumos à medida que terminam."""
+    arquivos = listar_entradas(entradas)
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum arquivo {', '.join(EXTENSOES)} em {list(entradas)}")
+    processos = min(processos or os.cpu_count() or 1, len(arquivos))
+    if processos == 1:
+        for arquivo in arquivos:
+            yield ingerir_arquivo(arquivo, saida, **opcoes)
+        return
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [pool.submit(ingerir_arquivo, arquivo, saida, **opcoes) for arquivo in arquivos]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Converte arquivos RD brutos (.csv, .dbf, .dbc) em parquet particionado por UF e competência."
+    )
+    parser.add_argument('entradas', nargs='+', help="arquivos RD ou diretórios que os contêm")
+    parser.add_argument('--saida', default='datasets', help="diretório de destino (layout uf=/ano=/mes=)")
+    parser.add_argument('--processos', type=int, default=None, help="arquivos processados em paralelo (padrão: núcleos)")
+    parser.add_argument('--linhas-por-grupo', type=int, default=LINHAS_POR_GRUPO, help="linhas por row group do parquet")
+    parser.add_argument('--bloco-mb', type=int, default=BLOCO_CSV // 2**20, help="MB lidos de cada vez dos CSV")
+    parser.add_argument('--separador', default=',', help="separador dos CSV")
+    parser.add_argument('--encoding', default='latin-1', help="codificação dos CSV/DBF")
+    parser.add_argument('--todas-colunas', action='store_true', help="grava todas as colunas, não só as usadas pelo dashboard")
+    args = parser.parse_args(argv)
+
+    resumos = ingerir(
+        args.entradas, args.saida, processos=args.processos, todas_colunas=args.todas_colunas,
+        separador=args.separador, encoding=args.encoding,
+        linhas_por_grupo=args.linhas_por_grupo, bloco=args.bloco_mb * 2**20,
+    )
+    for resumo in resumos:
+        descartadas = resumo['linhas_lidas'] - resumo['linhas_gravadas']
+        print(f"{resumo['arquivo']}: {resumo['linhas_gravadas']} linhas gravadas "
+              f"({descartadas} descartadas) em {', '.join(resumo['particoes']) or 'nenhuma partição'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Instrumentação do dashboard por seção: tempos, linhas varridas e cache.
+
+Cada seção é medida com `Instrumentacao.secao` em duas etapas, cálculo
+(agregações) e renderização (figuras, tabelas e elementos do Streamlit).
+As funções em cache chamam `anotar_falha` no próprio corpo, que só roda
+quando o cache não tem o resultado, informando as linhas que varreram: uma
+seção sem falhas foi servida inteiramente do cache. Cada medição concluída
+vai para o logger `sih.instrumentacao`.
+"""
+import contextvars
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pandas as pd
+
+LOGGER = logging.getLogger(__name__)
+
+ETAPAS = ['calculo', 'renderizacao']
+
+# Medição da seção em curso (uma por thread de execução do script)
+_MEDICAO = contextvars.ContextVar('medicao', default=None)
+
+
+class Medicao:
+    """Medição de uma execução de seção: segundos por etapa, linhas varridas e falhas de cache."""
+
+    def __init__(self, secao):
+        self.secao = secao
+        self.inicio = time.time()
+        self.segundos = dict.fromkeys(ETAPAS, 0.0)
+        self.linhas = 0
+        self.falhas = []
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.segundos[nome] += time.perf_counter() - inicio
+
+    def cache(self):
+        """'acerto' se nada foi recalculado; senão, as funções que falharam no cache."""
+        if not self.falhas:
+            return 'acerto'
+        falhas = [nome if vezes == 1 else f'{nome} x{vezes}' for nome, vezes in Counter(self.falhas).items()]
+        return f"falha ({', '.join(falhas)})"
+
+    def registro(self):
+        return {
+            'Seção': self.secao,
+            'Cálculo (ms)': round(self.segundos['calculo'] * 1000, 1),
+            'Renderização (ms)': round(self.segundos['renderizacao'] * 1000, 1),
+            'Linhas varridas': self.linhas,
+            'Cache': self.cache(),
+            'Horário': time.strftime('%H:%M:%S', time.localtime(self.inicio)),
+        }
+
+
+class Instrumentacao:
+    """Última medição de cada seção (guardada entre reruns, ex.: em `st.session_state`)."""
+
+    def __init__(self):
+        self.medicoes = {}
+
+    @contextmanager
+    def secao(self, nome):
+        """Mede a seção `nome`; as falhas de cache anotadas dentro do bloco são atribuídas a ela."""
+        medicao = Medicao(nome)
+        token = _MEDICAO.set(medicao)
+        try:
+            yield medicao
+        finally:
+            _MEDICAO.reset(token)
+            self.medicoes[nome] = medicao
+            LOGGER.info(
+                "secao=%s calculo_ms=%.1f renderizacao_ms=%.1f linhas=%d cache=%s",
+                nome, medicao.segundos['calculo'] * 1000, medicao.segundos['renderizacao'] * 1000,
+                medicao.linhas, medicao.cache(),
+            )
+
+    def tabela(self):
+        """Medições na ordem em que as seções foram medidas pela primeira vez."""
+        return pd.DataFrame([medicao.registro() for medicao in self.medicoes.values()])
+
+
+def anotar_falha(funcao, linhas=0):
+    """Registra na seção em curso uma falha de cache de `funcao`, que varreu `linhas` linhas."""
+    medicao = _MEDICAO.get()
+    if medicao is not None:
+        medicao.falhas.append(funcao)
+        medicao.linhas += linhas
+
+
+def configurar_log(nivel=logging.INFO):
+    """Envia as medições para a saída de erro do processo (uma única vez)."""
+    if not LOGGER.handlers:
+        saida = logging.StreamHandler()
+        saida.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        LOGGER.addHandler(saida)
+    LOGGER.setLevel(nivel)
@@ -0,0 +1,120 @@
+"""Execução em lotes (out-of-core) dos indicadores do dashboard.
+
+Para seleções maiores que a memória (vários anos, o país inteiro), os
+registros de AIH nunca são carregados de uma vez: cada lote de linhas dos
+parquet é pré-processado, filtrado e agregado nos cubos de `sih.cubos`, e o
+cubo parcial é somado ao acumulado. As medidas dos cubos são contagens e
+somas exatas (valores em centavos, permanência em dias inteiros), então os
+indicadores do `CubosSelecao` resultante coincidem com os calculados sobre
+o frame inteiro. A memória ocupada depende do tamanho do lote e do número
+de combinações das dimensões dos cubos, não do número de internações.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sih.cubos import DIMENSOES, CubosSelecao, agregar
+from sih.filtros import IndiceFiltros
+from sih.preprocessamento import preprocessar, tipar
+from sih.series import serializar
+
+LINHAS_POR_LOTE = 256 * 1024
+
+# Chaves comuns a todos os cubos
+CHAVES = ['uf', 'ano', 'mes']
+
+
+def combinar(parciais):
+    """Soma uma lista de cubos parciais ({nome: cubo}) em um único conjunto de cubos."""
+    cubos = {}
+    for nome, dimensoes in DIMENSOES.items():
+        chaves = CHAVES + dimensoes
+        # Categorias diferentes entre lotes viram valores simples na concatenação
+        partes = pd.concat([parcial[nome] for parcial in parciais], ignore_index=True)
+        medidas = [coluna for coluna in partes.columns if coluna not in chaves]
+        cubos[nome] = (
+            partes.groupby(chaves, dropna=False, observed=True, sort=False)[medidas]
+            .sum()
+            .reset_index()
+        )
+    return cubos
+
+
+def somar_lotes(lotes, filtros=None, periodo=None, dimensoes=None):
+    """Cubos ({nome: cubo}) de uma sequência de `pyarrow.RecordBatch` brutos; None se não há lotes.
+
+    `filtros` e `periodo` têm o mesmo significado de `IndiceFiltros.mascara`;
+    `dimensoes` habilita o filtro por região de saúde.
+    """
+    filtros = filtros or {}
+    filtrar = periodo is not None or any(filtros.values())
+    # Os parciais são somados ao acumulado quando, juntos, passam do tamanho dele:
+    # cada linha é recombinada poucas vezes e a memória continua limitada
+    parciais, linhas_pendentes, linhas_acumuladas = [], 0, 0
+    for lote in lotes:
+        df = preprocessar(pa.Table.from_batches([lote]))
+        if filtrar:
+            df = IndiceFiltros(df, dimensoes).filtrar(filtros, periodo)
+        if df.empty and parciais:
+            continue
+        parciais.append(agregar(df))
+        linhas_pendentes += sum(len(cubo) for cubo in parciais[-1].values())
+        if len(parciais) > 1 and linhas_pendentes >= linhas_acumuladas:
+            parciais = [combinar(parciais)]
+            linhas_acumuladas = sum(len(cubo) for cubo in parciais[0].values())
+            linhas_pendentes = 0
+    if not parciais:
+        return None
+    return combinar(parciais) if len(parciais) > 1 else parciais[0]
+
+
+def selecionar(cubos):
+    """`CubosSelecao` dos cubos somados ({nome: cubo})."""
+    if cubos is None:
+        raise ValueError("A seleção não tem nenhum lote de registros")
+    return CubosSelecao(cubos['hospital'], cubos['perfil'], cubos['cid'])
+
+
+def agregar_lotes(lotes, filtros=None, periodo=None, dimensoes=None):
+    """`CubosSelecao` de uma sequência de `pyarrow.RecordBatch` brutos, somando os cubos de cada lote."""
+    return selecionar(somar_lotes(lotes, filtros, periodo, dimensoes))
+
+
+def calcular_em_lotes(dataset, ufs, competencias, filtros=None, periodo=None, linhas_por_lote=LINHAS_POR_LOTE,
+                      dimensoes=None):
+    """Indicadores (`CubosSelecao`) de uma seleção do `DatasetRD`, lida em lotes."""
+    return agregar_lotes(dataset.lotes(ufs, competencias, linhas_por_lote), filtros, periodo, dimensoes)
+
+
+def series_em_lotes(dataset, ufs, competencias, filtros=None, periodo=None, linhas_por_lote=LINHAS_POR_LOTE,
+                    dimensoes=None):
+    """Séries diárias (`sih.series.serializar`) de uma seleção filtrada do `DatasetRD`, lida em lotes.
+
+    As séries de lotes diferentes podem repetir dimensão, chave e dia; as somas por
+    período (`sih.series.somar`) as juntam.
+    """
+    filtros = filtros or {}
+    filtrar = periodo is not None or any(filtros.values())
+    partes = []
+    for lote in dataset.lotes(ufs, competencias, linhas_por_lote):
+        df = preprocessar(pa.Table.from_batches([lote]))
+        if filtrar:
+            df = IndiceFiltros(df, dimensoes).filtrar(filtros, periodo)
+        if not df.empty:
+            partes.append(serializar(df))
+    if not partes:
+        raise ValueError("A seleção não tem nenhum lote de registros")
+    return pa.concat_tables(partes)
+
+
+def valores_em_lotes(dataset, ufs, competencias, coluna, linhas_por_lote=LINHAS_POR_LOTE):
+    """Valores distintos (ordenados) de uma coluna de código nas internações válidas da seleção.
+
+    Lê apenas a coluna e as datas usadas pela limpeza de `tipar`.
+    """
+    valores = set()
+    for lote in dataset.lotes(ufs, competencias, linhas_por_lote, colunas=[coluna, 'DT_INTER', 'DT_SAIDA']):
+        tipada = tipar(pa.Table.from_batches([lote]))
+        valores.update(pc.unique(pc.cast(tipada[coluna], pa.string())).to_pylist())
+    valores.discard(None)
+    return sorted(valores)
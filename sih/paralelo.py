@@ -0,0 +1,128 @@
+"""Cálculo por arquivo da seleção (UF x competência ou nacional) em paralelo.
+
+Cada arquivo da seleção é uma tarefa independente e os resultados são
+juntados ao final, em ordem: um arquivo por UF e competência é uma tarefa
+daquela UF; um arquivo nacional é uma única tarefa com todas as UFs pedidas
+que ele cobre, lido uma só vez (as linhas não vêm ordenadas por UF_ZI, e
+uma tarefa por UF varreria o arquivo inteiro para cada uma).
+
+* `tipar_em_paralelo`: leitura e limpeza (`tipar`) da seleção para o modo em
+  memória. Leitura do parquet e `tipar` são kernels do Arrow, que liberam o
+  GIL, então threads bastam e as tabelas limpas voltam sem cópia.
+* `calcular_em_paralelo`: indicadores (`CubosSelecao`) da seleção, agregados
+  em lotes nos cubos de `sih.cubos`. A montagem do frame e o groupby do
+  pandas seguram o GIL, então cada arquivo vai para um processo; o processo
+  lê os próprios arquivos (as páginas ficam no cache do sistema operacional,
+  compartilhadas) e só o cubo parcial, de poucas linhas, volta para ser somado.
+
+Como as medidas dos cubos são somas exatas, o resultado é o mesmo do cálculo
+em um único núcleo.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pyarrow as pa
+
+from sih.dataset import ler_particoes, lotes_particoes
+from sih.lotes import LINHAS_POR_LOTE, combinar, selecionar, somar_lotes
+from sih.preprocessamento import tipar
+
+# Núcleos disponíveis: tamanho padrão dos pools
+NUCLEOS = os.cpu_count() or 1
+
+
+def tarefas(dataset, ufs, competencias):
+    """([partição], ufs) de cada arquivo da seleção, com as UFs pedidas que são lidas dele.
+
+    Como em `DatasetRD.arquivos`, cada UF vem do arquivo próprio da competência
+    e, se não o tem, do arquivo nacional.
+    """
+    lista = []
+    for competencia in competencias:
+        particoes = dataset.arquivos(ufs, [competencia])
+        proprias = {p.uf for p in particoes if p.uf is not None}
+        for particao in particoes:
+            if particao.uf is not None:
+                lista.append(([particao], [particao.uf]))
+            else:
+                lista.append(([particao], [uf for uf in ufs if uf not in proprias]))
+    if not lista:
+        raise FileNotFoundError(
+            f"Nenhuma partição para UF(s) {', '.join(ufs)} nas competências {list(competencias)}"
+        )
+    return lista
+
+
+def _mapear(pool, funcao, lista):
+    """Resultados de `funcao(*tarefa)` na ordem das tarefas; sem pool, no próprio processo."""
+    if pool is None or len(lista) == 1:
+        return [funcao(*tarefa) for tarefa in lista]
+    futuros = [pool.submit(funcao, *tarefa) for tarefa in lista]
+    return [futuro.result() for futuro in futuros]
+
+
+# --- Leitura e limpeza (threads) ---
+
+def _tipar_particao(particoes, ufs):
+    return tipar(ler_particoes(particoes, ufs))
+
+
+def tipar_em_paralelo(dataset, ufs, competencias, threads=None):
+    """Tabela tipada (`tipar`) da seleção, com cada arquivo lido e limpo em uma thread."""
+    lista = tarefas(dataset, ufs, competencias)
+    threads = min(threads or NUCLEOS, len(lista))
+    if threads == 1:
+        tabelas = _mapear(None, _tipar_particao, lista)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            tabelas = _mapear(pool, _tipar_particao, lista)
+    # Dicionários com índices de 8 ou 16 bits conforme a partição: promovidos na junção
+    return pa.concat_tables(tabelas, promote_options='permissive')
+
+
+# --- Indicadores (processos) ---
+
+def _iniciar_processo():
+    # Um processo por partição já ocupa os núcleos: sem threads extras do Arrow em cada um
+    pa.set_cpu_count(1)
+
+
+def abrir_pool(processos=None):
+    """Pool de processos para `calcular_em_paralelo`; None com um único núcleo.
+
+    Os processos são criados com 'spawn': o pool pode ser aberto por um
+    servidor com várias threads (como o do Streamlit), em que um fork
+    herdaria travas de outras threads.
+    """
+    processos = processos or NUCLEOS
+    if processos == 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=processos, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_iniciar_processo,
+    )
+
+
+def somar_particao(particoes, ufs, filtros=None, periodo=None, dimensoes=None, linhas_por_lote=LINHAS_POR_LOTE):
+    """Cubos ({nome: cubo}) das UFs em um arquivo, agregados em lotes; None se não há registros."""
+    return somar_lotes(lotes_particoes(particoes, ufs, linhas_por_lote), filtros, periodo, dimensoes)
+
+
+def calcular_em_paralelo(dataset, ufs, competencias, filtros=None, periodo=None, pool=None, dimensoes=None,
+                         linhas_por_lote=LINHAS_POR_LOTE):
+    """Indicadores (`CubosSelecao`) de uma seleção do `DatasetRD`, uma tarefa do `pool` por arquivo.
+
+    `pool` vem de `abrir_pool` (ou outro `concurrent.futures.Executor`); sem
+    ele, as partições são agregadas uma a uma no próprio processo.
+    """
+    filtros = filtros or {}
+    # As dimensões só vão para os processos quando o filtro por região de saúde as usa
+    if not filtros.get('regiao_saude'):
+        dimensoes = None
+    lista = [(particoes, ufs_arquivo, filtros, periodo, dimensoes, linhas_por_lote)
+             for particoes, ufs_arquivo in tarefas(dataset, ufs, competencias)]
+    parciais = [cubos for cubos in _mapear(pool, somar_particao, lista) if cubos is not None]
+    if len(parciais) > 1:
+        return selecionar(combinar(parciais))
+    return selecionar(parciais[0] if parciais else None)
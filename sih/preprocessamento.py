@@ -0,0 +1,211 @@
+"""Limpeza e tipagem das colunas RD usadas pelo dashboard e pelos cubos."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from sih.cid10 import codificar as codificar_cid
+
+# Faixas etárias (limites fechados à direita)
+BINS_FAIXA_ETARIA = [0, 9, 19, 29, 39, 49, 59, 69, 79, 89, 99, 120]
+FAIXAS_ETARIAS = ['0–9', '10–19', '20–29', '30–39', '40–49', '50–59', '60–69', '70–79', '80–89', '90–99', '100+']
+
+MAP_SEXO = {1: 'Masculino', 2: 'Feminino'}
+MAP_OBITO = {0: 'Sem Óbito', 1: 'Com Óbito'}
+MAP_RACA_COR = {
+    1: 'Branca', 2: 'Preta', 3: 'Parda', 4: 'Amarela', 5: 'Indígena', 99: 'Sem informação'
+}
+
+# Especialidade do leito (ESPEC)
+MAP_ESPEC = {
+    1: 'Cirúrgicos', 2: 'Obstétricos', 3: 'Clínicos', 4: 'Crônicos', 5: 'Psiquiatria',
+    6: 'Pneumologia sanitária', 7: 'Pediátricos', 8: 'Reabilitação',
+    9: 'Leito dia / Cirúrgicos', 10: 'Leito dia / AIDS', 11: 'Leito dia / Fibrose cística',
+    12: 'Leito dia / Intercorrência pós-transplante', 13: 'Leito dia / Geriatria',
+    14: 'Leito dia / Saúde mental',
+}
+
+# Colunas de código: texto sem espaços, codificado em dicionário (categorias)
+COLUNAS_CODIGO = ['UF_ZI', 'CNES', 'MUNIC_MOV', 'MUNIC_RES', 'DIAG_PRINC']
+
+# Flags e códigos numéricos pequenos: inteiros anuláveis compactos
+COLUNAS_INTEIRAS = {
+    'SEXO': 'Int8', 'MORTE': 'Int8', 'MARCA_UTI': 'Int8', 'GESTRISCO': 'Int8',
+    'ESPEC': 'Int8', 'COMPLEX': 'Int8', 'RACA_COR': 'Int8', 'COD_IDADE': 'Int8',
+    'IDADE': 'Int16', 'DIAS_PERM': 'Int16', 'QT_DIARIAS': 'Int16', 'DIAR_ACOM': 'Int16',
+}
+
+# Capítulo, grupo e categoria CID-10 do diagnóstico principal (derivadas por `tipar`)
+COLUNAS_CID = ['capitulo_cid', 'grupo_cid', 'categoria_cid']
+
+# Valores em R$ continuam float64: somas de milhões de AIH em float32 perderiam centavos
+COLUNAS_VALOR = ['VAL_TOT', 'VAL_UTI']
+
+
+def centavos(valores):
+    """Valores em R$ como centavos inteiros (Int64; nulos continuam nulos).
+
+    Somas de centavos são exatas e não dependem da ordem das parcelas: totais
+    e médias de VAL_TOT/VAL_UTI dão o mesmo resultado sobre o frame inteiro,
+    sobre os cubos ou somando lotes.
+    """
+    return (valores * 100).round().astype('Int64')
+
+
+# Tipos Arrow das colunas inteiras (inteiros Arrow são anuláveis)
+TIPOS_INTEIROS = {'Int8': pa.int8(), 'Int16': pa.int16()}
+
+# Texto aceito como número por pd.to_numeric (inteiro, decimal ou notação científica)
+_PADRAO_NUMERO = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+
+def _texto(coluna):
+    """Coluna Arrow como texto (códigos numéricos sem casas decimais)."""
+    if pa.types.is_dictionary(coluna.type):
+        coluna = pc.cast(coluna, coluna.type.value_type)
+    if pa.types.is_floating(coluna.type):
+        coluna = pc.cast(coluna, pa.int64(), safe=False)
+    return pc.cast(coluna, pa.string())
+
+
+def _data(coluna):
+    """Datas AAAAMMDD como timestamp[s]; valores inválidos viram nulos.
+
+    Há poucas datas distintas por competência: cada uma é convertida uma vez e
+    distribuída às linhas por índice.
+    """
+    if pa.types.is_timestamp(coluna.type) or pa.types.is_date(coluna.type):
+        return pc.cast(coluna, pa.timestamp('s'))
+    texto = _texto(coluna)
+    distintos = pc.unique(texto)
+    datas = pc.strptime(distintos, format='%Y%m%d', unit='s', error_is_null=True)
+    # strptime do Arrow aceita dias excedentes (20240230 -> 01/03); a volta ao texto os rejeita
+    datas = pc.if_else(pc.equal(pc.strftime(datas, format='%Y%m%d'), distintos), datas, None)
+    return pc.take(datas, pc.index_in(texto, value_set=distintos))
+
+
+def _codigo(coluna):
+    return pc.utf8_trim_whitespace(_texto(coluna)).dictionary_encode()
+
+
+def _numero(coluna):
+    """Equivalente a pd.to_numeric(errors='coerce') no Arrow: texto inválido vira nulo."""
+    if pa.types.is_dictionary(coluna.type):
+        coluna = pc.cast(coluna, coluna.type.value_type)
+    if pa.types.is_integer(coluna.type) or pa.types.is_floating(coluna.type):
+        return coluna
+    texto = pc.utf8_trim_whitespace(pc.cast(coluna, pa.string()))
+    try:
+        return pc.cast(texto, pa.float64())
+    except pa.ArrowInvalid:
+        # Só quando há texto não numérico: anula os inválidos antes de converter
+        validos = pc.match_substring_regex(texto, _PADRAO_NUMERO)
+        return pc.cast(pc.if_else(validos, texto, None), pa.float64())
+
+
+def _inteiro(coluna, tipo):
+    """Inteiro Arrow do tipo pedido; valores não inteiros ou fora da faixa viram nulos."""
+    numeros = _numero(coluna)
+    limites = np.iinfo(tipo.to_pandas_dtype())
+    validos = pc.and_(pc.greater_equal(numeros, limites.min), pc.less_equal(numeros, limites.max))
+    if pa.types.is_floating(numeros.type):
+        validos = pc.and_(validos, pc.equal(numeros, pc.floor(numeros)))
+    return pc.cast(pc.if_else(validos, numeros, None), tipo)
+
+
+def _rotulos(codigos, mapa, padrao=None):
+    """Categórico de rótulos a partir de códigos inteiros, sem materializar strings por linha."""
+    rotulos = pd.Categorical(codigos, categories=list(mapa)).rename_categories(list(mapa.values()))
+    if padrao is not None:
+        rotulos = rotulos.add_categories([padrao]).fillna(padrao)
+    return rotulos
+
+
+def tipar(tabela):
+    """Tipagem e limpeza das colunas RD, inteiramente no Arrow.
+
+    Códigos viram texto sem espaços codificado em dicionário, flags e idades
+    inteiros de 8/16 bits, valores float64 e datas timestamp[s]; internações
+    sem datas válidas são descartadas. Colunas desconhecidas passam intactas.
+    DIAG_PRINC ganha as colunas de `COLUNAS_CID` (dicionários com índices de
+    8/16 bits, ver `sih.cid10.codificar`).
+    É idempotente: uma tabela já tipada (ex.: gravada pela ingestão) passa
+    pelas mesmas regras sem alteração.
+    """
+    # Tratamento de datas (também usadas pelos filtros): descarta linhas sem datas válidas
+    dt_inter = _data(tabela['DT_INTER'])
+    dt_saida = _data(tabela['DT_SAIDA'])
+    validas = pc.and_(pc.is_valid(dt_inter), pc.is_valid(dt_saida))
+    tabela = tabela.filter(validas)
+    datas = {'DT_INTER': dt_inter.filter(validas), 'DT_SAIDA': dt_saida.filter(validas)}
+
+    colunas, nomes = [], []
+    for nome in tabela.column_names:
+        if nome in COLUNAS_CID:
+            continue
+        coluna = tabela[nome]
+        if nome in COLUNAS_CODIGO:
+            coluna = _codigo(coluna)
+        elif nome in COLUNAS_INTEIRAS:
+            coluna = _inteiro(coluna, TIPOS_INTEIROS[COLUNAS_INTEIRAS[nome]])
+        elif nome in COLUNAS_VALOR:
+            coluna = pc.cast(_numero(coluna), pa.float64())
+        elif nome in datas:
+            coluna = datas[nome]
+        colunas.append(coluna)
+        nomes.append(nome)
+    tabela = pa.table(colunas, names=nomes)
+
+    # Hierarquia CID-10: calculada por código distinto de DIAG_PRINC
+    if 'DIAG_PRINC' in tabela.column_names:
+        for nome, coluna in zip(COLUNAS_CID, codificar_cid(tabela['DIAG_PRINC'])):
+            tabela = tabela.append_column(nome, coluna)
+
+    # Limpeza e Mapeamento
+    # Mapeamento Sexo: 1=Masc, 2=Fem (o código 3 do seu notebook é limpo para 2)
+    if 'SEXO' in tabela.column_names:
+        sexo = tabela['SEXO']
+        sexo = pc.if_else(pc.equal(sexo, 3), pa.scalar(2, sexo.type), sexo)
+        tabela = tabela.set_column(tabela.column_names.index('SEXO'), 'SEXO', sexo)
+    return tabela
+
+
+def _serie(coluna):
+    """Coluna Arrow como array pandas; float64 e datas sem nulos são convertidos sem cópia."""
+    tipo = coluna.type
+    if (coluna.num_chunks == 1 and coluna.null_count == 0
+            and (pa.types.is_float64(tipo) or pa.types.is_timestamp(tipo))):
+        return coluna.chunk(0).to_numpy(zero_copy_only=True)
+    tipos_pandas = {tipo: pd.api.types.pandas_dtype(nome) for nome, tipo in TIPOS_INTEIROS.items()}
+    return coluna.to_pandas(types_mapper=tipos_pandas.get).array
+
+
+def preprocessar(tabela):
+    """Converte a tabela RD em um DataFrame compacto e tipado (`tipar` + `montar_frame`)."""
+    if isinstance(tabela, pd.DataFrame):
+        tabela = pa.Table.from_pandas(tabela, preserve_index=False)
+    return montar_frame(tipar(tabela))
+
+
+def montar_frame(tabela):
+    """DataFrame a partir de uma tabela já tipada por `tipar`.
+
+    A conversão para pandas mantém os dicionários como categorias e os
+    inteiros Arrow como Int8/Int16 anuláveis, sem cópias intermediárias do
+    frame. Valores e datas sem nulos (em um único bloco) são apenas
+    referenciados: numa tabela mapeada em memória (`sih.cache`) o frame usa as
+    páginas do próprio arquivo. Acrescenta as colunas derivadas usadas pelos
+    gráficos.
+    """
+    df = pd.DataFrame({nome: _serie(tabela[nome]) for nome in tabela.column_names}, copy=False)
+
+    # Criação de Faixa Etária
+    df['faixa_etaria'] = pd.cut(df['IDADE'].fillna(-1).astype('int16'), bins=BINS_FAIXA_ETARIA, labels=FAIXAS_ETARIAS, right=True, ordered=False)
+
+    # Mapeamento do Status de Óbito
+    df['Status_Obito'] = _rotulos(df['MORTE'], MAP_OBITO)
+
+    # Mapeamento de Raça/Cor
+    df['Raça/Cor'] = _rotulos(df['RACA_COR'], MAP_RACA_COR, padrao='Não Informado')
+
+    return df
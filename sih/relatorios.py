@@ -0,0 +1,254 @@
+"""Relatórios em lote dos indicadores do dashboard, sem o Streamlit.
+
+`python -m sih.relatorios` calcula, para cada combinação UF x competência
+disponível (ou as pedidas em `--ufs`/`--competencias`), todos os indicadores
+de `sih.indicadores` e os rankings de `sih.hospitais`. Cada arquivo é lido,
+pré-processado e agregado em um processo separado (as tarefas de
+`sih.paralelo.tarefas`: um arquivo nacional é lido uma só vez para todas as
+UFs pedidas e separado por UF no processo); só as tabelas pequenas de
+resultado voltam ao processo principal. Se há cubos (`--cubos`) para a
+combinação, os registros de AIH nem são lidos.
+
+Saídas em `--saida`:
+
+* `parquet`: um arquivo por tabela (`metricas.parquet`, `sexo.parquet`, ...),
+  com as colunas `uf` e `competencia` seguidas das colunas do indicador;
+* `json`: um arquivo por combinação (`BA/202401.json`) com todas as tabelas.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from sih import hospitais, indicadores
+from sih.cubos import CubosRD
+from sih.dataset import UFS, DatasetRD, filtro_uf, ler_particoes
+from sih.dimensoes import DimensoesRD
+from sih.paralelo import tarefas as tarefas_arquivos
+from sih.preprocessamento import preprocessar
+
+FORMATOS = ['parquet', 'json']
+
+# Métricas de uma linha: tabela -> (indicador, nomes dos valores que ele devolve)
+METRICAS = {
+    'percentual_obitos': ('calcular_percentual_obitos', ['total_internacoes', 'total_obitos', 'percentual_obitos']),
+    'custos': ('calcular_custos', ['valor_total', 'custo_medio']),
+    'gestrisco': ('calcular_proporcao_gestrisco', ['total_obstetricas', 'total_gestrisco', 'proporcao_gestrisco']),
+}
+
+# Tabela do relatório -> indicador (mesmo nome em sih.indicadores e em CubosSelecao)
+DISTRIBUICOES = {
+    'valor_medio_obito': 'calcular_valor_medio_obito',
+    'municipios': 'contar_municipios',
+    'sexo': 'contar_sexo',
+    'faixa_etaria': 'contar_faixa_etaria',
+    'raca': 'contar_raca',
+    'tempo_medio_idade': 'calcular_tempo_medio_idade',
+    'cid10': 'contar_capitulos_cid10',
+}
+
+# Tabela do relatório -> ranking de sih.hospitais (sobre o perfil por CNES)
+RANKINGS = {
+    'hospitais_internacoes': hospitais.get_top_hospitais_internacoes,
+    'hospitais_tempo_medio': hospitais.get_top_hospitais_tempo_medio,
+    'hospitais_mortalidade': hospitais.get_top_hospitais_mortalidade,
+    'hospitais_uti': hospitais.get_top_hospitais_uti,
+}
+
+
+# Tabelas que podem ser calculadas uma a uma (`calcular_tabela`)
+TABELAS = [*METRICAS, *DISTRIBUICOES, *RANKINGS]
+
+
+def _indicador(origem, nome):
+    if isinstance(origem, pd.DataFrame):
+        return getattr(indicadores, nome)(origem)
+    return getattr(origem, nome)()
+
+
+def calcular_perfil(origem):
+    """Perfil por CNES (base dos rankings) do frame de `preprocessar` ou de um `CubosSelecao`."""
+    if isinstance(origem, pd.DataFrame):
+        return hospitais.perfil_hospitais(origem)
+    return origem.perfil_hospitais()
+
+
+def calcular_tabela(origem, tabela, perfil=None):
+    """Uma tabela de `TABELAS`; `perfil` (de `calcular_perfil`) evita recalculá-lo para cada ranking."""
+    if tabela in METRICAS:
+        nome, colunas = METRICAS[tabela]
+        return pd.DataFrame([dict(zip(colunas, _indicador(origem, nome)))])
+    if tabela in DISTRIBUICOES:
+        return _indicador(origem, DISTRIBUICOES[tabela])
+    if tabela in RANKINGS:
+        return RANKINGS[tabela](calcular_perfil(origem) if perfil is None else perfil)
+    raise KeyError(f"Tabela desconhecida: {tabela}")
+
+
+def calcular_relatorio(origem):
+    """Tabelas do relatório a partir do frame de `preprocessar` ou de um `CubosSelecao`."""
+    perfil = calcular_perfil(origem)
+    # As métricas vão em uma única linha
+    relatorio = {'metricas': pd.concat([calcular_tabela(origem, tabela) for tabela in METRICAS], axis=1)}
+    for tabela in [*DISTRIBUICOES, *RANKINGS]:
+        relatorio[tabela] = calcular_tabela(origem, tabela, perfil)
+    return relatorio
+
+
+def _iniciar_processo():
+    # Um processo por arquivo já ocupa os núcleos: sem threads extras do Arrow em cada um
+    pa.set_cpu_count(1)
+
+
+def relatorio_cubos(uf, competencia, diretorio_cubos):
+    """[(uf, competência, relatório)] de uma combinação coberta pelos cubos."""
+    return [(uf, competencia, calcular_relatorio(CubosRD(diretorio_cubos).ler([uf], [competencia])))]
+
+
+def relatorios_arquivo(particoes, ufs, competencia):
+    """[(uf, competência, relatório)] das UFs de um arquivo, lido uma única vez.
+
+    A tabela das UFs pedidas é separada por UF em memória, com o mesmo filtro
+    de UF_ZI da leitura, e cada parte é pré-processada como se tivesse sido
+    lida sozinha.
+    """
+    tabela = ler_particoes(particoes, ufs)
+    if len(ufs) == 1:
+        return [(ufs[0], competencia, calcular_relatorio(preprocessar(tabela)))]
+    registros = ds.dataset(tabela)
+    relatorios = []
+    for uf in ufs:
+        da_uf = registros.to_table(filter=filtro_uf(tabela.schema, UFS[uf][0]))
+        relatorios.append((uf, competencia, calcular_relatorio(preprocessar(da_uf))))
+    return relatorios
+
+
+def combinacoes(dataset, ufs=None, competencias=None):
+    """Pares (uf, competência) com dados, restritos às UFs e competências pedidas."""
+    pares = []
+    for uf in dataset.ufs():
+        if ufs and uf not in ufs:
+            continue
+        for competencia in dataset.competencias([uf]):
+            if not competencias or competencia in competencias:
+                pares.append((uf, competencia))
+    return pares
+
+
+def tarefas(dataset, pares, diretorio_cubos=None):
+    """(função, argumentos) de cada tarefa: uma por combinação coberta pelos cubos e uma por arquivo."""
+    cubos = CubosRD(diretorio_cubos) if diretorio_cubos is not None else None
+    lista = []
+    por_competencia = {}
+    for uf, competencia in pares:
+        if cubos is not None and cubos.cobre([uf], [competencia]):
+            lista.append((relatorio_cubos, (uf, competencia, diretorio_cubos)))
+        else:
+            por_competencia.setdefault(competencia, []).append(uf)
+    for competencia, ufs in por_competencia.items():
+        for particoes, ufs_arquivo in tarefas_arquivos(dataset, ufs, [competencia]):
+            lista.append((relatorios_arquivo, (particoes, ufs_arquivo, competencia)))
+    return lista
+
+
+def calcular(diretorio_dados, ufs=None, competencias=None, processos=None, diretorio_cubos=None):
+    """Calcula os relatórios em paralelo (um arquivo por tarefa) e os gera à medida que terminam."""
+    dataset = DatasetRD(diretorio_dados)
+    pares = combinacoes(dataset, ufs, competencias)
+    if not pares:
+        raise FileNotFoundError(f"Nenhuma partição para UF(s) {ufs} nas competências {competencias}")
+    lista = tarefas(dataset, pares, diretorio_cubos)
+    processos = min(processos or os.cpu_count() or 1, len(lista))
+    if processos == 1:
+        for funcao, argumentos in lista:
+            yield from funcao(*argumentos)
+        return
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as pool:
+        futuros = [pool.submit(funcao, *argumentos) for funcao, argumentos in lista]
+        for futuro in as_completed(futuros):
+            yield from futuro.result()
+
+
+def nomear_relatorio(relatorio, cnes):
+    """Acrescenta o nome do hospital (dimensão CNES) aos rankings do relatório."""
+    for tabela in RANKINGS:
+        relatorio[tabela] = hospitais.nomear_hospitais(relatorio[tabela], cnes)
+    return relatorio
+
+
+# --- Gravação ---
+
+def _registros(tabela):
+    # to_json converte NaN em null e tipos do NumPy/pandas em tipos JSON
+    return json.loads(tabela.to_json(orient='records', force_ascii=False))
+
+
+def gravar_json(saida, uf, competencia, relatorio):
+    destino = os.path.join(saida, uf, f'{competencia}.json')
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    conteudo = {'uf': uf, 'competencia': competencia}
+    conteudo.update({nome: _registros(tabela) for nome, tabela in relatorio.items()})
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo, ensure_ascii=False, indent=1)
+    return destino
+
+
+def gravar_parquet(saida, relatorios):
+    """Um parquet por tabela, com as combinações ordenadas por UF e competência."""
+    os.makedirs(saida, exist_ok=True)
+    destinos = []
+    for nome in relatorios[0][2]:
+        partes = []
+        for uf, competencia, relatorio in sorted(relatorios, key=lambda r: (r[0], r[1])):
+            parte = relatorio[nome].copy()
+            # Categorias diferentes entre combinações não se concatenam: texto simples
+            for coluna in parte.columns[parte.dtypes == 'category']:
+                parte[coluna] = parte[coluna].astype(str)
+            parte.insert(0, 'uf', uf)
+            parte.insert(1, 'competencia', competencia)
+            partes.append(parte)
+        destino = os.path.join(saida, f'{nome}.parquet')
+        pd.concat(partes, ignore_index=True).to_parquet(destino, index=False)
+        destinos.append(destino)
+    return destinos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calcula os indicadores do dashboard para várias UFs e competências, sem o Streamlit."
+    )
+    parser.add_argument('--dados', default='datasets', help="diretório com os arquivos RD (.parquet)")
+    parser.add_argument('--saida', default='relatorios', help="diretório de destino")
+    parser.add_argument('--ufs', nargs='*', default=None, help="UFs (padrão: todas as disponíveis)")
+    parser.add_argument('--competencias', nargs='*', type=int, default=None,
+                        help="competências AAAAMM (padrão: todas as disponíveis)")
+    parser.add_argument('--formato', choices=FORMATOS, default='parquet', help="formato da saída")
+    parser.add_argument('--processos', type=int, default=None, help="combinações calculadas em paralelo (padrão: núcleos)")
+    parser.add_argument('--cubos', default=None, help="diretório de cubos (`python -m sih.cubos`) usados quando cobrem a combinação")
+    parser.add_argument('--dimensoes', default=None,
+                        help="diretório das dimensões (`python -m sih.dimensoes`) para nomear os hospitais")
+    args = parser.parse_args(argv)
+    cnes = DimensoesRD.abrir(args.dados, args.dimensoes).cnes if args.dimensoes else None
+
+    relatorios = []
+    for uf, competencia, relatorio in calcular(args.dados, args.ufs, args.competencias,
+                                               args.processos, args.cubos):
+        total = relatorio['metricas']['total_internacoes'].iloc[0]
+        if cnes is not None:
+            nomear_relatorio(relatorio, cnes)
+        if args.formato == 'json':
+            print(f"{uf}/{competencia}: {total} internações -> {gravar_json(args.saida, uf, competencia, relatorio)}")
+        else:
+            print(f"{uf}/{competencia}: {total} internações")
+            relatorios.append((uf, competencia, relatorio))
+    if relatorios:
+        for destino in gravar_parquet(args.saida, relatorios):
+            print(destino)
+
+
+if __name__ == '__main__':
+    main()
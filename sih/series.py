@@ -0,0 +1,258 @@
+"""Séries temporais por dia de internação (DT_INTER).
+
+`serializar` agrega um frame pré-processado em séries diárias por dimensão
+(UF, município do estabelecimento, hospital e capítulo CID-10), com medidas
+aditivas: internações, óbitos, dias de permanência e valor total em
+centavos, mais as contagens `n_*` de valores presentes. As séries são
+gravadas por `python -m sih.cubos` ao lado dos cubos (`series/UF/AAAAMM.parquet`,
+uma linha por dimensão, chave e dia) e, como os cubos, só são refeitas para
+as competências novas ou alteradas.
+
+As AIH de uma competência têm internações de meses anteriores: a série de um
+dia soma as linhas de todas as competências gravadas, e os últimos meses só
+se completam quando chegam as competências seguintes.
+
+Nas consultas, as somas diárias são reamostradas (diária, semanal ou mensal)
+e os indicadores (taxa de mortalidade, permanência média, custo médio) são
+recompostos das somas, inclusive em janelas móveis e na comparação com o
+ano anterior; nenhuma média é calculada sobre médias. Com um período de
+internação, `periodo_leitura` dá os dias a ler: os períodos inteiros que o
+cobrem, mais os períodos anteriores de que a janela móvel e o ano anterior
+precisam; `comparar` corta o resultado no período depois de calculá-los.
+"""
+import argparse
+import glob
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pandas.tseries.frequencies import to_offset
+
+from sih.dataset import SIGLA_POR_CODIGO
+from sih.preprocessamento import centavos
+
+# Dimensões com séries (UF ou colunas do frame pré-processado) e seus rótulos
+DIMENSOES_SERIE = {
+    'UF': 'UF',
+    'MUNIC_MOV': 'Município do estabelecimento',
+    'CNES': 'Hospital (CNES)',
+    'capitulo_cid': 'Capítulo CID-10',
+}
+
+MEDIDAS_SERIE = ['internacoes', 'obitos', 'dias_perm', 'n_dias_perm', 'val_tot', 'n_val_tot']
+
+# Indicadores recompostos das medidas e seus rótulos
+INDICADORES = {
+    'internacoes': 'Internações',
+    'obitos': 'Óbitos',
+    'taxa_mortalidade': 'Taxa de mortalidade (%)',
+    'permanencia_media': 'Permanência média (dias)',
+    'valor_total': 'Custo total (R$)',
+    'custo_medio': 'Custo médio (R$)',
+}
+
+# Frequência -> (rótulo, regra de reamostragem do pandas, períodos em um ano)
+# Semanas começam na segunda-feira; um ano de dias ou semanas são 52 semanas exatas,
+# para comparar o mesmo dia da semana
+FREQUENCIAS = {
+    'D': ('Diária', 'D', 364),
+    'W': ('Semanal', 'W-MON', 52),
+    'M': ('Mensal', 'MS', 12),
+}
+
+SUBDIRETORIO = 'series'
+
+
+# --- Construção ---
+
+def _medidas(df):
+    val_tot = centavos(df['VAL_TOT'])
+    return pd.DataFrame({
+        'internacoes': np.ones(len(df), dtype='int32'),
+        'obitos': (df['MORTE'] == 1).to_numpy(dtype=bool, na_value=False).astype('int32'),
+        'dias_perm': df['DIAS_PERM'].fillna(0).to_numpy('int64'),
+        'n_dias_perm': df['DIAS_PERM'].notna().to_numpy().astype('int32'),
+        'val_tot': val_tot.fillna(0).to_numpy('int64'),
+        'n_val_tot': val_tot.notna().to_numpy().astype('int32'),
+    }, index=df.index)
+
+
+def serializar(df):
+    """Tabela de séries diárias (uf, dimensão, chave, dia e medidas) de um frame pré-processado."""
+    medidas = _medidas(df)
+    uf = df['UF_ZI'].str[:2].map(SIGLA_POR_CODIGO).astype('category')
+    dia = pd.Series(df['DT_INTER'].to_numpy().astype('datetime64[D]'), index=df.index)
+
+    partes = []
+    for dimensao in DIMENSOES_SERIE:
+        chave = uf if dimensao == 'UF' else df[dimensao]
+        somas = medidas.groupby([uf.rename('uf'), chave.rename('chave'), dia.rename('dia')],
+                                observed=True, sort=True).sum().reset_index()
+        somas = somas[somas['chave'].astype(str) != '']
+        partes.append(pa.table({
+            'uf': pa.array(somas['uf'].astype(str).to_numpy(dtype=object), pa.string()),
+            'dimensao': pa.array([dimensao] * len(somas), pa.string()),
+            'chave': pa.array(somas['chave'].astype(str).to_numpy(dtype=object), pa.string()),
+            'dia': pa.array(somas['dia'].to_numpy().astype('datetime64[D]')),
+            **{medida: pa.array(somas[medida].to_numpy()) for medida in MEDIDAS_SERIE},
+        }))
+    return pa.concat_tables(partes)
+
+
+def gravar(tabela, diretorio_cubos, uf, competencia):
+    destino = os.path.join(diretorio_cubos, SUBDIRETORIO, uf, f'{competencia}.parquet')
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # A UF está no caminho; ordenadas por dimensão, chave e dia, as colunas comprimem bem
+    tabela = tabela.drop_columns(['uf']).sort_by([('dimensao', 'ascending'), ('chave', 'ascending'), ('dia', 'ascending')])
+    pq.write_table(tabela, destino, compression='zstd')
+
+
+# --- Consulta ---
+
+def _filtro(dimensao, chave=None, inicio=None, fim=None):
+    filtro = ds.field('dimensao') == dimensao
+    if chave is not None:
+        filtro &= ds.field('chave') == str(chave)
+    if inicio is not None:
+        filtro &= ds.field('dia') >= pa.scalar(inicio, pa.date32())
+    if fim is not None:
+        filtro &= ds.field('dia') <= pa.scalar(fim, pa.date32())
+    return filtro
+
+
+def selecionar(tabela, dimensao, chave=None, inicio=None, fim=None):
+    """Linhas (dia e medidas) de uma tabela de `serializar` para a dimensão e a chave (None: todas)."""
+    return ds.dataset(tabela).to_table(columns=['dia'] + MEDIDAS_SERIE, filter=_filtro(dimensao, chave, inicio, fim))
+
+
+class SeriesRD:
+    """Séries diárias gravadas por `python -m sih.cubos`."""
+
+    def __init__(self, diretorio_cubos):
+        self.diretorio = os.path.join(diretorio_cubos, SUBDIRETORIO)
+
+    def _caminhos(self, ufs):
+        return [c for uf in ufs for c in sorted(glob.glob(os.path.join(self.diretorio, uf, '*.parquet')))]
+
+    def cobre(self, ufs):
+        """Indica se há séries de todas as UFs."""
+        return bool(ufs) and all(self._caminhos([uf]) for uf in ufs)
+
+    def ler(self, dimensao, ufs, chave=None, inicio=None, fim=None):
+        """Linhas (dia e medidas) de todas as competências gravadas das UFs."""
+        caminhos = self._caminhos(ufs)
+        if not caminhos:
+            raise FileNotFoundError(f"Nenhuma série para UF(s) {', '.join(ufs)} em '{self.diretorio}'")
+        return ds.dataset(caminhos, format='parquet').to_table(
+            columns=['dia'] + MEDIDAS_SERIE, filter=_filtro(dimensao, chave, inicio, fim)
+        )
+
+
+def somar(tabela, frequencia='D'):
+    """Somas das medidas por período (índice de datas contínuo; períodos sem internações valem 0)."""
+    df = tabela.to_pandas()
+    df['dia'] = pd.to_datetime(df['dia'])
+    somas = df.groupby('dia')[MEDIDAS_SERIE].sum()
+    if somas.empty:
+        return somas
+    somas = somas.reindex(pd.date_range(somas.index.min(), somas.index.max(), freq='D'), fill_value=0)
+    if frequencia != 'D':
+        somas = somas.resample(FREQUENCIAS[frequencia][1], label='left', closed='left').sum()
+    return somas.rename_axis('Data')
+
+
+def indicadores(somas):
+    """Indicadores de `INDICADORES` recompostos das somas (NaN onde o denominador é zero)."""
+    def razao(numerador, denominador):
+        return numerador / denominador.where(denominador > 0)
+    return pd.DataFrame({
+        'internacoes': somas['internacoes'],
+        'obitos': somas['obitos'],
+        'taxa_mortalidade': razao(somas['obitos'], somas['internacoes']) * 100,
+        'permanencia_media': razao(somas['dias_perm'], somas['n_dias_perm']),
+        'valor_total': somas['val_tot'] / 100,
+        'custo_medio': razao(somas['val_tot'], somas['n_val_tot']) / 100,
+    }, index=somas.index)
+
+
+def periodo_leitura(inicio, fim, frequencia='D', janela=None, com_ano_anterior=False):
+    """(início, fim) dos dias a ler para mostrar a série de `inicio` a `fim` (None: sem limite).
+
+    Os limites vão para o começo e o fim dos períodos (semanas ou meses) que
+    os contêm; o início recua mais `janela - 1` períodos e, com a comparação,
+    um ano, para que a média móvel e o ano anterior do primeiro período
+    também sejam calculados.
+    """
+    deslocamento = to_offset(FREQUENCIAS[frequencia][1])
+    if inicio is not None:
+        recuo = (janela - 1 if janela and janela > 1 else 0) + (FREQUENCIAS[frequencia][2] if com_ano_anterior else 0)
+        inicio = (deslocamento.rollback(pd.Timestamp(inicio)) - recuo * deslocamento).date()
+    if fim is not None:
+        fim = (deslocamento.rollback(pd.Timestamp(fim)) + deslocamento - pd.Timedelta(days=1)).date()
+    return inicio, fim
+
+
+def movel(somas, janela):
+    """Somas em janelas móveis de `janela` períodos (os primeiros períodos, incompletos, ficam NaN)."""
+    return somas.rolling(janela, min_periods=janela).sum()
+
+
+def ano_anterior(somas, frequencia='D'):
+    """Somas do mesmo período um ano antes, alinhadas ao índice de `somas`."""
+    return somas.shift(FREQUENCIAS[frequencia][2])
+
+
+def comparar(somas, indicador, frequencia='D', janela=None, com_ano_anterior=False, inicio=None, fim=None):
+    """Tabela para gráfico/relatório: `Data`, o indicador e, se pedidos, média móvel e ano anterior.
+
+    A média móvel e o ano anterior usam as somas da janela (ou do ano
+    anterior); com ambos, o ano anterior também é suavizado pela janela.
+    `somas` deve vir de `periodo_leitura`: a janela e o ano anterior são
+    calculados sobre todas as linhas, e só então a tabela é cortada nos
+    períodos de `inicio` a `fim`.
+    """
+    rotulo = INDICADORES[indicador]
+    base = movel(somas, janela) if janela and janela > 1 else None
+    tabela = pd.DataFrame({rotulo: indicadores(somas)[indicador]})
+    if base is not None:
+        tabela[f'Média móvel ({janela} períodos)'] = indicadores(base)[indicador]
+    if com_ano_anterior:
+        atual = tabela[tabela.columns[-1]]
+        anterior = indicadores(ano_anterior(base if base is not None else somas, frequencia))[indicador]
+        tabela['Ano anterior'] = anterior
+        tabela['Variação (%)'] = (atual / anterior.where(anterior != 0) - 1) * 100
+    deslocamento = to_offset(FREQUENCIAS[frequencia][1])
+    if inicio is not None:
+        tabela = tabela[tabela.index >= deslocamento.rollback(pd.Timestamp(inicio))]
+    if fim is not None:
+        tabela = tabela[tabela.index <= pd.Timestamp(fim)]
+    return tabela.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Série temporal de um indicador, a partir das séries gravadas com os cubos.")
+    parser.add_argument('--dimensao', choices=list(DIMENSOES_SERIE), default='UF')
+    parser.add_argument('--chave', default=None, help="valor da dimensão (CNES, código do município, ...); padrão: todos")
+    parser.add_argument('--ufs', nargs='+', required=True)
+    parser.add_argument('--indicador', choices=list(INDICADORES), default='internacoes')
+    parser.add_argument('--frequencia', choices=list(FREQUENCIAS), default='M', help="D (diária), W (semanal) ou M (mensal)")
+    parser.add_argument('--janela', type=int, default=None, help="média móvel de N períodos")
+    parser.add_argument('--ano-anterior', action='store_true', help="compara com o mesmo período do ano anterior")
+    parser.add_argument('--inicio', type=date.fromisoformat, default=None, help="primeiro dia de internação (AAAA-MM-DD)")
+    parser.add_argument('--fim', type=date.fromisoformat, default=None, help="último dia de internação (AAAA-MM-DD)")
+    parser.add_argument('--cubos', default='cubos', help="diretório dos cubos e séries")
+    args = parser.parse_args(argv)
+
+    inicio, fim = periodo_leitura(args.inicio, args.fim, args.frequencia, args.janela, args.ano_anterior)
+    tabela = SeriesRD(args.cubos).ler(args.dimensao, args.ufs, args.chave, inicio, fim)
+    somas = somar(tabela, args.frequencia)
+    comparacao = comparar(somas, args.indicador, args.frequencia, args.janela, args.ano_anterior, args.inicio, args.fim)
+    print(comparacao.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Gerador de arquivos RD sintéticos, com o schema e distribuições realistas.
+
+Produz as colunas de COLUNAS_INTERESSE (mais ANO_CMPT/MES_CMPT) com os tipos
+dos arquivos do DataSUS convertidos de DBF: códigos como texto (SEXO '1'/'3',
+ESPEC '03', MARCA_UTI '00'/'74', datas 'AAAAMMDD') e contagens e valores
+numéricos. As distribuições imitam as do SIH: poucos hospitais concentram as
+internações, cada CNES pertence a um município, a capital domina o
+MUNIC_MOV, os diagnósticos seguem a frequência dos capítulos CID-10 (partos
+na frente), idade, UTI e óbito são correlacionados e a permanência é
+assimétrica. Não há nenhum dado real.
+
+Os lotes são gerados e gravados um de cada vez, então arquivos de 10 mil a
+50 milhões de linhas usam a mesma memória (`python -m sih.sintetico`).
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from sih.cid10 import GRUPO_POR_CATEGORIA, codigo_categoria
+from sih.dataset import UFS
+
+# Municípios por UF (IBGE)
+MUNICIPIOS_POR_UF = {
+    'RO': 52, 'AC': 22, 'AM': 62, 'RR': 15, 'PA': 144, 'AP': 16, 'TO': 139,
+    'MA': 217, 'PI': 224, 'CE': 184, 'RN': 167, 'PB': 223, 'PE': 185, 'AL': 102,
+    'SE': 75, 'BA': 417, 'MG': 853, 'ES': 78, 'RJ': 92, 'SP': 645, 'PR': 399,
+    'SC': 295, 'RS': 497, 'MS': 79, 'MT': 141, 'GO': 246, 'DF': 1,
+}
+
+# População aproximada (milhões, Censo 2022): peso de cada UF nos arquivos nacionais
+POPULACAO_UF = {
+    'RO': 1.6, 'AC': 0.8, 'AM': 3.9, 'RR': 0.6, 'PA': 8.1, 'AP': 0.7, 'TO': 1.5,
+    'MA': 6.8, 'PI': 3.3, 'CE': 8.8, 'RN': 3.3, 'PB': 4.0, 'PE': 9.1, 'AL': 3.1,
+    'SE': 2.2, 'BA': 14.1, 'MG': 20.5, 'ES': 3.8, 'RJ': 16.1, 'SP': 44.4, 'PR': 11.4,
+    'SC': 7.6, 'RS': 10.9, 'MS': 2.8, 'MT': 3.7, 'GO': 7.1, 'DF': 2.8,
+}
+
+# Peso de cada capítulo (primeira letra) entre os diagnósticos principais
+PESO_CAPITULOS = {
+    'O': 0.19, 'J': 0.09, 'I': 0.09, 'K': 0.09, 'S': 0.08, 'C': 0.06, 'N': 0.06,
+    'A': 0.05, 'P': 0.03, 'Z': 0.03, 'T': 0.02, 'E': 0.02, 'F': 0.02, 'G': 0.02,
+    'M': 0.02, 'R': 0.02, 'D': 0.02, 'L': 0.01, 'B': 0.01, 'H': 0.01, 'U': 0.01,
+    'Q': 0.005,
+}
+
+# Códigos distintos por capítulo (subcategorias de 4 caracteres de categorias existentes, frequência Zipf)
+CODIGOS_POR_CAPITULO = 300
+
+RACA_COR = {'01': 0.25, '02': 0.08, '03': 0.45, '04': 0.01, '05': 0.005, '99': 0.205}
+
+# Leitos de UTI (MARCA_UTI) por público
+UTI_ADULTO = ['74', '75', '76']
+UTI_PEDIATRICA = ['77', '78', '79']
+UTI_NEONATAL = ['80', '81', '82', '83']
+
+# Permanência máxima considerada (dias): limita também o início do vocabulário de datas
+PERMANENCIA_MAXIMA = 365
+
+LINHAS_POR_LOTE = 1_000_000
+
+
+def _zipf(n, expoente=1.1):
+    pesos = 1.0 / np.arange(1, n + 1) ** expoente
+    return pesos / pesos.sum()
+
+
+def _normalizar(pesos):
+    pesos = np.asarray(pesos, dtype='float64')
+    return pesos / pesos.sum()
+
+
+class UniversoUF:
+    """Municípios e hospitais (CNES) sintéticos de uma UF, fixos para uma semente."""
+
+    def __init__(self, uf, rng):
+        codigo = UFS[uf][0]
+        n_municipios = MUNICIPIOS_POR_UF[uf]
+        sufixos = np.sort(rng.choice(np.arange(10, 10000), n_municipios, replace=False))
+        self.uf = uf
+        self.municipios = pa.array([f'{codigo}{sufixo:04d}' for sufixo in sufixos])
+        self.gestor_estadual = f'{codigo}0000'
+        # A capital (primeiro município) concentra hospitais e residentes
+        self.peso_municipios = _zipf(n_municipios, 1.2)
+
+        n_hospitais = max(3, round(1.2 * n_municipios))
+        self.cnes = pa.array([f'{numero:07d}' for numero in rng.choice(np.arange(2_000_000, 9_999_999), n_hospitais, replace=False)])
+        self.municipio_hospital = rng.choice(n_municipios, n_hospitais, p=self.peso_municipios)
+        # Porte dos hospitais: cauda pesada (poucos hospitais grandes)
+        self.peso_hospitais = _normalizar(rng.lognormal(0, 1.3, n_hospitais))
+
+
+def _vocabulario_cid(rng):
+    letras = list(PESO_CAPITULOS)
+    codigos, pesos = [], []
+    for letra in letras:
+        inicio = codigo_categoria(f'{letra}00')
+        existentes = np.flatnonzero(GRUPO_POR_CATEGORIA[inicio:inicio + 100] >= 0)
+        subcategorias = rng.choice(len(existentes) * 10, CODIGOS_POR_CAPITULO, replace=False)
+        codigos.extend(f'{letra}{existentes[n // 10]:02d}{n % 10}' for n in subcategorias)
+        pesos.append(PESO_CAPITULOS[letra] * _zipf(CODIGOS_POR_CAPITULO, 1.0))
+    return pa.array(codigos), _normalizar(np.concatenate(pesos)), np.repeat(letras, CODIGOS_POR_CAPITULO)
+
+
+def _vocabulario_datas(competencia):
+    """Datas AAAAMMDD do início da permanência máxima até o fim da competência."""
+    inicio_mes = pd.Timestamp(year=competencia // 100, month=competencia % 100, day=1)
+    fim_mes = inicio_mes + pd.offsets.MonthEnd(0)
+    datas = pd.date_range(inicio_mes - pd.Timedelta(days=PERMANENCIA_MAXIMA), fim_mes, freq='D')
+    return pa.array(datas.strftime('%Y%m%d')), PERMANENCIA_MAXIMA, len(datas)
+
+
+def gerar_lote(rng, n, universo, competencia, cid, datas):
+    """Tabela RD sintética de `n` internações de uma UF e competência."""
+    codigos_cid, peso_cid, letra_cid = cid
+    vocabulario_datas, primeiro_dia_mes, n_datas = datas
+
+    hospital = rng.choice(len(universo.cnes), n, p=universo.peso_hospitais)
+    municipio_mov = universo.municipio_hospital[hospital]
+    diagnostico = rng.choice(len(codigos_cid), n, p=peso_cid)
+    letra = letra_cid[diagnostico]
+    obstetrico = letra == 'O'
+    perinatal = letra == 'P'
+
+    # Idade: anos (COD_IDADE 4) para a maioria; dias (2) ou meses (3) para menores de 1 ano
+    cod_idade = np.full(n, '4', dtype=object)
+    faixa = rng.choice(3, n, p=[0.15, 0.40, 0.45])
+    idade = np.where(faixa == 0, rng.integers(1, 15, n), np.where(faixa == 1, rng.integers(15, 60, n), rng.integers(60, 100, n)))
+    idade = np.where(obstetrico, np.clip(np.round(rng.normal(26, 6, n)), 12, 50), idade).astype('int64')
+    lactente = perinatal | (rng.random(n) < 0.02)
+    em_dias = lactente & (perinatal | (rng.random(n) < 0.5))
+    cod_idade[lactente] = '3'
+    cod_idade[em_dias] = '2'
+    idade = np.where(em_dias, rng.integers(0, 29, n), np.where(lactente, rng.integers(1, 12, n), idade))
+    crianca = lactente | (idade < 15)
+    idoso = ~lactente & (idade >= 60)
+
+    sexo = np.where(obstetrico | (rng.random(n) < 0.52), '3', '1')
+
+    espec = rng.choice(['01', '03', '04', '06', '08', '09', '13'], n, p=[0.35, 0.58, 0.02, 0.01, 0.01, 0.02, 0.01])
+    espec = np.where((letra == 'F') & (rng.random(n) < 0.5), '05', espec)
+    espec = np.where(crianca & (rng.random(n) < 0.8), '07', espec)
+    espec = np.where(obstetrico, '02', espec)
+
+    # UTI: mais frequente em idosos e neonatos; o tipo de leito segue o público
+    prob_uti = np.where(perinatal, 0.20, np.where(idoso, 0.12, np.where(obstetrico, 0.01, 0.06)))
+    uti = rng.random(n) < prob_uti
+    marca_uti = np.full(n, '00', dtype=object)
+    marca_uti[uti] = rng.choice(UTI_ADULTO, uti.sum())
+    uti_pediatrica = uti & crianca
+    marca_uti[uti_pediatrica] = rng.choice(UTI_PEDIATRICA, uti_pediatrica.sum())
+    uti_neonatal = uti & perinatal
+    marca_uti[uti_neonatal] = rng.choice(UTI_NEONATAL, uti_neonatal.sum())
+
+    # Permanência assimétrica (geométrica), mais longa com UTI e curta nos partos
+    media_permanencia = np.where(obstetrico, 2.0, 4.5) + np.where(uti, 7.0, 0.0)
+    dias_perm = np.minimum(rng.geometric(1.0 / (media_permanencia + 1)) - 1, PERMANENCIA_MAXIMA)
+    qt_diarias = dias_perm + (rng.random(n) < 0.3)
+    diar_acom = np.where(crianca | idoso, dias_perm, 0)
+
+    prob_obito = np.where(obstetrico, 0.0005, np.where(idoso, 0.08, 0.015)) + np.where(uti, 0.20, 0.0)
+    morte = (rng.random(n) < prob_obito).astype('int64')
+
+    val_uti = np.where(uti, np.round(np.maximum(dias_perm, 1) * rng.uniform(500, 1600, n), 2), 0.0)
+    cirurgico = espec == '01'
+    val_tot = np.round(rng.lognormal(6.7, 0.9, n) * np.where(cirurgico, 1.8, 1.0) + val_uti, 2)
+
+    # Alta no mês da competência; a internação começa DIAS_PERM dias antes
+    saida = primeiro_dia_mes + rng.integers(0, n_datas - primeiro_dia_mes, n)
+    entrada = saida - dias_perm
+
+    municipio_res = np.where(rng.random(n) < 0.75, municipio_mov,
+                             rng.choice(len(universo.municipios), n, p=universo.peso_municipios))
+    munic_mov = universo.municipios.take(pa.array(municipio_mov))
+    uf_zi = pa.array(np.where(rng.random(n) < 0.55, munic_mov.to_numpy(zero_copy_only=False), universo.gestor_estadual))
+
+    ano, mes = competencia // 100, competencia % 100
+    return pa.table({
+        'UF_ZI': uf_zi,
+        'ANO_CMPT': pa.array(np.full(n, f'{ano:04d}')),
+        'MES_CMPT': pa.array(np.full(n, f'{mes:02d}')),
+        'ESPEC': pa.array(espec),
+        'CNES': universo.cnes.take(pa.array(hospital)),
+        'MUNIC_RES': universo.municipios.take(pa.array(municipio_res)),
+        'MUNIC_MOV': munic_mov,
+        'SEXO': pa.array(sexo),
+        'COD_IDADE': pa.array(cod_idade, pa.string()),
+        'IDADE': pa.array(idade, pa.int64()),
+        'DIAG_PRINC': codigos_cid.take(pa.array(diagnostico)),
+        'DT_INTER': vocabulario_datas.take(pa.array(entrada)),
+        'DT_SAIDA': vocabulario_datas.take(pa.array(saida)),
+        'DIAS_PERM': pa.array(dias_perm, pa.int64()),
+        'QT_DIARIAS': pa.array(qt_diarias, pa.int64()),
+        'DIAR_ACOM': pa.array(diar_acom, pa.int64()),
+        'MORTE': pa.array(morte),
+        'MARCA_UTI': pa.array(marca_uti, pa.string()),
+        'GESTRISCO': pa.array(np.where(obstetrico & (rng.random(n) < 0.2), '1', '0')),
+        'RACA_COR': pa.array(rng.choice(list(RACA_COR), n, p=list(RACA_COR.values()))),
+        'COMPLEX': pa.array(np.where(rng.random(n) < np.where(cirurgico, 0.25, 0.06), '03', '02')),
+        'VAL_TOT': pa.array(val_tot),
+        'VAL_UTI': pa.array(val_uti),
+    })
+
+
+def gerar_arquivo(caminho, linhas, competencia, uf=None, semente=0, linhas_por_lote=LINHAS_POR_LOTE):
+    """Grava um arquivo RD sintético (de uma UF ou, com `uf=None`, nacional) em parquet.
+
+    Municípios, hospitais e códigos CID dependem só da semente: arquivos de
+    competências ou UFs diferentes compartilham os mesmos CNES e municípios.
+    """
+    ufs = [uf] if uf is not None else list(UFS)
+    universos = {sigla: UniversoUF(sigla, np.random.default_rng([semente, int(UFS[sigla][0])])) for sigla in ufs}
+    cid = _vocabulario_cid(np.random.default_rng([semente, 0]))
+    rng = np.random.default_rng([semente, competencia, int(UFS[uf][0]) if uf is not None else 0])
+    datas = _vocabulario_datas(competencia)
+    peso_ufs = _normalizar([POPULACAO_UF[sigla] for sigla in ufs])
+
+    temporario = caminho + '.tmp'
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    escritor = None
+    try:
+        for inicio in range(0, linhas, linhas_por_lote):
+            n = min(linhas_por_lote, linhas - inicio)
+            por_uf = rng.multinomial(n, peso_ufs)
+            lote = pa.concat_tables([
+                gerar_lote(rng, n_uf, universos[sigla], competencia, cid, datas)
+                for sigla, n_uf in zip(ufs, por_uf) if n_uf > 0
+            ])
+            if escritor is None:
+                escritor = pq.ParquetWriter(temporario, lote.schema, compression='snappy')
+            escritor.write_table(lote)
+        escritor.close()
+        os.replace(temporario, caminho)
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+            os.remove(temporario)
+        raise
+    return caminho
+
+
+def nome_arquivo(competencia, uf=None):
+    """Nome no padrão do DataSUS: RDBA2401.parquet (UF) ou RD202401.parquet (nacional)."""
+    if uf is None:
+        return f'RD{competencia}.parquet'
+    return f'RD{uf}{competencia // 100 % 100:02d}{competencia % 100:02d}.parquet'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera arquivos RD sintéticos em parquet.")
+    parser.add_argument('--linhas', type=int, default=100_000, help="internações por arquivo")
+    parser.add_argument('--ufs', nargs='*', default=['BA'], help="UFs (um arquivo por UF); vazio = arquivo nacional")
+    parser.add_argument('--competencias', nargs='+', type=int, default=[202401], help="competências AAAAMM")
+    parser.add_argument('--saida', default='datasets', help="diretório de destino")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for competencia in args.competencias:
+        for uf in args.ufs or [None]:
+            caminho = os.path.join(args.saida, nome_arquivo(competencia, uf))
+            gerar_arquivo(caminho, args.linhas, competencia, uf, semente=args.semente)
+            print(f"Gerado: {caminho} ({args.linhas} linhas)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Dados sintéticos (`sih.sintetico`) compartilhados pelos testes.
+
+O diretório tem arquivos por UF (BA e SE em 2024/01 e 2024/02) e um arquivo
+nacional (2024/03), para que os caminhos por UF e nacional sejam exercitados.
+"""
+import os
+
+import pytest
+
+from sih.cubos import construir
+from sih.sintetico import gerar_arquivo, nome_arquivo
+
+UFS = ['BA', 'SE']
+COMPETENCIAS = [202401, 202402, 202403]
+
+# (uf, competência, linhas); uf None é o arquivo nacional
+ARQUIVOS = [
+    ('BA', 202401, 6000),
+    ('SE', 202401, 3000),
+    ('BA', 202402, 6000),
+    ('SE', 202402, 3000),
+    (None, 202403, 60000),
+]
+
+
+def gerar_dados(diretorio):
+    for uf, competencia, linhas in ARQUIVOS:
+        gerar_arquivo(os.path.join(diretorio, nome_arquivo(competencia, uf)), linhas, competencia, uf, semente=7)
+    return diretorio
+
+
+@pytest.fixture(scope='session')
+def diretorio_dados(tmp_path_factory):
+    return gerar_dados(str(tmp_path_factory.mktemp('datasets')))
+
+
+@pytest.fixture(scope='session')
+def diretorio_cubos(diretorio_dados, tmp_path_factory):
+    diretorio = str(tmp_path_factory.mktemp('cubos'))
+    construir(diretorio_dados, diretorio)
+    return diretorio
@@ -0,0 +1,191 @@
+"""API HTTP dos indicadores (`sih.api`) e cache de respostas (`sih.cache.CacheResultados`)."""
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pyarrow as pa
+import pytest
+
+from sih import cache
+from sih.api import ServicoIndicadores, criar_app
+from sih.cache import CacheResultados
+from sih.cubos import CubosRD
+from sih.relatorios import calcular_tabela
+
+
+class Resposta:
+    def __init__(self, status, cabecalhos, conteudo):
+        self.status_code = status
+        self.headers = cabecalhos
+        self.content = conteudo
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ClienteASGI:
+    """Requisições GET direto na aplicação ASGI, sem servidor nem cliente HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, url):
+        return asyncio.run(self._get(url))
+
+    async def _get(self, url):
+        partes = urlsplit(url)
+        escopo = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': partes.path, 'raw_path': partes.path.encode(),
+            'query_string': partes.query.encode(), 'root_path': '', 'headers': [],
+            'server': ('teste', 80), 'client': ('teste', 1),
+        }
+        resposta = {'corpo': b''}
+
+        async def receber():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                resposta['status'] = mensagem['status']
+                resposta['cabecalhos'] = {k.decode(): v.decode() for k, v in mensagem['headers']}
+            elif mensagem['type'] == 'http.response.body':
+                resposta['corpo'] += mensagem.get('body', b'')
+
+        await self.app(escopo, receber, enviar)
+        return Resposta(resposta['status'], resposta['cabecalhos'], resposta['corpo'])
+
+
+@pytest.fixture(scope='module')
+def servico(diretorio_dados, diretorio_cubos, tmp_path_factory):
+    return ServicoIndicadores(diretorio_dados, diretorio_cubos, str(tmp_path_factory.mktemp('cache_api')),
+                              str(tmp_path_factory.mktemp('dimensoes_api')))
+
+
+@pytest.fixture(scope='module')
+def cliente(servico):
+    pytest.importorskip('starlette')
+    return ClienteASGI(criar_app(servico))
+
+
+def test_catalogo_e_competencias(cliente):
+    catalogo = cliente.get('/').json()
+    assert {'BA', 'SE'} <= set(catalogo['ufs'])
+    assert 'percentual_obitos' in catalogo['tabelas'] and 'arrow' in catalogo['formatos']
+    assert cliente.get('/competencias?ufs=BA').json()['competencias'] == [202401, 202402, 202403]
+    assert cliente.get('/competencias?ufs=XX').status_code == 400
+
+
+@pytest.mark.parametrize('url, status', [
+    ('/indicadores/nao_existe?ufs=BA', 404),
+    ('/indicadores/custos', 400),
+    ('/indicadores/custos?ufs=XX', 400),
+    ('/indicadores/custos?ufs=BA&competencias=abc', 400),
+    ('/indicadores/custos?ufs=BA&formato=xml', 400),
+    ('/indicadores/custos?ufs=BA&inicio=2024-01-01', 400),
+    ('/indicadores/custos?ufs=BA&inicio=01/01/2024&fim=31/01/2024', 400),
+    ('/indicadores/custos?ufs=BA&ESPEC=x', 400),
+    ('/indicadores/custos?ufs=BA&competencias=209901', 404),
+])
+def test_erros(cliente, url, status):
+    resposta = cliente.get(url)
+    assert resposta.status_code == status
+    assert 'erro' in resposta.json()
+
+
+def test_json_das_tabelas(cliente, diretorio_cubos):
+    resposta = cliente.get('/indicadores/percentual_obitos?ufs=BA,SE&competencias=202401,202402')
+    assert resposta.status_code == 200
+    assert resposta.headers['content-type'].startswith('application/json')
+    assert resposta.headers['x-fonte'] == 'cubos'
+    corpo = resposta.json()
+    assert corpo['ufs'] == ['BA', 'SE'] and corpo['competencias'] == [202401, 202402]
+    esperado = calcular_tabela(CubosRD(diretorio_cubos).ler(['BA', 'SE'], [202401, 202402]), 'percentual_obitos')
+    assert corpo['linhas'][0]['total_internacoes'] == esperado['total_internacoes'].iloc[0]
+
+
+def test_arrow_com_filtros_vem_dos_registros(cliente):
+    resposta = cliente.get('/indicadores/sexo?ufs=BA&competencias=202401&SEXO=Feminino&formato=arrow')
+    assert resposta.status_code == 200
+    assert resposta.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+    tabela = pa.ipc.open_stream(resposta.content).read_all()
+    assert tabela.schema.metadata[b'fonte'] == b'registros'
+    assert tabela.column('Sexo').to_pylist() == ['Feminino']
+    # Sem competências, vale a última disponível
+    assert cliente.get('/indicadores/custos?ufs=BA').json()['competencias'] == [202403]
+
+
+def test_respostas_em_cache(servico, cliente, monkeypatch):
+    chamadas = []
+    tabela = servico.tabela
+
+    def contar(*args, **kwargs):
+        chamadas.append(args)
+        return tabela(*args, **kwargs)
+
+    monkeypatch.setattr(servico, 'tabela', contar)
+    url = '/indicadores/hospitais_internacoes?ufs=SE&competencias=202402'
+    primeira = cliente.get(url)
+    segunda = cliente.get(url)
+    assert primeira.status_code == segunda.status_code == 200
+    assert primeira.content == segunda.content
+    assert len(chamadas) == 1
+    # Outro formato é outra entrada
+    cliente.get(url + '&formato=arrow')
+    assert len(chamadas) == 2
+
+
+# --- CacheResultados ---
+
+def test_cache_resultados_lru():
+    resultados = CacheResultados(maximo=2)
+    resultados.obter('a', lambda: 1)
+    resultados.obter('b', lambda: 2)
+    resultados.consultar('a')  # 'a' passa a ser a mais recente
+    resultados.obter('c', lambda: 3)
+    assert resultados.consultar('b') is None
+    assert resultados.consultar('a') == 1 and resultados.consultar('c') == 3
+    assert len(resultados) == 2
+
+
+def test_cache_resultados_validade(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: agora[0])
+    resultados = CacheResultados(ttl=10)
+    assert resultados.obter('a', lambda: 1) == 1
+    agora[0] += 5
+    assert resultados.obter('a', lambda: 2) == 1
+    agora[0] += 6
+    assert resultados.consultar('a') is None
+    assert resultados.obter('a', lambda: 3) == 3
+
+
+def test_cache_resultados_calculo_unico_e_erros():
+    resultados = CacheResultados()
+    chamadas = []
+    liberar = threading.Event()
+
+    def calcular():
+        chamadas.append(1)
+        liberar.wait(5)
+        return 'valor'
+
+    obtidos = []
+    threads = [threading.Thread(target=lambda: obtidos.append(resultados.obter('k', calcular))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert obtidos == ['valor'] * 8
+    assert len(chamadas) == 1
+
+    # Um erro não fica em cache
+    def falhar():
+        raise ValueError('falhou')
+    with pytest.raises(ValueError):
+        resultados.obter('e', falhar)
+    assert resultados.obter('e', lambda: 'ok') == 'ok'
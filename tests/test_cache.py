@@ -0,0 +1,89 @@
+"""Cache em disco das tabelas limpas (`sih.cache.CacheArrow`)."""
+import os
+
+import pyarrow as pa
+import pytest
+
+from sih.cache import EXTENSAO, CacheArrow
+
+
+@pytest.fixture
+def origem(tmp_path):
+    caminho = tmp_path / 'RDBA2401.parquet'
+    caminho.write_bytes(b'origem')
+    return str(caminho)
+
+
+def tabela(linhas=1000):
+    return pa.table({'VAL_TOT': pa.array(range(linhas), pa.float64())})
+
+
+class Gerador:
+    def __init__(self, linhas=1000):
+        self.linhas = linhas
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        return tabela(self.linhas)
+
+
+def entradas(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.endswith(EXTENSAO))
+
+
+def test_acerto_nao_regera(tmp_path, origem):
+    cache = CacheArrow(str(tmp_path / 'cache'))
+    gerar = Gerador()
+    primeira = cache.obter('rd', [origem], gerar, ufs=('BA',))
+    segunda = cache.obter('rd', [origem], gerar, ufs=('BA',))
+    assert gerar.chamadas == 1
+    assert primeira.equals(tabela()) and segunda.equals(tabela())
+    # Outros parâmetros são outra entrada
+    cache.obter('rd', [origem], gerar, ufs=('SE',))
+    assert gerar.chamadas == 2
+    assert len(entradas(cache.diretorio)) == 2
+
+
+def test_origem_alterada_invalida_e_remove_a_versao_antiga(tmp_path, origem):
+    cache = CacheArrow(str(tmp_path / 'cache'))
+    gerar = Gerador()
+    antiga = cache.caminho('rd', [origem], ufs=('BA',))
+    cache.obter('rd', [origem], gerar, ufs=('BA',))
+
+    with open(origem, 'ab') as arquivo:
+        arquivo.write(b' alterada')
+    cache.obter('rd', [origem], gerar, ufs=('BA',))
+    assert gerar.chamadas == 2
+    assert not os.path.exists(antiga)
+    assert entradas(cache.diretorio) == [os.path.basename(cache.caminho('rd', [origem], ufs=('BA',)))]
+
+
+def test_limite_descarta_as_menos_usadas(tmp_path, origem):
+    diretorio = str(tmp_path / 'cache')
+    gerar = Gerador()
+    CacheArrow(diretorio).obter('rd', [origem], gerar, ufs=('BA',))
+    tamanho = os.path.getsize(CacheArrow(diretorio).caminho('rd', [origem], ufs=('BA',)))
+    # Cabem duas entradas
+    cache = CacheArrow(diretorio, maximo_bytes=2 * tamanho + tamanho // 2)
+    caminhos = {uf: cache.caminho('rd', [origem], ufs=(uf,)) for uf in ['BA', 'SE', 'AL']}
+
+    cache.obter('rd', [origem], gerar, ufs=('SE',))
+    os.utime(caminhos['BA'], ns=(1, 1))
+    os.utime(caminhos['SE'], ns=(2, 2))
+    # Um acerto em BA a torna a mais recente: SE é a descartada
+    cache.obter('rd', [origem], gerar, ufs=('BA',))
+    cache.obter('rd', [origem], gerar, ufs=('AL',))
+    assert os.path.exists(caminhos['BA']) and os.path.exists(caminhos['AL'])
+    assert not os.path.exists(caminhos['SE'])
+    assert gerar.chamadas == 3
+
+
+def test_entrada_maior_que_o_limite_e_mantida(tmp_path, origem):
+    cache = CacheArrow(str(tmp_path / 'cache'), maximo_bytes=1)
+    gerar = Gerador()
+    cache.obter('rd', [origem], gerar, ufs=('BA',))
+    cache.obter('rd', [origem], gerar, ufs=('SE',))
+    assert entradas(cache.diretorio) == [os.path.basename(cache.caminho('rd', [origem], ufs=('SE',)))]
+    assert cache.obter('rd', [origem], gerar, ufs=('SE',)).equals(tabela())
+    assert gerar.chamadas == 2
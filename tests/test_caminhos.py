@@ -0,0 +1,109 @@
+"""Os três caminhos dos indicadores dão as mesmas tabelas: cubos, lotes em paralelo e registros."""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from sih.cubos import CubosRD
+from sih.dataset import DatasetRD
+from sih.filtros import IndiceFiltros
+from sih.hospitais import maiores
+from sih.paralelo import calcular_em_paralelo
+from sih.preprocessamento import preprocessar
+from sih.relatorios import TABELAS, calcular_tabela
+
+from tests.conftest import COMPETENCIAS, UFS
+
+# Lotes pequenos: cada arquivo é agregado em vários lotes, somados ao final
+LINHAS_POR_LOTE = 2048
+
+FILTROS = {
+    'SEXO': ['Feminino'],
+    'capitulo_cid': ['XV. Gravidez parto e puerpério', 'X. Doenças do aparelho respiratório'],
+}
+PERIODO = (date(2024, 1, 10), date(2024, 2, 20))
+
+
+def normalizar(tabela):
+    """Categorias viram texto: cada caminho monta as suas com valores em ordens diferentes."""
+    tabela = tabela.copy()
+    for coluna in tabela.columns[tabela.dtypes == 'category']:
+        tabela[coluna] = tabela[coluna].astype(str)
+    return tabela.reset_index(drop=True)
+
+
+def comparar(esperada, obtida):
+    pd.testing.assert_frame_equal(normalizar(esperada), normalizar(obtida), check_dtype=False)
+
+
+@pytest.fixture(scope='module')
+def registros(diretorio_dados):
+    return IndiceFiltros(preprocessar(DatasetRD(diretorio_dados).ler(UFS, COMPETENCIAS)))
+
+
+@pytest.fixture(scope='module')
+def origens(diretorio_dados, diretorio_cubos, registros):
+    dataset = DatasetRD(diretorio_dados)
+    return {
+        'registros': registros.df,
+        'cubos': CubosRD(diretorio_cubos).ler(UFS, COMPETENCIAS),
+        'lotes': calcular_em_paralelo(dataset, UFS, COMPETENCIAS, linhas_por_lote=LINHAS_POR_LOTE),
+    }
+
+
+@pytest.fixture(scope='module')
+def origens_filtradas(diretorio_dados, registros):
+    dataset = DatasetRD(diretorio_dados)
+    return {
+        'registros': registros.filtrar(FILTROS, PERIODO),
+        'lotes': calcular_em_paralelo(dataset, UFS, COMPETENCIAS, FILTROS, PERIODO, linhas_por_lote=LINHAS_POR_LOTE),
+    }
+
+
+def test_cubos_cobrem_a_selecao(diretorio_cubos):
+    assert CubosRD(diretorio_cubos).cobre(UFS, COMPETENCIAS)
+
+
+@pytest.mark.parametrize('tabela', TABELAS)
+def test_tabelas_iguais_sem_filtros(origens, tabela):
+    esperada = calcular_tabela(origens['registros'], tabela)
+    assert len(esperada) > 0
+    comparar(esperada, calcular_tabela(origens['cubos'], tabela))
+    comparar(esperada, calcular_tabela(origens['lotes'], tabela))
+
+
+@pytest.mark.parametrize('tabela', TABELAS)
+def test_tabelas_iguais_com_filtros(origens_filtradas, tabela):
+    comparar(calcular_tabela(origens_filtradas['registros'], tabela),
+             calcular_tabela(origens_filtradas['lotes'], tabela))
+
+
+def test_municipios_sem_internacoes_nao_entram(diretorio_dados, registros):
+    # Um único município: o top-10 tem só ele, nos registros e nos lotes
+    municipio = calcular_tabela(registros.df, 'municipios')['MUNIC_MOV'].iloc[0]
+    filtros = {'MUNIC_MOV': [municipio]}
+    esperada = calcular_tabela(registros.filtrar(filtros), 'municipios')
+    assert esperada['MUNIC_MOV'].astype(str).tolist() == [municipio]
+    lotes = calcular_em_paralelo(DatasetRD(diretorio_dados), UFS, COMPETENCIAS, filtros, linhas_por_lote=LINHAS_POR_LOTE)
+    comparar(esperada, calcular_tabela(lotes, 'municipios'))
+
+
+def test_filtros_reduzem_a_selecao(origens, origens_filtradas):
+    total = calcular_tabela(origens['registros'], 'percentual_obitos')['total_internacoes'].iloc[0]
+    filtrado = calcular_tabela(origens_filtradas['registros'], 'percentual_obitos')['total_internacoes'].iloc[0]
+    assert 0 < filtrado < total
+
+
+def test_valores_somados_em_centavos(origens):
+    # Custo total idêntico (não apenas próximo) nos três caminhos
+    custos = {nome: calcular_tabela(origem, 'custos')['valor_total'].iloc[0] for nome, origem in origens.items()}
+    assert custos['cubos'] == custos['registros'] == custos['lotes']
+
+
+def test_empates_desfeitos_pelo_codigo():
+    # A mesma contagem em ordens diferentes dá o mesmo ranking, inclusive no corte em k
+    contagem = {'0003816': 5, '2816210': 7, '0001234': 5, '9999999': 5, '0000001': None}
+    esperado = ['2816210', '0001234', '0003816']
+    for ordem in [list(contagem), list(reversed(contagem))]:
+        valores = pd.Series([contagem[c] for c in ordem], index=ordem, dtype='float64')
+        assert maiores(valores, 3).index.tolist() == esperado
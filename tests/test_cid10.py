@@ -0,0 +1,77 @@
+"""Capítulo, grupo e categoria da CID-10 nas fronteiras das faixas (`sih.cid10`)."""
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from sih.cid10 import (
+    CATEGORIAS, NAO_MAPEADO, codificar, codigo_categoria, contagens_categorias, detalhar
+)
+
+# Diagnóstico -> (capítulo, início do grupo); None: sem grupo
+FRONTEIRAS = {
+    'A000': ('I. Doenças infecciosas', 'A00'),
+    'B99': ('I. Doenças infecciosas', 'B99'),
+    'C00': ('II. Neoplasias (tumores)', 'C00'),
+    'D489': ('II. Neoplasias (tumores)', 'D37'),
+    'D49': (NAO_MAPEADO, None),
+    'D50': ('III. Doenças sangue', 'D50'),
+    'G13': ('VI. Doenças do sistema nervoso', 'G10'),
+    'G14': ('VI. Doenças do sistema nervoso', 'G10'),
+    'G19': (NAO_MAPEADO, None),
+    'H59': ('VII. Doenças do olho e anexos', 'H55'),
+    'H60': ('VIII. Doenças do ouvido', 'H60'),
+    'U049': ('XXII. Códigos especiais', 'U00'),
+    'U50': (NAO_MAPEADO, None),
+    'U99': ('XXII. Códigos especiais', 'U99'),
+    'Z999': ('XXI. Contatos com serviços de saúde', 'Z80'),
+    'XYZ': (NAO_MAPEADO, None),
+}
+
+
+def codificar_textos(textos):
+    return codificar(pa.chunked_array([pa.array(textos).dictionary_encode()]))
+
+
+def test_codigo_categoria():
+    assert codigo_categoria('A00') == 0
+    assert codigo_categoria('Z99') == len(CATEGORIAS) - 1
+    assert CATEGORIAS[codigo_categoria('D48')] == 'D48'
+
+
+@pytest.mark.parametrize('diagnostico', FRONTEIRAS)
+def test_capitulo_e_grupo_nas_fronteiras(diagnostico):
+    capitulo, grupo = codificar_textos([diagnostico])[:2]
+    esperado_capitulo, esperado_grupo = FRONTEIRAS[diagnostico]
+    assert capitulo.to_pylist() == [esperado_capitulo]
+    rotulo_grupo = grupo.to_pylist()[0]
+    if esperado_grupo is None:
+        assert rotulo_grupo is None
+    else:
+        assert rotulo_grupo.startswith(esperado_grupo)
+
+
+def test_diagnostico_vazio_fica_nulo():
+    colunas = codificar_textos(['', None, 'A00'])
+    for coluna in colunas:
+        assert coluna.to_pylist()[:2] == [None, None]
+
+
+def test_detalhar_capitulo_e_grupo():
+    diagnosticos = ['C00', 'C14', 'D10', 'D36', 'D37', 'D48', 'D48', 'D50']
+    _, _, categoria = codificar_textos(diagnosticos)
+    # As categorias do dicionário já são todas as de CATEGORIAS, na ordem dos códigos
+    contagens = contagens_categorias(categoria.to_pandas())
+
+    grupos = detalhar(contagens, 'II. Neoplasias (tumores)')
+    assert grupos['Frequencia'].sum() == 7
+    por_grupo = dict(zip(grupos['Grupo_CID'].str[:3], grupos['Frequencia']))
+    assert por_grupo == {'D37': 3, 'C00': 2, 'D10': 2}
+    assert np.isclose(grupos['Percentual'].sum(), 100)
+
+    rotulo_d37 = grupos.loc[grupos['Grupo_CID'].str.startswith('D37'), 'Grupo_CID'].iloc[0]
+    categorias = detalhar(contagens, 'II. Neoplasias (tumores)', rotulo_d37)
+    assert dict(zip(categorias['Categoria_CID'], categorias['Frequencia'])) == {'D48': 2, 'D37': 1}
+
+    # D50 pertence ao capítulo III, não às neoplasias
+    assert detalhar(contagens, 'III. Doenças sangue')['Frequencia'].sum() == 1
+
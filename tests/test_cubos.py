@@ -0,0 +1,42 @@
+"""Construção incremental dos cubos (`sih.cubos.construir`)."""
+import os
+import shutil
+
+from sih.cubos import CubosRD, construir
+from sih.dataset import DatasetRD
+from sih.preprocessamento import preprocessar
+from sih.relatorios import calcular_tabela
+from sih.sintetico import gerar_arquivo, nome_arquivo
+
+from tests.conftest import ARQUIVOS
+
+
+def total_internacoes(origem):
+    return calcular_tabela(origem, 'percentual_obitos')['total_internacoes'].iloc[0]
+
+
+def test_construir_refaz_apenas_particoes_alteradas(diretorio_dados, tmp_path):
+    dados = str(tmp_path / 'datasets')
+    cubos = str(tmp_path / 'cubos')
+    shutil.copytree(diretorio_dados, dados)
+
+    construidas = construir(dados, cubos)
+    assert sorted(construidas, key=str) == sorted([(uf, competencia) for uf, competencia, _ in ARQUIVOS], key=str)
+    # Nada mudou: nenhuma unidade é reagregada
+    assert construir(dados, cubos) == []
+
+    intacto = os.path.join(cubos, 'hospital', 'BA', '202401.parquet')
+    estado_intacto = os.stat(intacto).st_mtime_ns
+
+    # Um arquivo regravado com outro conteúdo só refaz a própria unidade
+    alterado = os.path.join(dados, nome_arquivo(202402, 'SE'))
+    gerar_arquivo(alterado, 1500, 202402, 'SE', semente=11)
+    assert construir(dados, cubos) == [('SE', 202402)]
+    assert os.stat(intacto).st_mtime_ns == estado_intacto
+
+    # Os cubos refeitos refletem o novo arquivo
+    esperado = total_internacoes(preprocessar(DatasetRD(dados).ler(['SE'], [202402])))
+    assert total_internacoes(CubosRD(cubos).ler(['SE'], [202402])) == esperado
+
+    # `forcar` reagrega tudo
+    assert len(construir(dados, cubos, forcar=True)) == len(ARQUIVOS)
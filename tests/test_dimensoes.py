@@ -0,0 +1,105 @@
+"""Dimensões de municípios, regiões de saúde e estabelecimentos (`sih.dimensoes`)."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sih.dimensoes import DimensoesRD
+from sih.filtros import IndiceFiltros
+
+MUNICIPIOS = """Codigo,Nome
+2927408,Salvador
+2910800,Feira de Santana
+2800308,Aracaju
+"""
+
+REGIOES = """Codigo_Municipio;Codigo_Regiao;Nome_Regiao
+2927408;29012;Salvador
+2910800;29008;Feira de Santana
+"""
+
+CNES = """CO_CNES,NO_FANTASIA,CO_MUNICIPIO_GESTOR
+0003816,Hospital Geral Roberto Santos,292740
+3859,Hospital Sem Zeros,291080
+2816210,Hospital de Fora,999999
+"""
+
+
+@pytest.fixture
+def diretorio_dados(tmp_path):
+    for nome, conteudo in [('municipios.csv', MUNICIPIOS), ('regioes_saude.csv', REGIOES),
+                           ('cnes_estabelecimentos.csv', CNES)]:
+        (tmp_path / nome).write_text(conteudo, encoding='latin-1')
+    return str(tmp_path)
+
+
+def test_chaves_e_referencias(diretorio_dados):
+    dimensoes = DimensoesRD.montar(diretorio_dados)
+    municipios = dimensoes.municipios
+    # Código IBGE de 7 dígitos vira o de 6 do RD; a chave é a linha, na ordem dos códigos
+    assert municipios.tabela['codigo'].to_pylist() == ['280030', '291080', '292740']
+    assert municipios.chaves(['292740', '280030', '000000']).tolist() == [2, 0, -1]
+    assert municipios.chaves(['292740']).dtype == np.int32
+    assert municipios.codigos_das_ufs(['BA']) == {'291080': 'Feira de Santana', '292740': 'Salvador'}
+
+    # Aracaju não tem região; as demais apontam para a linha da região
+    regioes = municipios.valores('regiao', municipios.chaves(['280030', '292740']), nulo=-1)
+    assert regioes[0] == -1
+    assert dimensoes.regioes_saude.valores('nome', regioes[1:]).tolist() == ['Salvador']
+
+
+def test_descrever_cnes(diretorio_dados):
+    dimensoes = DimensoesRD.montar(diretorio_dados)
+    descricao = dimensoes.descrever_cnes(['0003816', '0003859', '2816210', '1234567'])
+    assert descricao['Hospital'].tolist()[:3] == [
+        'Hospital Geral Roberto Santos', 'Hospital Sem Zeros', 'Hospital de Fora'
+    ]
+    assert descricao['Município'].tolist()[:2] == ['Salvador', 'Feira de Santana']
+    assert descricao['Região de Saúde'].tolist()[1] == 'Feira de Santana'
+    # Município gestor fora da dimensão e CNES fora do cadastro ficam nulos
+    assert descricao['Município'].isna().tolist()[2:] == [True, True]
+    assert pd.isna(descricao['Hospital'].iloc[3])
+
+
+def test_regioes_por_linha_pelas_categorias(diretorio_dados):
+    dimensoes = DimensoesRD.montar(diretorio_dados)
+    munic_mov = pd.Series(['292740', '280030', None, '291080', '292740'], dtype='category')
+    chaves = dimensoes.regioes_por_linha(munic_mov)
+    assert chaves.dtype == np.int32
+    codigos = dimensoes.regioes_saude.tabela['codigo'].to_pylist()
+    assert [codigos[c] if c >= 0 else None for c in chaves] == ['29012', None, None, '29008', '29012']
+
+
+def test_filtro_por_regiao_de_saude(diretorio_dados):
+    dimensoes = DimensoesRD.montar(diretorio_dados)
+    df = pd.DataFrame({
+        'DT_INTER': pd.to_datetime(['2024-01-01'] * 4),
+        'MUNIC_MOV': pd.Categorical(['292740', '291080', '280030', '292740']),
+        'CNES': pd.Categorical(['0003816'] * 4),
+        'capitulo_cid': pd.Categorical(['I'] * 4),
+        'SEXO': pd.array([1, 2, 1, 2], dtype='Int8'),
+        'faixa_etaria': pd.Categorical(['0-9'] * 4),
+        'ESPEC': pd.array([1] * 4, dtype='Int8'),
+    })
+    indice = IndiceFiltros(df, dimensoes)
+    assert indice.valores('regiao_saude') == ['29008', '29012']
+    assert indice.mascara({'regiao_saude': ['29012']}).tolist() == [True, False, False, True]
+
+
+def test_gravadas_e_remontadas_quando_a_origem_muda(diretorio_dados, tmp_path):
+    saida = str(tmp_path / 'dimensoes')
+    DimensoesRD.abrir(diretorio_dados, saida)
+    gravado = os.stat(os.path.join(saida, 'cnes.parquet')).st_mtime_ns
+    assert len(DimensoesRD.abrir(diretorio_dados, saida).cnes) == 3
+    assert os.stat(os.path.join(saida, 'cnes.parquet')).st_mtime_ns == gravado
+
+    with open(os.path.join(diretorio_dados, 'cnes_estabelecimentos.csv'), 'a', encoding='latin-1') as arquivo:
+        arquivo.write('7654321,Hospital Novo,292740\n')
+    assert len(DimensoesRD.abrir(diretorio_dados, saida).cnes) == 4
+
+
+def test_sem_arquivos_as_dimensoes_ficam_vazias(tmp_path):
+    dimensoes = DimensoesRD.montar(str(tmp_path))
+    assert len(dimensoes.municipios) == len(dimensoes.regioes_saude) == len(dimensoes.cnes) == 0
+    assert dimensoes.cnes.chaves(['0003816']).tolist() == [-1]
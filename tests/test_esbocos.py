@@ -0,0 +1,90 @@
+"""Esboços mergeáveis (`sih.esbocos`): limites de erro contra as contagens exatas e combinação."""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from sih.dataset import DatasetRD
+from sih.esbocos import (
+    LARGURA_CM, PROFUNDIDADE_CM, REGISTROS_HLL, ContagensExatas, EsbocosRD, _matriz, esbocar,
+    estimar_distintos
+)
+from sih.preprocessamento import preprocessar
+
+from tests.conftest import UFS
+
+# Três erros padrão do HyperLogLog com 2^11 registros (~2,3%)
+TOLERANCIA_DISTINTOS = 0.07
+
+PERIODOS = [(None, None), (date(2024, 1, 10), date(2024, 2, 20))]
+
+
+@pytest.fixture(scope='module')
+def esbocos(diretorio_cubos):
+    return EsbocosRD(diretorio_cubos)
+
+
+@pytest.fixture(scope='module')
+def exatas(diretorio_dados):
+    return ContagensExatas(DatasetRD(diretorio_dados), linhas_por_lote=4096)
+
+
+@pytest.mark.parametrize('inicio, fim', PERIODOS)
+@pytest.mark.parametrize('dimensao', ['CNES', 'DIAG_PRINC', 'MUNIC_RES'])
+def test_distintos_dentro_do_erro(esbocos, exatas, dimensao, inicio, fim):
+    exato = exatas.distintos(dimensao, UFS, inicio, fim)
+    assert exato > 0
+    assert abs(esbocos.distintos(dimensao, UFS, inicio, fim) - exato) <= TOLERANCIA_DISTINTOS * exato
+
+
+@pytest.mark.parametrize('inicio, fim', PERIODOS)
+@pytest.mark.parametrize('dimensao', ['MUNIC_MOV', 'CNES', 'DIAG_PRINC'])
+def test_top_k_com_limites_garantidos(esbocos, exatas, dimensao, inicio, fim):
+    exato = exatas.top_k(dimensao, UFS, inicio, fim, k=10_000_000).set_index(dimensao)['Internacoes']
+    aproximado = esbocos.top_k(dimensao, UFS, inicio, fim, k=10)
+    assert len(aproximado) == 10
+    # A contagem real está sempre entre o mínimo e o máximo informados
+    reais = exato.reindex(aproximado[dimensao]).fillna(0).to_numpy()
+    assert (aproximado['Minimo'].to_numpy() <= reais).all()
+    assert (reais <= aproximado['Maximo'].to_numpy()).all()
+    # Os mais frequentes, bem separados dos demais, estão no top-10 aproximado
+    assert set(exato.nlargest(3).index) <= set(aproximado[dimensao])
+
+
+def test_periodo_vazio(esbocos):
+    assert esbocos.distintos('CNES', UFS, date(2030, 1, 1), date(2030, 1, 31)) == 0
+    assert esbocos.top_k('CNES', UFS, date(2030, 1, 1), date(2030, 1, 31)).empty
+
+
+def test_combinar_metades_igual_ao_todo(diretorio_dados):
+    df = preprocessar(DatasetRD(diretorio_dados).ler(['BA'], [202401]))
+    metade = len(df) // 2
+    partes = [esbocar(df.iloc[:metade]), esbocar(df.iloc[metade:])]
+
+    def estados(tabela):
+        chaves = list(zip(tabela['dimensao'].to_pylist(), tabela['dia'].to_pylist()))
+        hll = _matriz(tabela['hll'], 'uint8', REGISTROS_HLL)
+        cm = _matriz(tabela['cm'], 'uint32', PROFUNDIDADE_CM * LARGURA_CM).astype('int64')
+        return {chave: (hll[i], cm[i]) for i, chave in enumerate(chaves)}
+
+    combinado = {}
+    for parte in partes:
+        for chave, (hll, cm) in estados(parte).items():
+            if chave in combinado:
+                # HyperLogLog combina pelo máximo dos registros; Count-Min pela soma
+                combinado[chave] = (np.maximum(combinado[chave][0], hll), combinado[chave][1] + cm)
+            else:
+                combinado[chave] = (hll, cm)
+
+    esperado = estados(esbocar(df))
+    assert combinado.keys() == esperado.keys()
+    for chave, (hll, cm) in esperado.items():
+        np.testing.assert_array_equal(combinado[chave][0], hll)
+        np.testing.assert_array_equal(combinado[chave][1], cm)
+
+
+def test_estimar_distintos_poucos_valores():
+    # Com poucos valores, a correção de contagem linear é quase exata
+    registros = np.zeros(REGISTROS_HLL, dtype='uint8')
+    registros[:50] = 1
+    assert abs(estimar_distintos(registros) - 50) < 2
@@ -0,0 +1,89 @@
+"""Ingestão dos arquivos RD brutos (`sih.ingestao`): CSV e DBF dão o mesmo parquet que os dados de origem."""
+import os
+import struct
+from datetime import date
+
+import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import pytest
+
+from sih.dataset import DatasetRD
+from sih.ingestao import _texto_dbf, ingerir_arquivo, particao_do_nome
+from sih.preprocessamento import preprocessar
+from sih.sintetico import gerar_arquivo, nome_arquivo
+
+
+@pytest.fixture(scope='module')
+def origem(tmp_path_factory):
+    diretorio = str(tmp_path_factory.mktemp('origem'))
+    gerar_arquivo(os.path.join(diretorio, nome_arquivo(202401, 'BA')), 3000, 202401, 'BA', semente=5)
+    return diretorio
+
+
+def registros(diretorio):
+    """Frame pré-processado de BA 2024/01, com as categorias como texto (cada leitura as ordena à sua maneira)."""
+    df = preprocessar(DatasetRD(diretorio).ler(['BA'], [202401]))
+    for coluna in df.columns[df.dtypes == 'category']:
+        df[coluna] = df[coluna].astype(str)
+    return df.reset_index(drop=True)
+
+
+def test_particao_do_nome():
+    assert particao_do_nome('dados/RDBA2401.dbc') == ('BA', 202401)
+    assert particao_do_nome('RD202312.csv') == (None, 202312)
+    assert particao_do_nome('internacoes.csv') == (None, None)
+
+
+def test_csv_ida_e_volta(origem, tmp_path):
+    tabela = pq.read_table(os.path.join(origem, nome_arquivo(202401, 'BA')))
+    csv = str(tmp_path / 'RDBA2401.csv')
+    pacsv.write_csv(tabela, csv)
+
+    resumo = ingerir_arquivo(csv, str(tmp_path / 'saida'), linhas_por_grupo=1024, bloco=64 * 1024)
+    assert resumo['particoes'] == ['BA/202401']
+    assert resumo['linhas_lidas'] == tabela.num_rows
+    pd.testing.assert_frame_equal(registros(str(tmp_path / 'saida')), registros(origem), check_dtype=False)
+
+
+def test_texto_dbf_datas_no_formato_rd():
+    assert _texto_dbf(date(2024, 1, 5)) == '20240105'
+    assert _texto_dbf('20240105') == '20240105'
+    assert _texto_dbf(12) == '12'
+    assert _texto_dbf(None) is None
+
+
+def gravar_dbf(caminho, tabela, datas):
+    """DBF (dBase III) mínimo: colunas de texto (C) e, em `datas`, colunas de data (D)."""
+    colunas = {}
+    for nome in tabela.column_names:
+        valores = ['' if v is None else str(v) for v in tabela[nome].to_pylist()]
+        if nome in datas:
+            colunas[nome] = ('D', 8, valores)
+        else:
+            colunas[nome] = ('C', max(1, max(len(v) for v in valores)), valores)
+    tamanho_registro = 1 + sum(largura for _, largura, _ in colunas.values())
+    with open(caminho, 'wb') as arquivo:
+        arquivo.write(struct.pack('<BBBBIHH20x', 3, 124, 1, 1, tabela.num_rows,
+                                  32 + 32 * len(colunas) + 1, tamanho_registro))
+        for nome, (tipo, largura, _) in colunas.items():
+            arquivo.write(struct.pack('<11sc4xBB14x', nome.encode(), tipo.encode(), largura, 0))
+        arquivo.write(b'\r')
+        for linha in range(tabela.num_rows):
+            arquivo.write(b' ' + b''.join(valores[linha].ljust(largura).encode('latin-1')
+                                          for _, largura, valores in colunas.values()))
+        arquivo.write(b'\x1a')
+
+
+def test_dbf_ida_e_volta_com_datas(origem, tmp_path):
+    pytest.importorskip('dbfread')
+    tabela = pq.read_table(os.path.join(origem, nome_arquivo(202401, 'BA')))
+    dbf = str(tmp_path / 'RDBA2401.dbf')
+    # Datas de internação e saída como campos D, lidos pelo dbfread como datetime.date
+    gravar_dbf(dbf, tabela, datas={'DT_INTER', 'DT_SAIDA'})
+
+    resumo = ingerir_arquivo(dbf, str(tmp_path / 'saida'), linhas_por_grupo=1024)
+    assert resumo['linhas_gravadas'] == tabela.num_rows
+    ingerido = registros(str(tmp_path / 'saida'))
+    assert ingerido['DT_INTER'].notna().all()
+    pd.testing.assert_frame_equal(ingerido, registros(origem), check_dtype=False)
@@ -0,0 +1,48 @@
+"""Relatórios em lote (`sih.relatorios`): um arquivo nacional é lido uma vez e separado por UF."""
+import pandas as pd
+import pytest
+
+from sih import relatorios
+from sih.dataset import DatasetRD
+from sih.preprocessamento import preprocessar
+from sih.relatorios import calcular, calcular_relatorio, relatorios_arquivo, tarefas
+
+from tests.conftest import COMPETENCIAS, UFS
+
+
+def test_arquivo_nacional_e_uma_tarefa(diretorio_dados, diretorio_cubos):
+    dataset = DatasetRD(diretorio_dados)
+    pares = [(uf, competencia) for uf in UFS for competencia in COMPETENCIAS]
+    lista = tarefas(dataset, pares)
+    # Quatro arquivos por UF e um nacional com as duas UFs
+    assert len(lista) == 5
+    nacionais = [argumentos for funcao, argumentos in lista if argumentos[0][0].uf is None]
+    assert [(ufs, competencia) for _, ufs, competencia in nacionais] == [(UFS, 202403)]
+    # Com cubos, nenhum arquivo é lido
+    assert {funcao for funcao, _ in tarefas(dataset, pares, diretorio_cubos)} == {relatorios.relatorio_cubos}
+
+
+def test_leitura_unica_por_arquivo(diretorio_dados, monkeypatch):
+    leituras = []
+    ler_particoes = relatorios.ler_particoes
+
+    def contar(particoes, ufs, *args):
+        leituras.append([p.caminho for p in particoes])
+        return ler_particoes(particoes, ufs, *args)
+
+    monkeypatch.setattr(relatorios, 'ler_particoes', contar)
+    resultado = list(calcular(diretorio_dados, UFS, [202403], processos=1))
+    assert sorted(uf for uf, _, _ in resultado) == UFS
+    assert len(leituras) == 1
+
+
+@pytest.mark.parametrize('uf', UFS)
+def test_separacao_por_uf_igual_a_leitura_da_uf(diretorio_dados, uf):
+    dataset = DatasetRD(diretorio_dados)
+    [(particoes, ufs)] = [t for t in relatorios.tarefas_arquivos(dataset, UFS, [202403])]
+    obtidos = {u: relatorio for u, _, relatorio in relatorios_arquivo(particoes, ufs, 202403)}
+    esperado = calcular_relatorio(preprocessar(dataset.ler([uf], [202403])))
+    assert obtidos[uf].keys() == esperado.keys()
+    for tabela in esperado:
+        pd.testing.assert_frame_equal(obtidos[uf][tabela].reset_index(drop=True),
+                                      esperado[tabela].reset_index(drop=True))
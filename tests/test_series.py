@@ -0,0 +1,87 @@
+"""Séries temporais (`sih.series`): reamostragem, janela móvel e ano anterior."""
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sih.cubos import construir
+from sih.series import FREQUENCIAS, SeriesRD, comparar, indicadores, movel, periodo_leitura, somar
+from sih.sintetico import gerar_arquivo, nome_arquivo
+
+# Um ano entre as competências, para comparar com o ano anterior
+COMPETENCIAS = [202301, 202302, 202401, 202402]
+
+
+@pytest.fixture(scope='module')
+def series(tmp_path_factory):
+    dados = str(tmp_path_factory.mktemp('datasets_series'))
+    cubos = str(tmp_path_factory.mktemp('cubos_series'))
+    for competencia in COMPETENCIAS:
+        gerar_arquivo(os.path.join(dados, nome_arquivo(competencia, 'BA')), 4000, competencia, 'BA', semente=3)
+    construir(dados, cubos)
+    return SeriesRD(cubos)
+
+
+@pytest.fixture(scope='module')
+def diaria(series):
+    return somar(series.ler('UF', ['BA'], 'BA'), 'D')
+
+
+def test_serie_soma_todas_as_internacoes(diaria):
+    assert diaria['internacoes'].sum() == 4000 * len(COMPETENCIAS)
+    # Índice contínuo: dias sem internações valem 0
+    assert (diaria.index.to_series().diff().dropna() == pd.Timedelta(days=1)).all()
+
+
+@pytest.mark.parametrize('frequencia', ['W', 'M'])
+def test_reamostragem_preserva_as_somas(series, diaria, frequencia):
+    somas = somar(series.ler('UF', ['BA'], 'BA'), frequencia)
+    pd.testing.assert_series_equal(somas.sum(), diaria.sum())
+    if frequencia == 'M':
+        assert (somas.index.day == 1).all()
+    else:
+        assert (somas.index.dayofweek == 0).all()
+
+
+def test_indicadores_recompostos_das_somas(diaria):
+    mensal = diaria.resample('MS').sum()
+    taxa = indicadores(mensal)['taxa_mortalidade']
+    np.testing.assert_allclose(taxa, mensal['obitos'] / mensal['internacoes'] * 100)
+
+
+def test_media_movel_soma_a_janela(diaria):
+    janela = movel(diaria, 7)
+    assert janela.iloc[:6].isna().all().all()
+    assert janela['internacoes'].iloc[6] == diaria['internacoes'].iloc[:7].sum()
+    assert janela['internacoes'].iloc[-1] == diaria['internacoes'].iloc[-7:].sum()
+
+
+def test_periodo_leitura_recua_janela_e_ano():
+    assert periodo_leitura(date(2024, 1, 17), date(2024, 2, 10), 'M', 3, True) == (date(2022, 11, 1), date(2024, 2, 29))
+    # Semanas começam na segunda-feira; um ano são 52 semanas
+    assert periodo_leitura(date(2024, 1, 17), None, 'W', None, True) == (date(2023, 1, 16), None)
+    assert periodo_leitura(date(2024, 1, 17), date(2024, 1, 20), 'D') == (date(2024, 1, 17), date(2024, 1, 20))
+
+
+@pytest.mark.parametrize('frequencia', ['D', 'W', 'M'])
+def test_ano_anterior_no_periodo_selecionado(series, frequencia):
+    inicio, fim = date(2024, 1, 1), date(2024, 2, 29)
+    leitura = periodo_leitura(inicio, fim, frequencia, janela=2, com_ano_anterior=True)
+    somas = somar(series.ler('UF', ['BA'], 'BA', *leitura), frequencia)
+    tabela = comparar(somas, 'internacoes', frequencia, 2, True, inicio, fim)
+
+    assert tabela['Data'].min() >= pd.Timestamp(periodo_leitura(inicio, None, frequencia)[0])
+    assert tabela['Data'].max() <= pd.Timestamp(fim)
+    # Há internações um ano antes do primeiro período e a janela do primeiro período está completa
+    primeira = tabela.iloc[0]
+    assert not np.isnan(primeira['Ano anterior']) and primeira['Ano anterior'] > 0
+    assert not np.isnan(primeira['Variação (%)'])
+    assert not np.isnan(primeira['Média móvel (2 períodos)'])
+
+    # O ano anterior é a série do mesmo período um ano antes
+    anterior = movel(somas, 2)['internacoes'].shift(FREQUENCIAS[frequencia][2])
+    esperado = anterior[anterior.index >= tabela['Data'].min()].iloc[:len(tabela)]
+    np.testing.assert_array_equal(tabela['Ano anterior'].to_numpy(), esperado.to_numpy())
+